@@ -1,2 +1,9 @@
-from . import root_agent
-__all__ = ["root_agent"]
\ No newline at end of file
+__all__ = ["root_agent"]
+
+
+def __getattr__(name):
+    # building the agent imports google.adk; only do that when it is asked for
+    if name == "root_agent":
+        from .agent import get_root_agent
+        return get_root_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,78 +1,225 @@
+import contextvars
 import os
 import time
+import threading
+from concurrent.futures import Future
+
 import cv2
 import json
-from dotenv import load_dotenv
-from fpdf import FPDF, XPos, YPos
-from google import adk
-from google.adk.models.google_llm import _ResourceExhaustedError 
-try:
-    import pytesseract
-except Exception:
-    pytesseract = None
-# try easyocr as pure-python fallback (requires torch)
-try:
-    import easyocr
-except Exception:
-    easyocr = None
-# optional Google Cloud Vision
-try:
-    from google.cloud import vision
-except Exception:
-    vision = None
 import numpy as np
 
-# NOTE: This project can perform OCR via several engines.
-# 1) Tesseract (recommended) — install binary and `pip install pytesseract`.
-# 2) easyocr (pure Python) — `pip install easyocr torch torchvision`.
-# 3) Google Cloud Vision — set GOOGLE_APPLICATION_CREDENTIALS or otherwise
-#    authenticate with Application Default Credentials. Requires
-#    `pip install google-cloud-vision`.
-# The code will automatically pick the first available engine.
-# On Windows we attempt to auto-detect common Tesseract install paths.
-if pytesseract is not None:
-    try:
-        if os.name == 'nt':
-            possible = [r"C:\Program Files\Tesseract-OCR\tesseract.exe", r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe"]
-            for p in possible:
-                if os.path.exists(p):
-                    pytesseract.pytesseract.tesseract_cmd = p
-                    break
-    except Exception:
-        pass
+from . import exporters, ocr_engines, tracing
+from .capture import CameraSource, CaptureService, FileSource, Frame
+from .frame_gate import FrameChangeGate
+from .ocr_cache import cache_key, get_cache
+from .preprocess import PIPELINE_VERSION, default_binarize, default_preset, preprocess, preset_steps
+from .regions import detect_text_regions, ocr_regions
+from .tables import parse_table_from_ocr, table_from_words
+
+# NOTE: OCR engines (tesseract, easyocr, Cloud Vision) live in ocr_engines.py.
+# Each is created once per process; set PHYSICALIZER_OCR_ENGINE to choose one.
+# The model stack (google.adk, google.genai) is only imported when root_agent is
+# first used, so importing this module for OCR or export stays fast.
+
+_env_loaded = False
+
+
+def load_env():
+    """Load the .env file (once). Entry points call this before reading PHYSICALIZER_* settings."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+        tracing.enable_from_env()
+
+# --- Shared capture service ---
+# The webcam is opened once and kept open by a background reader thread, so
+# a capture just picks a frame that is already in memory. Set
+# PHYSICALIZER_CAMERA to a device index or a video/image path to change the source.
+_capture_service = None
+_capture_lock = threading.Lock()
+
+
+def get_capture_service():
+    """Return the process-wide CaptureService, starting it on first use."""
+    global _capture_service
+    with _capture_lock:
+        if _capture_service is None:
+            source_spec = os.getenv("PHYSICALIZER_CAMERA", "0")
+            if source_spec.isdigit():
+                source = CameraSource(int(source_spec))
+            elif os.path.splitext(source_spec)[1].lower() in (".jpg", ".jpeg", ".png", ".bmp"):
+                source = FileSource(source_spec)
+            else:
+                source = CameraSource(source_spec)
+            buffer_size = int(os.getenv("PHYSICALIZER_FRAME_BUFFER", "8"))
+            # cameras pace themselves; still images would otherwise be re-read in a busy loop
+            fps = None if isinstance(source, CameraSource) else 15
+            _capture_service = CaptureService(source, buffer_size=buffer_size, fps=fps)
+        if not _capture_service.running:
+            _capture_service.start()
+        return _capture_service
+
+
+def set_capture_service(service):
+    """Replace the shared capture service (e.g. with a FileSource/SyntheticSource one)."""
+    global _capture_service
+    with _capture_lock:
+        if _capture_service is not None and _capture_service is not service:
+            _capture_service.stop()
+        _capture_service = service
+
+
+# --- Latest captured frame ---
+# Frames stay in memory end to end; set PHYSICALIZER_SAVE_CAPTURE=1 to also
+# keep a copy of each capture on disk as vision_capture.jpg.
+CAPTURE_PATH = "vision_capture.jpg"
+_last_frame = None
+
+
+def get_last_frame():
+    """Return the most recent enhanced Frame, or None if nothing was captured yet."""
+    return _last_frame
+
+
+# The frame the current model turn is about (the one the driver uploaded), so the
+# capture_vision_frame tool reads that frame rather than whatever the camera holds now,
+# and the frame gate of the session making the call.
+current_frame = contextvars.ContextVar("current_frame", default=None)
+current_gate = contextvars.ContextVar("current_gate", default=None)
+
+
+def grab_frame():
+    """Take the sharpest buffered frame, enhance it and remember it as the last frame.
 
-# Load the .env file
-load_dotenv() 
+    Returns (frame, error_message).
+    """
+    service = get_capture_service()
+    if service.error:
+        return None, "Could not open camera."
+    with tracing.span("capture.wait_for_frame"):
+        ready = service.wait_for_frame(timeout=5.0)
+    if not ready:
+        return None, "Failed to capture frame."
+
+    # pick the sharpest of the buffered frames to avoid motion blur
+    with tracing.span("capture.sharpest"):
+        image = service.sharpest()
+    if image is None:
+        return None, "Failed to capture frame."
+    return enhance_frame(image), None
+
+
+@tracing.traced("capture.enhance")
+def enhance_frame(image, timestamp: float = None):
+    """Contrast-enhance a raw camera image and remember it as the last frame. Returns the Frame."""
+    global _last_frame
+    # improve image contrast/brightness
+    lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+    l, a, b = cv2.split(lab)
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+    cl = clahe.apply(l)
+    enhanced = cv2.merge((cl,a,b))
+    enhanced = cv2.cvtColor(enhanced, cv2.COLOR_LAB2BGR)
+    frame = Frame(enhanced, timestamp=timestamp)
+    if os.getenv("PHYSICALIZER_SAVE_CAPTURE", "").lower() in ("1", "true", "yes"):
+        frame.save(CAPTURE_PATH)
+    _last_frame = frame
+    return frame
 
-project = os.getenv("GOOGLE_CLOUD_PROJECT")
-print(f"Agent initializing for project: {project}...")
 
 # --- TOOL 1: Vision Capture ---
+@tracing.traced()
 def capture_vision_frame():
-    """Captures a single frame from the webcam and saves it."""
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        return "Error: Could not open camera."
-    
-    ret, frame = cap.read()
-    if ret:
-        filepath = "vision_capture.jpg"
-        # improve image contrast/brightness
-        lab = cv2.cvtColor(frame, cv2.COLOR_BGR2LAB)
-        l, a, b = cv2.split(lab)
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        cl = clahe.apply(l)
-        enhanced = cv2.merge((cl,a,b))
-        enhanced = cv2.cvtColor(enhanced, cv2.COLOR_LAB2BGR)
-        cv2.imwrite(filepath, enhanced)
-        cap.release()
-        # perform quick OCR and display result
-        ocr_text, ocr_err = ocr_image(filepath)
-        summary = ocr_text if ocr_text else ''
-        return f"Image captured and saved to {filepath}. OCR output:\n{summary}"
-    else:
-        cap.release()
-        return "Error: Failed to capture frame."
+    """Captures a single frame from the webcam and runs OCR on it."""
+    # OCR the frame already attached to the user's message, if any; the OCR the
+    # driver started on it is joined rather than repeated
+    frame = current_frame.get()
+    if frame is None:
+        frame, err = grab_frame()
+        if err:
+            return f"Error: {err}"
+    # perform quick OCR and display result
+    ocr_text, ocr_err = ocr_frame(frame, current_gate.get())
+    summary = ocr_text if ocr_text else ''
+    return f"Image captured. OCR output:\n{summary}"
+
+
+# --- Unchanged-board gate ---
+# Frames that match a recent capture reuse its OCR text and agent summary.
+# PHYSICALIZER_CHANGE_THRESHOLD / PHYSICALIZER_CHANGE_CACHE tune the gate.
+# It is built on first use, after load_env(), so settings in .env apply.
+_frame_gate = None
+_gate_lock = threading.Lock()
+
+
+def get_frame_gate():
+    """Return the process-wide FrameChangeGate, creating it from the environment on first use."""
+    global _frame_gate
+    with _gate_lock:
+        if _frame_gate is None:
+            load_env()
+            _frame_gate = FrameChangeGate.from_env()
+        return _frame_gate
+
+
+# OCR running right now, by frame: a second caller (the driver's prefetch and the
+# model's capture_vision_frame tool, typically) waits for it instead of OCR'ing again.
+_ocr_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def ocr_frame(frame, gate: FrameChangeGate = None):
+    """OCR a captured frame, reusing the text of an unchanged board. Returns (text, error_message).
+
+    `gate` is the session's FrameChangeGate (default: the process-wide one).
+    """
+    frame_gate = gate if gate is not None else get_frame_gate()
+    cached = frame_gate.lookup(frame.image)
+    if cached and cached.get("ocr_text") is not None:
+        tracing.count("frame_gate.ocr_reused")
+        return cached["ocr_text"], None
+    # the pixel array is alive while its OCR runs, so its id cannot be reused meanwhile
+    key = id(frame.image)
+    with _inflight_lock:
+        running = _ocr_inflight.get(key)
+        if running is None:
+            running = _ocr_inflight[key] = Future()
+            owner = True
+        else:
+            owner = False
+    if not owner:
+        tracing.count("ocr.inflight_joined")
+        return running.result()
+    try:
+        text, err = ocr_image(frame)
+        if err is None:
+            frame_gate.remember(frame.image, ocr_text=text)
+        running.set_result((text, err))
+        return text, err
+    except BaseException as e:
+        running.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _ocr_inflight.pop(key, None)
+
+
+def ocr_frame_layout(frame, gate: FrameChangeGate = None):
+    """OCR text and word boxes of a captured frame from one pass, reusing an unchanged board's.
+
+    Returns (text, words, error_message); words is None for engines without word boxes.
+    """
+    frame_gate = gate if gate is not None else get_frame_gate()
+    cached = frame_gate.lookup(frame.image)
+    if cached and cached.get("ocr_text") is not None and "words" in cached:
+        tracing.count("frame_gate.ocr_reused")
+        return cached["ocr_text"], cached["words"], None
+    text, words, err = _ocr(frame, None, None, None, False, True, want="words")
+    if err is None:
+        frame_gate.remember(frame.image, ocr_text=text, words=words)
+    return text, words, err
 
 # --- Helper: Sanitize text for PDF rendering ---
 def sanitize_text_for_pdf(text: str) -> str:
@@ -85,270 +232,200 @@ def sanitize_text_for_pdf(text: str) -> str:
     return text
 
 # --- TOOL 2: PDF Export ---
+@tracing.traced()
 def export_to_pdf(data_content: str, mode: str = "summary"):
     """
     Creates a PDF on the local system.
     mode="summary": A clean, bulleted list of notes.
     mode="table": A structured grid with headers and auto-widths.
     """
-    # Sanitize input to avoid font encoding issues
-    data_content = sanitize_text_for_pdf(data_content)
-    
-    pdf = FPDF()
-    pdf.add_page()
-    
+    return write_pdf(data_content, mode)
+
+
+# --- TOOL 3: Data Export ---
+def export_data(data_content: str, format: str = "csv", mode: str = "table"):
+    """
+    Saves the notes as a data file for spreadsheets and pipelines.
+    format: "csv", "jsonl", "json", "md" (Markdown) or "xlsx" (Excel, if installed).
+    mode="table": data_content is a JSON list of lists, header row first.
+    mode="summary": data_content is plain text, one note per line.
+    """
+    return write_export(data_content, format, mode)
+
+
+def write_pdf(data_content: str, mode: str = "summary", filename: str = None):
+    """Render `data_content` as a summary or table PDF (see write_export)."""
+    return write_export(data_content, "pdf", mode, filename)
+
+
+def write_export(data_content: str, fmt: str = "pdf", mode: str = "summary", filename: str = None):
+    """Write `data_content` in format `fmt` at `filename` (default: a content-addressed path).
+
+    Returns a "Successfully saved to ..." or "Error: ..." message.
+    """
+    if fmt == "pdf":
+        # Sanitize input to avoid font encoding issues
+        data_content = sanitize_text_for_pdf(data_content)
+
     if mode == "summary":
-        # use default font; avoid unicode bullets by substituting '-'
-        pdf.set_font("Helvetica", 'B', 16)
-        pdf.cell(0, 10, text="Summary of Captured Notes", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
-        pdf.ln(5)
-        
-        pdf.set_font("Helvetica", size=11)
-        lines = data_content.split('\n')
-        for line in lines:
-            clean_line = line.strip()
-            if clean_line:
-                # Use multi_cell with a left margin for bullet points
-                # Width of 0 means full page width
-                try:
-                    bullet = "- "
-                    # Set left margin/indent for readability
-                    pdf.set_left_margin(15)
-                    pdf.multi_cell(0, 6, text=f"{bullet}{clean_line}")
-                    pdf.set_left_margin(10)
-                except Exception as e:
-                    # If multi_cell fails, use simple cell approach
-                    pdf.set_left_margin(10)
-                    try:
-                        # Truncate very long lines
-                        if len(clean_line) > 100:
-                            clean_line = clean_line[:100] + "..."
-                        pdf.cell(0, 6, text=f"- {clean_line}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-                    except:
-                        pass
-        
+        data = data_content.split('\n')
     elif mode == "table":
-        pdf.set_font("Helvetica", 'B', 16)
-        pdf.cell(0, 10, text="Structured Data Table", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
-        pdf.ln(10)
-        
         try:
-            table_data = json.loads(data_content) 
-            
-            if not table_data or not isinstance(table_data, list):
-                return "Error: Invalid table data format. Expected a list of lists."
-
-            num_cols = len(table_data[0])
-            col_width = pdf.epw / num_cols 
-
-            pdf.set_font("Helvetica", 'B', 10)
-            pdf.set_fill_color(200, 220, 255) 
-            for header in table_data[0]:
-                header_text = str(header)[:20]  # Truncate long header text
-                pdf.cell(col_width, 10, txt=header_text, border=1, fill=True, align='C')
-            pdf.ln()
-
-            pdf.set_font("Helvetica", size=10)
-            for row in table_data[1:]:
-                for item in row:
-                    item_text = str(item)[:25]  # Truncate long cell text
-                    pdf.cell(col_width, 10, txt=item_text, border=1)
-                pdf.ln()
-
+            data = json.loads(data_content)
         except Exception as e:
             return f"Error processing table: {str(e)}"
-    
-    filename = f"physicalized_{mode}.pdf"
-    pdf.output(filename)
+        if not data or not isinstance(data, list):
+            return "Error: Invalid table data format. Expected a list of lists."
+    else:
+        return f"Error: Unknown mode '{mode}'. Use 'summary' or 'table'."
+
+    try:
+        with tracing.span("export", format=fmt, mode=mode):
+            filename, _ = exporters.export(data, fmt, mode, filename=filename)
+    except LookupError as e:
+        return f"Error: {e}"
+    except Exception as e:
+        return f"Error processing {mode}: {str(e)}"
     return f"Successfully saved to {filename}"
 
 
 # --- OCR helper ---
-def ocr_image(filepath: str):
-    """Return OCR text for an image using pytesseract. Returns (text, error_message)."""
-    if not os.path.exists(filepath):
+def _as_frame(image):
+    """Normalise a Frame, BGR array or image path to a Frame. Returns (frame, error_message)."""
+    if isinstance(image, Frame):
+        return image, None
+    if isinstance(image, np.ndarray):
+        return Frame(image), None
+    if not os.path.exists(image):
         return None, "Image file not found"
-    img = cv2.imread(filepath)
-    if img is None:
+    # read the bytes once: decode them here and reuse them for Cloud Vision
+    with open(image, 'rb') as f:
+        frame = Frame.from_jpeg(f.read())
+    if frame is None:
         return None, "Failed to read image"
-    try:
-        # increase resolution for better OCR
-        scale = 2.0
-        img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    return frame, None
+
+
+@tracing.traced()
+def ocr_image(image, engine: str = None, preset: str = None, stats: dict = None, tiled: bool = None,
+              cache: bool = True):
+    """Return OCR text for an image. Returns (text, error_message).
+
+    `image` may be a Frame, a BGR numpy array or a path to an image file.
+    `engine` names an OCR engine from ocr_engines; defaults to the configured one.
+    `preset` names a preprocessing preset ("fast", "quality", "debug").
+    If `stats` is a dict it receives per-stage timings in milliseconds.
+    `tiled` OCRs detected text regions in parallel instead of the whole frame
+    (default from PHYSICALIZER_TILED_OCR).
+    Results are looked up in / stored to the content-addressed OCR cache
+    unless `cache` is False.
+    """
+    text, _, err = _ocr(image, engine, preset, stats, tiled, cache, want="text")
+    return text, err
 
-        # convert and enhance contrast
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        gray = cv2.GaussianBlur(gray, (5, 5), 0)
 
-        # apply CLAHE local contrast enhancement
-        try:
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-            gray = clahe.apply(gray)
-        except Exception:
-            pass
+@tracing.traced()
+def ocr_words(image, engine: str = None, preset: str = None, cache: bool = True):
+    """Return word boxes for an image. Returns (words, error_message).
 
-        # simple adaptive threshold
-        th = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                   cv2.THRESH_BINARY, 15, 8)
+    Each word is a dict with text, left, top, width, height and conf, in the
+    coordinates of the preprocessed image. Arguments are as for ocr_image;
+    the text and the word boxes come from the same OCR pass and share its
+    content-addressed cache entry.
+    """
+    _, words, err = _ocr(image, engine, preset, None, False, cache, want="words")
+    if err is None and words is None:
+        err = f"OCR engine '{engine or ocr_engines.default_engine_name()}' does not report word boxes"
+    return words, err
 
-        # morphological closing to fill small holes
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-        th = cv2.morphologyEx(th, cv2.MORPH_CLOSE, kernel)
 
-        # save intermediate images for debugging
-        try:
-            cv2.imwrite('vision_capture_enhanced.jpg', img)
-            cv2.imwrite('vision_capture_threshold.jpg', th)
-        except Exception:
-            pass
+def _ocr(image, engine, preset, stats, tiled, cache, want):
+    """OCR an image once for both text and word boxes. Returns (text, words, error_message).
 
-        # attempt deskew: find largest contour and rotate to upright
+    `want` ("text" or "words") is the field a cache hit must have. Tiled OCR
+    reads crops, so it yields no word boxes.
+    """
+    frame, err = _as_frame(image)
+    if err:
+        return None, None, err
+    img = frame.image
+    try:
+        # run OCR with the configured (cached) engine
         try:
-            coords = cv2.findNonZero(255 - th)
-            if coords is not None:
-                rect = cv2.minAreaRect(coords)
-                angle = rect[-1]
-                if angle < -45:
-                    angle = -(90 + angle)
-                else:
-                    angle = -angle
-                (h, w) = th.shape
-                center = (w // 2, h // 2)
-                M = cv2.getRotationMatrix2D(center, angle, 1.0)
-                th = cv2.warpAffine(th, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
-                img = cv2.warpAffine(img, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
-                try:
-                    cv2.imwrite('vision_capture_deskewed.jpg', img)
-                except Exception:
-                    pass
-        except Exception:
-            pass
-
-        # run OCR with available engine
-        if pytesseract is not None:
-            text = pytesseract.image_to_string(th)
-        elif easyocr is not None:
-            reader = easyocr.Reader(['en'], gpu=False)
-            result = reader.readtext(th)
-            text = '\n'.join([r[1] for r in result])
-        elif vision is not None:
-            try:
-                client = vision.ImageAnnotatorClient()
-                with open(filepath, 'rb') as f:
-                    content = f.read()
-                image = vision.Image(content=content)
-                resp = client.text_detection(image=image)
-                if resp.error.message:
-                    return None, resp.error.message
-                text = resp.full_text_annotation.text
-            except Exception as ce:
-                return None, str(ce)
-        else:
-            return None, "no OCR engine available"
+            ocr_engine = ocr_engines.get_engine(engine)
+        except LookupError as le:
+            return None, None, str(le)
+        preset = preset or default_preset()
+        if tiled is None:
+            tiled = os.getenv("PHYSICALIZER_TILED_OCR", "").lower() in ("1", "true", "yes")
+        tiled = bool(tiled and ocr_engine.supports_crops)
+
+        # identical pixels with identical settings were already OCR'd
+        key = None
+        if cache and ocr_engine.cacheable:
+            with tracing.span("ocr.cache_lookup"):
+                key = cache_key(img, steps=preset_steps(preset), binarize=default_binarize(),
+                                pipeline=PIPELINE_VERSION, engine=ocr_engine.name,
+                                version=ocr_engine.version, tiled=tiled)
+                hit = get_cache().get(key)
+            if hit is not None and hit[want] is not None:
+                tracing.count("ocr.cache_hit")
+                if stats is not None:
+                    stats["cache_hit"] = True
+                return hit["text"], hit["words"], None
+            tracing.count("ocr.cache_miss")
+
+        # enhance, binarize and deskew according to the preset
+        with tracing.span("ocr.preprocess", preset=preset if isinstance(preset, str) else "custom"):
+            prep = preprocess(img, preset)
+        th = prep.image
+        if stats is not None:
+            stats["preprocess_ms"] = dict(prep.timings)
+
+        started = time.perf_counter()
+        words = None
+        with tracing.span("ocr.recognize", engine=ocr_engine.name, tiled=tiled) as sp:
+            if tiled:
+                # OCR only the detected text blocks, in parallel
+                regions = detect_text_regions(th)
+                sp.set(regions=len(regions))
+                if stats is not None:
+                    stats["regions"] = len(regions)
+                text = ocr_regions(th, regions, ocr_engine.name)
+            else:
+                # one pass yields the text and the word boxes table extraction needs
+                text, words = ocr_engine.recognize_layout(th, frame)
+        if stats is not None:
+            stats["ocr_ms"] = (time.perf_counter() - started) * 1000.0
         # basic cleanup: normalize spaces
         if text:
             text = '\n'.join([ln.strip() for ln in text.splitlines() if ln.strip()])
-        return text, None
+        if key is not None:
+            get_cache().put(key, text=text, words=words)
+        return text, words, None
     except Exception as e:
-        return None, str(e)
+        return None, None, str(e)
 
 
-def parse_table_from_ocr(text: str):
-    """Attempt to infer a table from OCR text.
+@tracing.traced()
+def extract_table(image, text: str = None, engine: str = None, preset: str = None):
+    """Best-effort table for an image: layout from word boxes first, then text heuristics.
 
-    Returns a list-of-lists table (header row first) or None on failure.
-    Heuristics used:
-    - If lines contain ':' treat as key:value pairs -> 2-col table
-    - Prefer tab, pipe, comma, or multi-space delimiters (in that order)
-    - If rows have inconsistent columns, pad shorter rows with ''
-    - If first row looks like header (contains letters) and subsequent rows are more numeric, treat first as header
+    `text` is OCR text already computed for the image, used by the fallback.
+    Returns a list-of-lists table (header row first) or None.
     """
-    if not text:
-        return None
-    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-    if not lines:
-        return None
-
-    # If most lines contain ':' -> key:value pairs
-    colon_count = sum(1 for ln in lines if ':' in ln)
-    if colon_count >= max(1, len(lines) // 3):
-        table = [["Key", "Value"]]
-        for ln in lines:
-            if ':' in ln:
-                k, v = ln.split(':', 1)
-                table.append([k.strip(), v.strip()])
-        return table
-
-    # Try delimiters in order
-    # delimiters: tab, pipe, comma, then whitespace fallback
-    delimiters = ['\t', '|', ',', None]  # None means multi-space or single-space fallback
-    best_table = None
-    best_var = None
-    for d in delimiters:
-        rows = []
-        if d is not None:
-            for ln in lines:
-                parts = [p.strip() for p in ln.split(d) if p.strip()]
-                rows.append(parts)
-        else:
-            # split on 2+ spaces first
-            import re
-            for ln in lines:
-                if re.search(r'\s{2,}', ln):
-                    parts = [p.strip() for p in re.split(r'\s{2,}', ln) if p.strip()]
-                else:
-                    parts = [p.strip() for p in ln.split() if p.strip()]
-                rows.append(parts)
-
-        # compute variability in column counts
-        counts = [len(r) for r in rows]
-        if not counts:
-            continue
-        var = max(counts) - min(counts)
-        # prefer low variability and reasonable columns (>=2)
-        if min(counts) >= 2 and (best_var is None or var < best_var):
-            best_table = rows
-            best_var = var
-
-    if best_table:
-        max_cols = max(len(r) for r in best_table)
-        table = []
-        for r in best_table:
-            row = r + [''] * (max_cols - len(r))
-            table.append(row)
-
-        # Heuristic: if first row contains letters and following rows have numeric in many columns -> header
-        import re
-        def is_mostly_numeric(vals):
-            n = 0
-            for v in vals:
-                if re.search(r'[0-9]', v):
-                    n += 1
-            return n >= max(1, len(vals) // 2)
-
-        first = table[0]
-        rest = table[1:]
-        if rest and any(is_mostly_numeric(r) for r in rest) and any(re.search('[A-Za-z]', c) for c in first):
-            return table
-
-        # If no clear header, synthesize headers
-        if rest:
-            header = [f"Col{i+1}" for i in range(len(table[0]))]
-            return [header] + table
-
-    # Fallback: return key:value single-column pairs if available
-    kvs = []
-    for ln in lines:
-        if ':' in ln:
-            k, v = ln.split(':', 1)
-            kvs.append([k.strip(), v.strip()])
-    if kvs:
-        return [["Key", "Value"]] + kvs
-
-    return None
+    words, err = ocr_words(image, engine=engine, preset=preset)
+    if not err and words:
+        parsed = table_from_words(words)
+        if parsed is not None:
+            return parsed.rows
+    if text is None:
+        text, err = ocr_image(image, engine=engine, preset=preset)
+    return parse_table_from_ocr(text)
+
 
 # --- AGENT CONFIGURATION ---
-tools = [capture_vision_frame, export_to_pdf]
+tools = [capture_vision_frame, export_to_pdf, export_data]
 
 INSTRUCTIONS = """
 You are a Collaborative Data Physicalizer. 🤖
@@ -359,156 +436,50 @@ You are a Collaborative Data Physicalizer. 🤖
 4. EXECUTE: Wait for the user to say '1' or '2'.
    - If '1': Call 'export_to_pdf' with mode='summary'.
    - If '2': Call 'export_to_pdf' with mode='table'. For table mode, you MUST format data_content as a valid JSON list of lists.
+   - If the user asks for CSV, Excel, JSON or Markdown instead, call 'export_data' with that format (same data_content rules).
 """
 
-root_agent = Agent(
-    name="DataPhysicalizer",
-    model="gemini-2.0-flash", 
-    instruction=INSTRUCTIONS,
-    tools=tools,
-)
-
-if __name__ == "__main__":
-    import time
-    import threading
-    import queue
-    from google.adk import runners
-    from google.adk.sessions import InMemorySessionService
-    from google.genai import types
-
-    # Thread-safe error queue to communicate between main and runner threads
-    error_queue = queue.Queue()
-    
-    # Custom exception hook to catch errors in runner thread
-    original_excepthook = threading.excepthook
-    
-    def thread_exception_handler(args):
-        error_str = str(args.exc_value)
-        if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
-            error_queue.put(("rate_limit", error_str))
-        elif "camera" in error_str.lower() or "msmf" in error_str.lower():
-            error_queue.put(("camera_error", error_str))
-        else:
-            # Print other exceptions normally
-            original_excepthook(args)
-    
-    threading.excepthook = thread_exception_handler
-
-    runner = runners.Runner(
-        app_name="DataPhysicalizerApp",
-        agent=agent,
-        session_service=InMemorySessionService(),
-        auto_create_session=True,
-    )
-
-    print("--- 🤖 Data Physicalizer Session Started ---")
-    user_input = "Physicalize"
-    last_summary = ""  # store last text output by agent
-    retry_count = 0
-    max_retries = 3
-    
-    while True:
-        try:
-            # Check for errors from background thread
-            try:
-                error_type, error_msg = error_queue.get_nowait()
-                if error_type == "rate_limit":
-                    raise Exception(error_msg)
-                elif error_type == "camera_error":
-                    print(f"\n[System] Camera error detected. Make sure your webcam is available.")
-                    user_input = input("\nYou: ")
-                    continue
-            except queue.Empty:
-                pass
-            
-            message = types.Content(role="user", parts=[types.Part(text=user_input)])
-            
-            # If user said "Physicalize" or we just captured, add the image to the message
-            if user_input.lower() == "physicalize" or (os.path.exists("vision_capture.jpg") and user_input == "Physicalize"):
-                # Wait a moment for capture to complete
-                time.sleep(1)
-                if os.path.exists("vision_capture.jpg"):
-                    with open("vision_capture.jpg", "rb") as img_file:
-                        image_data = img_file.read()
-                    
-                    # Create message with both text and image using the correct API
-                    message = types.Content(
-                        role="user", 
-                        parts=[
-                            types.Part(text="Please analyze this whiteboard image and extract all the data/notes you can see. Then ask me if I want it as a list or table."),
-                            types.Part(inline_data=types.Blob(mime_type="image/jpeg", data=image_data))
-                        ]
-                    )
-            
-            for event in runner.run(user_id="user1", session_id="session1", new_message=message):
-                if event.content and event.content.parts:
-                    for part in event.content.parts:
-                        if part.text:
-                            print(f"\nAgent: {part.text}")
-                            last_summary = part.text  # remember last summary
-            
-            # Check again after the run completes
-            try:
-                error_type, error_msg = error_queue.get_nowait()
-                if error_type == "rate_limit":
-                    raise Exception(error_msg)
-            except queue.Empty:
-                pass
-            
-            retry_count = 0  # Reset on success
-            # Prompt the user. If they choose 1 or 2, run local OCR and export PDF.
-            user_input = input("\nYou: ")
-            if user_input.lower() in ["quit", "exit"]:
-                break
-
-            if user_input.strip() in ["1", "2"]:
-                if not os.path.exists("vision_capture.jpg"):
-                    print("[System] No captured image found. Say 'Physicalize' first to capture an image.")
-                    continue
-                # if pytesseract missing, fallback to agent-provided summary
-                if pytesseract is None:
-                    print("[System] pytesseract not installed, using the agent's summary instead of OCR.")
-                    text = last_summary
-                    err = None
-                else:
-                    text, err = ocr_image("vision_capture.jpg")
-                if err:
-                    print(f"[System] OCR error: {err}. Please install Tesseract and the Python package pytesseract.")
-                    print("Install instructions: https://github.com/tesseract-ocr/tesseract and pip install pytesseract")
-                    # still allow using agent summary
-                    text = last_summary
-                    err = None
-
-                if user_input.strip() == "1":
-                    # Summary mode: use OCR or fallback
-                    result = export_to_pdf(text, mode="summary")
-                    print(result)
-                else:
-                    # Table mode: use intelligent parsing heuristics on OCR output or summary
-                    table = parse_table_from_ocr(text)
-                    if not table:
-                        print("[System] Unable to infer a table from the extracted text. Falling back to summary PDF.")
-                        result = export_to_pdf(text, mode="summary")
-                        print(result)
-                        continue
-                    result = export_to_pdf(json.dumps(table), mode="table")
-                    print(result)
-                # after export, continue main loop
-                continue
-        except Exception as e:
-            error_str = str(e)
-            if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
-                retry_count += 1
-                if retry_count > max_retries:
-                    print(f"\n[System] Max retries exceeded. API quota is exhausted.")
-                    print("[System] Please wait 15-30 minutes and try again.")
-                    break
-                wait_time = 120 * (2 ** (retry_count - 1))  # 2min, 4min, 8min
-                minutes = wait_time // 60
-                print(f"\n[System] API rate limit hit (attempt {retry_count}/{max_retries}). Waiting {minutes} minute(s)... ⏳")
-                time.sleep(wait_time)
-                print("[System] Retrying now...")
-                continue 
-            else:
-                print(f"\n[System] Error: {error_str}")
-                break
\ No newline at end of file
+def get_model():
+    """Model for the agent: PHYSICALIZER_MODEL (default gemini-2.0-flash), or "fake"/"fake:N" for offline runs."""
+    name = os.getenv("PHYSICALIZER_MODEL", "gemini-2.0-flash")
+    if name.startswith("fake"):
+        from .fake_model import FakeModel
+        return FakeModel.from_spec(name)
+    return name
+
+
+_root_agent = None
+_agent_lock = threading.Lock()
+
+
+def get_root_agent():
+    """Build the agent on first use; `root_agent` resolves to this."""
+    global _root_agent
+    with _agent_lock:
+        if _root_agent is None:
+            load_env()
+            project = os.getenv("GOOGLE_CLOUD_PROJECT")
+            print(f"Agent initializing for project: {project}...")
+            from google import adk
+
+            from . import sessions
+
+            _root_agent = adk.Agent(
+                name="DataPhysicalizer",
+                model=get_model(),
+                instruction=INSTRUCTIONS,
+                tools=tools,
+                # old images become hashes/OCR text and stale turns a recap before each model call
+                before_model_callback=sessions.get_compactor(),
+            )
+        return _root_agent
+
+
+def __getattr__(name):
+    # lazy module attributes, so `from data_physicalizer.agent import root_agent` still works
+    if name == "root_agent":
+        return get_root_agent()
+    if name == "frame_gate":
+        return get_frame_gate()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
@@ -0,0 +1,247 @@
+"""Batch/offline physicalization of image folders and video files.
+
+    python -m data_physicalizer.batch INPUT [INPUT ...] --out physicalized/
+
+INPUT may be an image file, a directory of images or a video file. Video
+frames are sampled every `--every` seconds and frames that look the same as
+the previous sample are skipped (`--min-change` sets how much new ink counts
+as a change); image files whose bytes match an earlier
+input are listed in the manifest as duplicates and not processed again.
+Outputs are named after the input's file name, plus a hash of its path when
+two inputs share a name (a/board.jpg, b/board.jpg). Each input goes through
+ocr_image -> extract_table -> export in a worker pool; one file per
+`--formats` entry (default: PDF) and one JSON file are written per input,
+plus manifest.json summarising the run and its throughput.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+
+from .frame_gate import change_score, frame_signature
+
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
+VIDEO_EXTS = {".mp4", ".mov", ".avi", ".mkv", ".webm", ".m4v"}
+
+
+def iter_video_frames(path: str, every: float = 2.0, min_change: float = 0.0):
+    """Yield ``(name, frame)`` samples from a video, one per `every` seconds, skipping near-duplicates.
+
+    A sample is kept when its change_score against the last kept one is above
+    `min_change`; the default keeps any frame with a new ink blob.
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return
+    stem = os.path.splitext(os.path.basename(path))[0]
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    step = max(1, int(round(fps * every)))
+    previous = None
+    index = 0
+    try:
+        while True:
+            # grab() skips decoding the frames between samples
+            if not cap.grab():
+                break
+            if index % step == 0:
+                ret, frame = cap.retrieve()
+                if ret:
+                    signature = frame_signature(frame)
+                    if previous is None or change_score(previous, signature) > min_change:
+                        previous = signature
+                        yield f"{stem}_t{index / fps:08.2f}", frame
+            index += 1
+    finally:
+        cap.release()
+
+
+def path_hash(path: str) -> str:
+    """Short hash of a file's absolute path, to tell apart inputs with the same file name."""
+    return hashlib.blake2b(os.path.abspath(path).encode("utf-8"), digest_size=4).hexdigest()
+
+
+def file_digest(path: str) -> str:
+    """Content hash of a file."""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16)).hexdigest()
+
+
+def iter_inputs(paths, every: float = 2.0, min_change: float = 0.0):
+    """Yield ``(name, image_or_path)`` work items for files, directories and videos.
+
+    Names are unique within one run: a name already taken by an input from
+    another path gets that path's hash appended.
+    """
+    taken = {}
+
+    def unique(name, path):
+        owner = taken.setdefault(name, path)
+        if owner != path:
+            name = f"{name}_{path_hash(path)}"
+            taken[name] = path
+        return name
+
+    def items(path):
+        ext = os.path.splitext(path)[1].lower()
+        if ext in VIDEO_EXTS:
+            for name, frame in iter_video_frames(path, every, min_change):
+                yield unique(name, path), frame
+        else:
+            yield unique(os.path.splitext(os.path.basename(path))[0], path), path
+
+    for path in paths:
+        if os.path.isdir(path):
+            for entry in sorted(os.listdir(path)):
+                if os.path.splitext(entry)[1].lower() in IMAGE_EXTS | VIDEO_EXTS:
+                    yield from items(os.path.join(path, entry))
+        else:
+            yield from items(path)
+
+
+def process_item(name, image, out_dir: str, preset: str = None, engine: str = None, formats=("pdf",)):
+    """OCR one image (array or path), infer a table and write it in each of `formats` plus JSON.
+
+    Returns a manifest record.
+    """
+    from .agent import extract_table, ocr_image, write_export
+
+    started = time.perf_counter()
+    record = {"name": name, "source": image if isinstance(image, str) else None}
+    # tiled OCR would start a nested process pool inside each worker
+    text, err = ocr_image(image, engine=engine, preset=preset, tiled=False)
+    if err:
+        record["error"] = err
+        record["seconds"] = time.perf_counter() - started
+        return record
+    table = extract_table(image, text, engine=engine, preset=preset)
+    outputs = {}
+    for fmt in formats:
+        if fmt == "json":
+            continue  # always written below, with the OCR text alongside the table
+        path = os.path.join(out_dir, f"{name}.{fmt}")
+        if table:
+            result = write_export(json.dumps(table), fmt, mode="table", filename=path)
+        else:
+            result = write_export(text or "", fmt, mode="summary", filename=path)
+        if result.startswith("Successfully"):
+            outputs[fmt] = path
+        else:
+            record["error"] = result
+    json_path = os.path.join(out_dir, f"{name}.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump({"source": record["source"], "text": text, "table": table}, f, indent=2)
+    record.update(outputs)
+    record.update({"json": json_path, "mode": "table" if table else "summary",
+                   "seconds": time.perf_counter() - started})
+    return record
+
+
+def _error_record(name, image, exc):
+    return {"name": name, "source": image if isinstance(image, str) else None,
+            "error": f"{type(exc).__name__}: {exc}"}
+
+
+def run_batch(paths, out_dir: str, workers: int = None, every: float = 2.0, preset: str = None,
+              engine: str = None, max_pending: int = None, formats=("pdf",), min_change: float = 0.0):
+    """Process all inputs in a process pool and write manifest.json. Returns the manifest dict.
+
+    At most `max_pending` items (default 2 per worker) are in flight at once,
+    so decoded video frames never pile up in memory. An item whose worker
+    raises gets an error record; the rest of the batch carries on.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    records = []
+    duplicates = []
+    seen = {}
+    started = time.perf_counter()
+
+    def collect(done):
+        for future in done:
+            name, image = pending.pop(future)
+            try:
+                records.append(future.result())
+            except Exception as e:
+                records.append(_error_record(name, image, e))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        for name, image in iter_inputs(paths, every, min_change):
+            if isinstance(image, str):
+                try:
+                    digest = file_digest(image)
+                except OSError as e:
+                    records.append(_error_record(name, image, e))
+                    continue
+                if digest in seen:
+                    duplicates.append({"name": name, "source": image, "duplicate_of": seen[digest]})
+                    continue
+                seen[digest] = name
+            if len(pending) >= max_pending:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+            try:
+                future = pool.submit(process_item, name, image, out_dir, preset, engine, formats)
+            except BrokenProcessPool as e:
+                records.append(_error_record(name, image, e))
+                continue
+            pending[future] = (name, image)
+        collect(wait(pending).done)
+    elapsed = time.perf_counter() - started
+    records.sort(key=lambda r: r["name"])
+    ok = sum(1 for r in records if "error" not in r)
+    manifest = {
+        "inputs": list(paths),
+        "items": records,
+        "duplicates": duplicates,
+        "processed": len(records),
+        "succeeded": ok,
+        "failed": len(records) - ok,
+        "elapsed_seconds": elapsed,
+        "images_per_second": len(records) / elapsed if elapsed > 0 else 0.0,
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Physicalize folders of whiteboard photos or meeting recordings.")
+    parser.add_argument("inputs", nargs="+", help="image files, directories or video files")
+    parser.add_argument("--out", default="physicalized", help="output directory (default: physicalized)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--every", type=float, default=2.0, help="seconds between sampled video frames")
+    parser.add_argument("--min-change", type=float, default=0.0,
+                        help="share of a video frame that must change for it to be kept (default: 0, any new ink)")
+    parser.add_argument("--preset", default=None, help="preprocessing preset (fast, quality, debug)")
+    parser.add_argument("--engine", default=None, help="OCR engine name")
+    parser.add_argument("--formats", default="pdf",
+                        help="comma-separated output formats: pdf, csv, jsonl, json, md, xlsx (default: pdf)")
+    args = parser.parse_args(argv)
+
+    from .agent import load_env
+    load_env()  # workers inherit the environment, .env included
+    manifest = run_batch(args.inputs, args.out, workers=args.workers, every=args.every,
+                         min_change=args.min_change, preset=args.preset, engine=args.engine,
+                         formats=[f.strip() for f in args.formats.split(",") if f.strip()])
+    for record in manifest["items"]:
+        if "error" in record:
+            print(f"[Batch] {record['name']}: {record['error']}")
+    for record in manifest["duplicates"]:
+        print(f"[Batch] {record['name']}: same image as {record['duplicate_of']}, skipped")
+    print(f"[Batch] {manifest['processed']} item(s), {manifest['failed']} failed, "
+          f"{len(manifest['duplicates'])} duplicate(s) skipped, "
+          f"{manifest['elapsed_seconds']:.1f}s, {manifest['images_per_second']:.2f} images/sec")
+    print(f"[Batch] Manifest written to {os.path.join(args.out, 'manifest.json')}")
+    return 0 if manifest["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
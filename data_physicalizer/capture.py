@@ -0,0 +1,273 @@
+"""Long-lived frame capture used by the vision tools.
+
+Opening a webcam is slow and the first frames after opening are usually
+underexposed, so instead of opening the device per capture we keep it open
+in a background thread and hold the most recent frames in a ring buffer.
+Any object with ``open()``, ``read()`` and ``close()`` can act as the frame
+source, which lets files or synthetic frames stand in for the camera.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+# --- In-memory frame ---
+class Frame:
+    """A captured image carried in memory from capture through OCR to the agent.
+
+    The JPEG encoding is produced at most once (on first access of ``jpeg``)
+    and reused for the model upload and for the optional copy on disk.
+    """
+
+    def __init__(self, image, timestamp: float = None, jpeg_quality: int = 90):
+        self.image = image
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.jpeg_quality = jpeg_quality
+        self._jpeg = None
+
+    @classmethod
+    def from_jpeg(cls, data: bytes, timestamp: float = None):
+        """Decode JPEG/PNG bytes into a Frame, keeping the original bytes."""
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+        frame = cls(image, timestamp=timestamp)
+        frame._jpeg = bytes(data)
+        return frame
+
+    @property
+    def jpeg(self) -> bytes:
+        if self._jpeg is None:
+            ok, buf = cv2.imencode(".jpg", self.image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ok:
+                raise ValueError("Failed to encode frame as JPEG")
+            self._jpeg = buf.tobytes()
+        return self._jpeg
+
+    @property
+    def cached_jpeg(self):
+        """The JPEG bytes if they were already produced (or decoded from), else None; never encodes."""
+        return self._jpeg
+
+    def save(self, filepath: str) -> str:
+        """Write the cached JPEG bytes to disk (no re-encode) and return the path."""
+        with open(filepath, "wb") as f:
+            f.write(self.jpeg)
+        return filepath
+
+
+# --- Frame sources ---
+class CameraSource:
+    """Frames from an OpenCV device index or a video file path.
+
+    Video files report their frame rate as ``fps`` (so they can be played
+    back in real time) and become ``exhausted`` at the end; devices have
+    ``fps`` None because they pace themselves.
+    """
+
+    def __init__(self, device=0):
+        self.device = device
+        self.fps = None
+        self._cap = None
+        self._ended = False
+
+    @property
+    def is_file(self) -> bool:
+        return isinstance(self.device, (str, os.PathLike)) and os.path.isfile(self.device)
+
+    def open(self) -> bool:
+        self._cap = cv2.VideoCapture(self.device)
+        self._ended = False
+        if self.is_file and self._cap.isOpened():
+            self.fps = self._cap.get(cv2.CAP_PROP_FPS) or None
+        return self._cap.isOpened()
+
+    def read(self):
+        if self._cap is None:
+            return None
+        ret, frame = self._cap.read()
+        if not ret and self.is_file:
+            self._ended = True
+        return frame if ret else None
+
+    @property
+    def exhausted(self) -> bool:
+        return self._ended
+
+    def close(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+
+class FileSource:
+    """Frames from image files on disk, cycled forever (or once with loop=False)."""
+
+    def __init__(self, paths, loop: bool = True):
+        if isinstance(paths, (str, os.PathLike)):
+            paths = [paths]
+        self.paths = [str(p) for p in paths]
+        self.loop = loop
+        self._images = []
+        self._index = 0
+
+    def open(self) -> bool:
+        self._images = [img for img in (cv2.imread(p) for p in self.paths) if img is not None]
+        self._index = 0
+        return bool(self._images)
+
+    def read(self):
+        if not self._images:
+            return None
+        if self._index >= len(self._images):
+            if not self.loop:
+                return None
+            self._index = 0
+        frame = self._images[self._index]
+        self._index += 1
+        return frame.copy()
+
+    @property
+    def exhausted(self) -> bool:
+        return not self.loop and self._index >= len(self._images)
+
+    def close(self):
+        self._images = []
+
+
+class SyntheticSource:
+    """Frames produced by a callable ``make_frame(index)`` or a fixed array."""
+
+    def __init__(self, frame=None, make_frame=None, shape=(480, 640, 3)):
+        if frame is None and make_frame is None:
+            frame = np.full(shape, 255, dtype=np.uint8)
+        self._frame = frame
+        self._make_frame = make_frame
+        self._index = 0
+
+    def open(self) -> bool:
+        self._index = 0
+        return True
+
+    def read(self):
+        self._index += 1
+        if self._make_frame is not None:
+            return self._make_frame(self._index)
+        return self._frame.copy()
+
+    def close(self):
+        pass
+
+
+def sharpness(frame) -> float:
+    """Variance of the Laplacian on a downsampled grayscale copy (higher is sharper)."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    h, w = gray.shape[:2]
+    if w > 320:
+        gray = cv2.resize(gray, (320, max(1, h * 320 // w)), interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+# --- Capture service ---
+class CaptureService:
+    """Keeps a frame source open and buffers the latest ``buffer_size`` frames.
+
+    The first ``warmup_frames`` frames after opening are discarded so that
+    auto-exposure has settled before anything lands in the buffer.
+    """
+
+    def __init__(self, source, buffer_size: int = 8, warmup_frames: int = 5, fps: float = None):
+        self.source = source
+        self.warmup_frames = warmup_frames
+        self.interval = 1.0 / fps if fps else 0.0
+        self.error = None
+        self.frame_count = 0  # frames buffered since start, including ones that were never read
+        self._buffer = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Open the source and start the reader thread. Returns False if the source failed to open."""
+        if self.running:
+            return True
+        if not self.source.open():
+            self.error = "Could not open frame source."
+            return False
+        self.error = None
+        if not self.interval and getattr(self.source, "fps", None):
+            # play recordings back at their own frame rate
+            self.interval = 1.0 / self.source.fps
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="capture-service", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        self.source.close()
+
+    def _run(self):
+        skipped = 0
+        while not self._stop.is_set():
+            started = time.monotonic()
+            frame = self.source.read()
+            if frame is None:
+                # end of a finite source or a transient device error
+                if getattr(self.source, "exhausted", False):
+                    break
+                time.sleep(0.05)
+                continue
+            if skipped < self.warmup_frames:
+                skipped += 1
+                continue
+            with self._new_frame:
+                self._buffer.append((time.time(), frame))
+                self.frame_count += 1
+                self._new_frame.notify_all()
+            if self.interval:
+                remaining = self.interval - (time.monotonic() - started)
+                if remaining > 0:
+                    self._stop.wait(remaining)
+
+    def wait_for_frame(self, timeout: float = 5.0) -> bool:
+        """Block until at least one frame is buffered."""
+        with self._new_frame:
+            return self._new_frame.wait_for(lambda: bool(self._buffer), timeout=timeout)
+
+    def frames(self):
+        """Snapshot of the buffered ``(timestamp, frame)`` pairs, oldest first."""
+        with self._lock:
+            return list(self._buffer)
+
+    def latest_with_time(self):
+        """Newest buffered ``(timestamp, frame)`` plus the running frame count, or (None, None, count)."""
+        with self._lock:
+            if not self._buffer:
+                return None, None, self.frame_count
+            timestamp, frame = self._buffer[-1]
+            return timestamp, frame, self.frame_count
+
+    def latest(self):
+        """Newest buffered frame, or None."""
+        with self._lock:
+            return self._buffer[-1][1] if self._buffer else None
+
+    def sharpest(self):
+        """Sharpest buffered frame, or None. Useful to avoid motion blur."""
+        buffered = self.frames()
+        if not buffered:
+            return None
+        return max((frame for _, frame in buffered), key=sharpness)
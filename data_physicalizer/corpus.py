@@ -0,0 +1,299 @@
+"""Synthetic whiteboard corpus with ground truth, for offline benchmarks.
+
+    python -m data_physicalizer.corpus OUT_DIR [--count 24] [--seed 0]
+
+Each sample is a board rendered with OpenCV's Hershey fonts: bullet notes,
+``key: value`` lines or a table (optionally ruled). Known degradations are
+applied on top: rotation (skew), a glare spot, a shading gradient, blur
+and sensor noise. The ground truth keeps the text lines, the table rows,
+the word boxes (after rotation) and the applied degradations, so OCR
+accuracy, table parsing and deskew can all be scored. The same seed always
+produces the same corpus. render_sample(..., edit="add"/"change", frame=N)
+renders the same board a moment later, with a row written or a cell
+rewritten, for the incremental benchmark.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+import cv2
+import numpy as np
+
+
+KINDS = ("notes", "kv", "table")
+WORDS = ["alpha", "beta", "gamma", "delta", "north", "south", "east", "west", "budget", "launch", "review",
+         "design", "sprint", "hiring", "revenue", "costs", "target", "risk", "owner", "status", "draft", "final"]
+HEADERS = ["Item", "Owner", "Qty", "Price", "Date", "Region", "Units", "Status"]
+INKS = [(40, 30, 20), (140, 60, 20), (30, 30, 160), (40, 110, 30)]  # BGR: black, blue, red, green marker
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+class Sample:
+    """One rendered board and its ground truth."""
+
+    def __init__(self, name, kind, image, lines, table=None, words=None, degradations=None):
+        self.name = name
+        self.kind = kind
+        self.image = image
+        self.lines = lines
+        self.table = table
+        self.words = words or []
+        self.degradations = degradations or {}
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    def to_dict(self):
+        return {"name": self.name, "kind": self.kind, "lines": self.lines, "table": self.table,
+                "words": self.words, "degradations": self.degradations}
+
+
+# --- Content ---
+def _cell(header: str, rng: random.Random) -> str:
+    if header in ("Qty", "Units"):
+        return str(rng.randint(1, 500))
+    if header == "Price":
+        return f"{rng.randint(1, 999)}.{rng.randint(0, 99):02d}"
+    if header == "Date":
+        return f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    return rng.choice(WORDS)
+
+
+def _content(kind: str, rng: random.Random):
+    """(rows of cells, table or None). Non-table kinds have one cell per row."""
+    if kind == "table":
+        headers = rng.sample(HEADERS, rng.randint(3, 4))
+        table = [headers] + [[_cell(h, rng) for h in headers] for _ in range(rng.randint(4, 7))]
+        return table, table
+    if kind == "kv":
+        keys = rng.sample(WORDS, rng.randint(4, 7))
+        return [[f"{k}: {rng.choice([str(rng.randint(1, 9999)), rng.choice(WORDS)])}"] for k in keys], None
+    return [["- " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))) + f" {rng.randint(1, 99)}"]
+            for _ in range(rng.randint(4, 8))], None
+
+
+def _edit(rows, table, edit: str, rng: random.Random):
+    """Apply `edit` to a copy of the content: "add" a row/line at the end or "change" one cell.
+
+    New cells are kept no wider (in characters) than their column, so the layout of the rest of the board
+    does not move - as when someone writes one more line on a real board.
+    """
+    rows = [list(r) for r in rows]
+    widths = [max(len(r[c]) for r in rows) for c in range(len(rows[0]))]
+
+    def fits(make, c):
+        for _ in range(20):
+            value = make()
+            if len(value) <= widths[c]:
+                return value
+        return rows[-1][c]
+
+    if table is not None:
+        headers = rows[0]
+        if edit == "add":
+            rows.append([fits(lambda h=h: _cell(h, rng), c) for c, h in enumerate(headers)])
+        elif edit == "change":
+            r, c = rng.randrange(1, len(rows)), rng.randrange(len(headers))
+            rows[r][c] = fits(lambda: _cell(headers[c], rng), c)
+        return rows, rows
+    if edit == "add":
+        new, _ = _content("notes" if rows[0][0].startswith("- ") else "kv", rng)
+        rows.append([fits(lambda: new[rng.randrange(len(new))][0], 0)])
+    elif edit == "change":
+        r = rng.randrange(len(rows))
+        words = rows[r][0].split(" ")
+        words[-1] = fits(lambda: str(rng.randint(1, 99)), 0) if words[-1].isdigit() else rng.choice(WORDS)
+        rows[r] = [" ".join(words)]
+    return rows, None
+
+
+# --- Rendering ---
+def _render(rows, size, rng: random.Random, ruled: bool):
+    """Draw `rows` on a blank board. Returns (image, word boxes as [text, x0, y0, x1, y1])."""
+    h, w = size
+    board = np.full((h, w, 3), rng.randint(232, 250), dtype=np.uint8)
+    ink = rng.choice(INKS)
+    scale = rng.uniform(1.0, 1.3)
+    thickness = 2 if scale < 1.2 else 3
+    (_, text_h), _ = cv2.getTextSize("Ag", FONT, scale, thickness)
+    line_h = int(text_h * 2.4)
+    cols = len(rows[0])
+    col_w = [max(cv2.getTextSize(r[c], FONT, scale, thickness)[0][0] for r in rows) + int(40 * scale)
+             for c in range(cols)]
+    x0 = int(w * rng.uniform(0.06, 0.12))
+    y0 = int(h * rng.uniform(0.1, 0.16)) + text_h
+    boxes = []
+    for r, row in enumerate(rows):
+        y = y0 + r * line_h
+        x = x0
+        for c, cell in enumerate(row):
+            cv2.putText(board, cell, (x, y), FONT, scale, ink, thickness, cv2.LINE_AA)
+            # word-level boxes, as an OCR engine would report them
+            wx = x
+            for word in cell.split(" "):
+                ww = cv2.getTextSize(word, FONT, scale, thickness)[0][0]
+                boxes.append([word, wx, y - text_h, wx + ww, y + int(text_h * 0.3)])
+                wx += ww + cv2.getTextSize(" ", FONT, scale, thickness)[0][0]
+            x += col_w[c]
+    if ruled:
+        # grid lines halfway between rows and just left of each column
+        gap = (line_h - 1.3 * text_h) / 2.0
+        ys = [int(y0 + r * line_h - text_h - gap) for r in range(len(rows) + 1)]
+        xs = [x0 - 15 + sum(col_w[:c]) for c in range(cols + 1)]
+        for y in ys:
+            cv2.line(board, (xs[0], y), (xs[-1], y), ink, 2)
+        for x in xs:
+            cv2.line(board, (x, ys[0]), (x, ys[-1]), ink, 2)
+    return board, boxes
+
+
+def _rotate(image, boxes, angle: float):
+    """Rotate the board about its centre (background colour fills the corners) and its word boxes with it."""
+    h, w = image.shape[:2]
+    m = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), angle, 1.0)
+    fill = tuple(int(v) for v in image[2, 2])
+    rotated = cv2.warpAffine(image, m, (w, h), flags=cv2.INTER_LINEAR, borderValue=fill)
+    out = []
+    for text, bx0, by0, bx1, by1 in boxes:
+        corners = np.array([[bx0, by0, 1], [bx1, by0, 1], [bx0, by1, 1], [bx1, by1, 1]], dtype=np.float64) @ m.T
+        out.append([text, int(corners[:, 0].min()), int(corners[:, 1].min()),
+                    int(corners[:, 0].max()), int(corners[:, 1].max())])
+    return rotated, out
+
+
+def _degrade(image, rng: random.Random, nrng, glare: float, shade: float, blur: int, noise: float):
+    img = image.astype(np.float32)
+    h, w = img.shape[:2]
+    yy, xx = np.mgrid[0:h, 0:w].astype(np.float32)
+    if shade:
+        # lighting falls off across the board
+        img *= (1.0 - shade * (xx / w))[..., None]
+    if glare:
+        # a washed-out spot from a window or ceiling light
+        cx, cy, radius = rng.uniform(0.2, 0.8) * w, rng.uniform(0.2, 0.8) * h, rng.uniform(0.15, 0.3) * w
+        spot = np.exp(-((xx - cx) ** 2 + (yy - cy) ** 2) / (2 * radius ** 2))
+        img += glare * spot[..., None] * (255.0 - img)
+    if blur:
+        img = cv2.GaussianBlur(img, (blur, blur), 0)
+    if noise:
+        img += nrng.normal(0.0, noise, img.shape).astype(np.float32)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def render_sample(index: int, seed: int = 0, kind: str = None, size=(960, 1280), edit: str = None,
+                  frame: int = 0) -> Sample:
+    """Render sample `index` of the corpus for `seed`; `kind` defaults to cycling through KINDS.
+
+    `edit` ("add" or "change") renders the same board after one more row/line was written or one cell was
+    rewritten; everything else (layout, skew, lighting) stays put. `frame` > 0 draws fresh sensor noise,
+    as a later camera frame of the same board would have.
+    """
+    rng = random.Random(seed * 1000003 + index)
+    nrng = np.random.default_rng([seed, index, frame] if frame else [seed, index])
+    kind = kind or KINDS[index % len(KINDS)]
+    rows, table = _content(kind, rng)
+    if edit:
+        rows, table = _edit(rows, table, edit, random.Random(seed * 7919 + index))
+    ruled = kind == "table" and rng.random() < 0.5
+    image, boxes = _render(rows, size, rng, ruled)
+    # roughly a third of the boards are clean, the rest get a mix of degradations
+    clean = rng.random() < 0.3
+    degradations = {
+        "skew": 0.0 if clean else round(rng.choice([-1, 1]) * rng.uniform(0.5, 8.0), 2),
+        "glare": 0.0 if clean or rng.random() < 0.5 else round(rng.uniform(0.3, 0.7), 2),
+        "shade": 0.0 if clean or rng.random() < 0.5 else round(rng.uniform(0.1, 0.3), 2),
+        "blur": 0 if clean or rng.random() < 0.6 else rng.choice([3, 5]),
+        "noise": 0.0 if clean else round(rng.uniform(2.0, 12.0), 1),
+        "ruled": ruled,
+    }
+    if degradations["skew"]:
+        image, boxes = _rotate(image, boxes, degradations["skew"])
+    image = _degrade(image, rng, nrng, degradations["glare"], degradations["shade"], degradations["blur"],
+                     degradations["noise"])
+    lines = ["    ".join(row) for row in rows]
+    return Sample(f"{kind}_{index:03d}", kind, image, lines, table, boxes, degradations)
+
+
+def generate(count: int = 24, seed: int = 0, size=(960, 1280)):
+    """The first `count` samples of the corpus for `seed`."""
+    return [render_sample(i, seed, size=size) for i in range(count)]
+
+
+def save(samples, out_dir: str) -> str:
+    """Write each sample as a PNG plus one corpus.json with the ground truth. Returns the manifest path."""
+    os.makedirs(out_dir, exist_ok=True)
+    entries = []
+    for sample in samples:
+        filename = f"{sample.name}.png"
+        cv2.imwrite(os.path.join(out_dir, filename), sample.image)
+        entries.append(dict(sample.to_dict(), file=filename))
+    manifest = os.path.join(out_dir, "corpus.json")
+    with open(manifest, "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=1)
+    return manifest
+
+
+def load(out_dir: str):
+    """Read a corpus written by save()."""
+    with open(os.path.join(out_dir, "corpus.json"), encoding="utf-8") as f:
+        entries = json.load(f)
+    return [Sample(e["name"], e["kind"], cv2.imread(os.path.join(out_dir, e["file"])), e["lines"], e["table"],
+                   e["words"], e["degradations"]) for e in entries]
+
+
+# --- Scoring ---
+def edit_distance(a, b) -> int:
+    """Levenshtein distance between two sequences."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def char_error_rate(predicted: str, truth: str) -> float:
+    """Edit distance over the ground-truth length, ignoring case and runs of whitespace."""
+    predicted = " ".join((predicted or "").lower().split())
+    truth = " ".join((truth or "").lower().split())
+    if not truth:
+        return 0.0 if not predicted else 1.0
+    return edit_distance(predicted, truth) / float(len(truth))
+
+
+def cell_accuracy(predicted, truth) -> float:
+    """Share of ground-truth cells found at the same row and column of `predicted` (case-insensitive)."""
+    if not truth:
+        return 0.0
+    total = sum(len(row) for row in truth)
+    if not predicted:
+        return 0.0
+    hits = 0
+    for r, row in enumerate(truth):
+        if r >= len(predicted):
+            break
+        for c, cell in enumerate(row):
+            if c < len(predicted[r]) and str(predicted[r][c]).strip().lower() == cell.lower():
+                hits += 1
+    return hits / float(total)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic whiteboard corpus with ground truth.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--count", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    manifest = save(generate(args.count, args.seed), args.out_dir)
+    print(f"Wrote {args.count} samples and {manifest}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,363 @@
+"""Asyncio console session for the Data Physicalizer agent.
+
+    python -m data_physicalizer.driver
+
+Console input is read on a worker thread and queued, and requests are handled
+one at a time from the queue. While a request waits on the rate limiter
+(e.g. after a 429), the console keeps accepting input; new requests simply
+queue up behind it. Camera capture, OCR and export run on worker threads.
+On "Physicalize" the OCR of the new frame starts alongside the model call,
+so choosing 1 or 2 afterwards usually finds the text in the cache. The
+upload itself is cropped, downscaled and recompressed first (see payload.py).
+Sessions persist in sqlite across restarts, and the history replayed to
+the model is compacted before each call (see sessions.py).
+
+With PHYSICALIZER_INCREMENTAL=1 a board that changed only in places is
+diffed against the previous capture: only the changed text blocks are
+OCR'd, and the model gets the added/changed rows plus a crop of the changed
+area instead of the whole board (see incremental.py).
+
+Set PHYSICALIZER_MODEL=fake:2 to drive the session against a local fake
+model whose first two calls return 429.
+"""
+import asyncio
+import json
+import sys
+
+from google.adk import runners
+from google.genai import types
+
+from . import agent, ocr_engines, sessions, tracing
+from .capture import Frame
+from .incremental import IncrementalBoard, incremental_enabled, union_box
+from .payload import PayloadPolicy, build_payload, ocr_confidence
+from .ratelimit import RateLimiter, is_rate_limit_error, retry_after
+
+
+PHYSICALIZE_PROMPT = ("Please analyze this whiteboard image and extract all the data/notes you can see. "
+                      "Then ask me if I want it as a list or table.")
+TEXT_ONLY_PROMPT = ("Here is the OCR text of my whiteboard. Summarize all the data/notes in it. "
+                    "Then ask me if I want it as a list or table.\n\n")
+DELTA_PROMPT = ("My whiteboard changed since the last capture. Local OCR found these changes (the attached image, "
+                "if any, shows the changed area):\n\n")
+DELTA_PROMPT_END = "\n\nUpdate your summary of the board accordingly. Then ask me if I want it as a list or table."
+
+
+def build_runner(root_agent=None):
+    return runners.Runner(
+        app_name="DataPhysicalizerApp",
+        agent=root_agent or agent.root_agent,
+        session_service=sessions.build_session_service(),
+        auto_create_session=True,
+    )
+
+
+def physicalize_message(payload):
+    """User message for a Physicalize turn: the prepared image, or the OCR text for text-only payloads."""
+    if payload.text_only:
+        return types.Content(role="user", parts=[types.Part(text=TEXT_ONLY_PROMPT + payload.text)])
+    return types.Content(role="user", parts=[
+        types.Part(text=PHYSICALIZE_PROMPT),
+        types.Part(inline_data=types.Blob(mime_type=payload.mime_type, data=payload.data)),
+    ])
+
+
+def delta_message(delta, payload=None):
+    """User message for an incremental Physicalize: what changed, plus the changed area's image if given."""
+    parts = [types.Part(text=DELTA_PROMPT + delta.describe() + DELTA_PROMPT_END)]
+    if payload is not None and not payload.text_only:
+        parts.append(types.Part(inline_data=types.Blob(mime_type=payload.mime_type, data=payload.data)))
+    return types.Content(role="user", parts=parts)
+
+
+def ocr_with_confidence(frame, gate=None):
+    """OCR text and mean word confidence of a frame; (None, None) if OCR fails."""
+    text, words, err = agent.ocr_frame_layout(frame, gate)
+    if err:
+        return None, None
+    return text, (ocr_confidence(words) if words is not None else None)
+
+
+class SessionDriver:
+    """Serialises one console session's requests through a queue and a shared RateLimiter."""
+
+    def __init__(self, runner, limiter: RateLimiter = None, user_id: str = "user1", session_id: str = "session1",
+                 max_retries: int = 3, out=print, gate=None):
+        self.runner = runner
+        self.limiter = limiter or RateLimiter.from_env()
+        self.user_id = user_id
+        self.session_id = session_id
+        self.max_retries = max_retries
+        self.out = out
+        # frames seen before, with their OCR text and summary; sessions of one server each have their own
+        self.gate = gate if gate is not None else agent.get_frame_gate()
+        self.payload_policy = PayloadPolicy.from_env()
+        self.run_config = sessions.run_config()
+        # boards diffed against the previous capture need an OCR engine that can read crops
+        self.board = (IncrementalBoard() if incremental_enabled() and ocr_engines.default_engine_name() is not None
+                      else None)
+        self.queue = asyncio.Queue()
+        self.busy = False
+        self.last_summary = ""  # store last text output by agent
+        self.stats = {"model_calls": 0, "rate_limited": 0, "reused_summaries": 0, "waited_seconds": 0.0,
+                      "bytes_saved": 0, "tokens_saved": 0, "incremental_updates": 0}
+
+    # --- Requests ---
+    def submit(self, text: str):
+        """Queue a console line; tell the user when it has to wait behind other work."""
+        if self.busy or not self.queue.empty():
+            blocked = self.limiter.blocked_for
+            reason = f"rate limited, retrying in {blocked:.0f}s" if blocked else "busy"
+            self.out(f"[System] Queued '{text}' ({reason}; {self.queue.qsize() + 1} waiting).")
+        self.queue.put_nowait(text)
+
+    async def worker(self):
+        while True:
+            text = await self.queue.get()
+            self.busy = True
+            try:
+                await self.handle(text)
+            except Exception as e:
+                self.out(f"\n[System] Error: {e}")
+            finally:
+                self.busy = False
+                self.queue.task_done()
+
+    async def handle(self, text: str):
+        with tracing.span("request", input=text.strip()[:40]):
+            await self._handle(text)
+
+    async def _handle(self, text: str):
+        choice = text.strip()
+        if choice.lower() == "physicalize":
+            await self.physicalize()
+        elif choice in ("1", "2"):
+            await asyncio.to_thread(self.export, choice)
+        elif choice:
+            await self.ask_model(types.Content(role="user", parts=[types.Part(text=text)]))
+
+    # --- Model ---
+    async def ask_model(self, message, frame=None):
+        """Run one agent turn, retrying 429s through the rate limiter. Returns the last text or None.
+
+        `frame` is the captured frame the message is about; the capture_vision_frame tool reads it.
+        """
+        token = agent.current_frame.set(frame)
+        gate_token = agent.current_gate.set(self.gate)
+        try:
+            return await self._ask_model(message)
+        finally:
+            agent.current_gate.reset(gate_token)
+            agent.current_frame.reset(token)
+
+    async def _ask_model(self, message):
+        for attempt in range(self.max_retries + 1):
+            # time spent here is the rate limiter's pacing and any 429 backoff
+            with tracing.span("ratelimit.acquire") as sp:
+                waited = await self.limiter.acquire()
+                sp.set(waited_s=round(waited, 3))
+            self.stats["waited_seconds"] += waited
+            self.stats["model_calls"] += 1
+            tracing.count("model.calls")
+            last_text = None
+            try:
+                with tracing.span("model.run", attempt=attempt):
+                    async for event in self.runner.run_async(user_id=self.user_id, session_id=self.session_id,
+                                                             new_message=message, run_config=self.run_config):
+                        if event.content and event.content.parts:
+                            for part in event.content.parts:
+                                if part.text:
+                                    self.out(f"\nAgent: {part.text}")
+                                    last_text = part.text
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                self.stats["rate_limited"] += 1
+                tracing.count("model.rate_limited")
+                if attempt == self.max_retries:
+                    break
+                delay = self.limiter.on_rate_limited(retry_after(e))
+                self.out(f"\n[System] API rate limit hit (attempt {attempt + 1}/{self.max_retries}). "
+                         f"Retrying in {delay:.0f}s; new requests are queued meanwhile.")
+                continue
+            self.limiter.on_success()
+            if last_text:
+                self.last_summary = last_text
+            return last_text
+        self.out("\n[System] Max retries exceeded. API quota is exhausted.")
+        self.out("[System] Please wait 15-30 minutes and try again.")
+        return None
+
+    async def physicalize(self, frame=None, update=None, diff: bool = True):
+        """Summarize a frame (default: grab one from the camera) with the agent. Returns the summary or None.
+
+        `update` is the frame's IncrementalBoard.update() result when the caller already computed it.
+        `diff=False` skips the board update (e.g. the caller's own update failed and it reset the board).
+        """
+        capture_err = None
+        if frame is None:
+            with tracing.span("capture.grab"):
+                frame, capture_err = await asyncio.to_thread(agent.grab_frame)
+        if frame is None:
+            self.out(f"\n[System] {capture_err}")
+            return await self.ask_model(types.Content(role="user", parts=[types.Part(text="Physicalize")]))
+        # an unchanged board reuses the previous summary: no upload, no model call. A board whose
+        # update found changed text skips the gate, which may still match it to the previous board.
+        cached = self.gate.lookup(frame.image) if update is None or update.delta.empty else None
+        if cached and cached.get("summary"):
+            self.stats["reused_summaries"] += 1
+            tracing.count("frame_gate.summary_reused")
+            self.out("\n[System] Board unchanged since a recent capture; reusing the previous summary.")
+            self.out(f"\nAgent: {cached['summary']}")
+            self.last_summary = cached["summary"]
+            return cached["summary"]
+        if update is None and diff and self.board is not None:
+            try:
+                update = await asyncio.to_thread(self.board.update, frame)
+                self.out(update.describe())
+            except Exception as e:
+                self.out(f"[System] Incremental update failed ({e}); sending the whole board.")
+                self.board.reset()
+        if update is not None:
+            # the board's text is this frame's OCR text; later OCR and exports reuse it
+            self.gate.remember(frame.image, replace=not update.delta.empty, ocr_text=update.text)
+            if update.incremental and self.last_summary:
+                return await self.physicalize_delta(frame, update)
+        ocr = None
+        ocr_text = ocr_conf = None
+        if ocr_engines.default_engine_name() is not None:
+            if self.payload_policy.text_only_conf is not None:
+                # deciding whether text alone is enough needs the OCR result first
+                ocr_text, ocr_conf = await asyncio.to_thread(ocr_with_confidence, frame, self.gate)
+            else:
+                # warm the OCR cache while the model is working
+                ocr = asyncio.create_task(asyncio.to_thread(agent.ocr_frame, frame, self.gate))
+        payload = await asyncio.to_thread(build_payload, frame, self.payload_policy, ocr_text, ocr_conf)
+        self.record_payload(payload, ocr_text)
+        try:
+            summary = await self.ask_model(physicalize_message(payload), frame)
+        finally:
+            if ocr is not None:
+                result = (await asyncio.gather(ocr, return_exceptions=True))[0]
+                if isinstance(result, tuple) and not result[1]:
+                    self.remember_ocr(payload, result[0])
+        if summary:
+            self.gate.remember(frame.image, summary=summary)
+        return summary
+
+    async def physicalize_delta(self, frame, update):
+        """Tell the agent only what changed on the board, with a crop of the changed area."""
+        if update.delta.empty:
+            self.stats["reused_summaries"] += 1
+            self.out("\n[System] No text changed since the last capture; keeping the previous summary.")
+            self.out(f"\nAgent: {self.last_summary}")
+            self.gate.remember(frame.image, summary=self.last_summary)
+            return self.last_summary
+        self.stats["incremental_updates"] += 1
+        tracing.count("incremental.model_updates")
+        x, y, w, h = union_box(update.changed)
+        pad = 24
+        crop = frame.image[max(0, y - pad):y + h + pad, max(0, x - pad):x + w + pad]
+        payload = await asyncio.to_thread(build_payload, Frame(crop), self.payload_policy)
+        self.record_payload(payload)
+        summary = await self.ask_model(delta_message(update.delta, payload), frame)
+        if summary:
+            self.gate.remember(frame.image, summary=summary)
+        return summary
+
+    def record_payload(self, payload, ocr_text: str = None):
+        if payload.stats["original_bytes"] is not None:
+            self.stats["bytes_saved"] += payload.stats["original_bytes"] - payload.stats["sent_bytes"]
+        self.stats["tokens_saved"] += payload.stats["original_tokens"] - payload.stats["sent_tokens"]
+        if not payload.text_only:
+            sessions.remember_image(payload.data, ocr_text, payload.stats.get("width"), payload.stats.get("height"))
+        self.out(payload.describe())
+
+    @staticmethod
+    def remember_ocr(payload, text: str):
+        """Let later turns refer to an uploaded image by its OCR text instead of resending it."""
+        if text and not payload.text_only:
+            sessions.remember_image(payload.data, text)
+
+    # --- Local export (no model call) ---
+    def export(self, choice: str):
+        frame = agent.get_last_frame()
+        if frame is None:
+            self.out("[System] No captured image found. Say 'Physicalize' first to capture an image.")
+            return
+        # if no OCR engine is installed, fallback to agent-provided summary
+        if ocr_engines.default_engine_name() is None:
+            self.out("[System] No OCR engine installed, using the agent's summary instead of OCR.")
+            text, err = self.last_summary, None
+        else:
+            text, err = agent.ocr_frame(frame, self.gate)
+        if err:
+            self.out(f"[System] OCR error: {err}. Please install Tesseract and the Python package pytesseract.")
+            self.out("Install instructions: https://github.com/tesseract-ocr/tesseract and pip install pytesseract")
+            # still allow using agent summary
+            text = self.last_summary
+
+        if choice == "1":
+            self.out(agent.export_to_pdf(text, mode="summary"))
+            return
+        # Table mode: the incremental board already holds the merged table; otherwise rebuild the
+        # grid from word positions, else parse the OCR output or summary
+        if self.board is not None and self.board.text is not None and self.board.text == text:
+            table = self.board.table
+        else:
+            table = agent.extract_table(frame, text)
+        if not table:
+            self.out("[System] Unable to infer a table from the extracted text. Falling back to summary PDF.")
+            self.out(agent.export_to_pdf(text, mode="summary"))
+            return
+        self.out(agent.export_to_pdf(json.dumps(table), mode="table"))
+
+
+async def run_console(runner=None, limiter: RateLimiter = None, first_input: str = "Physicalize"):
+    """Interactive loop. Returns the driver (for its stats) after quit/exit or end of input."""
+    driver = SessionDriver(runner or build_runner(), limiter)
+    worker = asyncio.create_task(driver.worker())
+    print("--- 🤖 Data Physicalizer Session Started ---")
+    if first_input:
+        driver.submit(first_input)
+    try:
+        while True:
+            try:
+                line = await asyncio.to_thread(input, "\nYou: ")
+            except EOFError:
+                # piped input: finish what was asked before leaving
+                await driver.queue.join()
+                break
+            if line.strip().lower() in ("quit", "exit"):
+                break
+            driver.submit(line)
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+    return driver
+
+
+def main():
+    agent.load_env()
+    # load the OCR engine (e.g. easyocr's torch model) while the user gets ready
+    ocr_engines.warm_up()
+    try:
+        driver = asyncio.run(run_console())
+    except KeyboardInterrupt:
+        return 0
+    # bytes are only counted for frames whose full JPEG was at hand to compare against
+    saved_kb = f" and {driver.stats['bytes_saved'] / 1024:.0f} KB" if driver.stats["bytes_saved"] else ""
+    print(f"[System] {driver.stats['model_calls']} model call(s), {driver.stats['rate_limited']} rate limited, "
+          f"{driver.stats['waited_seconds']:.1f}s waiting on the rate limiter, "
+          f"~{driver.stats['tokens_saved']} tokens{saved_kb} of uploads saved.")
+    if driver.board is not None:
+        print(f"[System] {driver.stats['incremental_updates']} board update(s) sent as deltas.")
+    print(sessions.get_compactor().describe(driver.user_id, driver.session_id, driver.runner.session_service))
+    tracer = tracing.get_tracer()
+    if tracer is not None:
+        tracing.report(tracing.summarize(tracing.collected_events(tracer)), out=lambda line: print(f"[Trace] {line}"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""Export backends: PDF, CSV, JSON Lines, JSON, Markdown and (with openpyxl) XLSX.
+
+Every exporter writes either a table (rows, header first) or a summary (one
+note per line) and consumes its input as a stream, so large tables are never
+copied. Files are written under a temporary name while the content is hashed
+and then renamed to ``physicalized_{mode}_{hash}.{ext}``: the same data always
+lands at the same path, different data never overwrites an earlier export,
+and concurrent sessions cannot clobber each other's files.
+
+PHYSICALIZER_EXPORT_DIR sets the output directory (default: the current
+directory). Backend libraries (fpdf, openpyxl) are imported on first use.
+"""
+import csv
+import hashlib
+import json
+import os
+import threading
+
+from .ocr_engines import module_available
+
+
+MODES = ("summary", "table")
+
+
+class Exporter:
+    """Base class: write a table or a summary to `path`. Both methods return a stats dict."""
+
+    name = None
+    extension = None
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return True
+
+    def write_table(self, rows, path: str) -> dict:
+        raise NotImplementedError
+
+    def write_summary(self, lines, path: str) -> dict:
+        raise NotImplementedError
+
+
+_exporters = {}
+
+
+def register_exporter(cls):
+    """Register an Exporter subclass under its `name`. Usable as a class decorator."""
+    _exporters[cls.name] = cls
+    return cls
+
+
+def available_formats():
+    """Names of the registered exporters whose dependencies are installed."""
+    return [name for name, cls in _exporters.items() if cls.is_available()]
+
+
+def get_exporter(fmt: str) -> Exporter:
+    """Return an exporter instance for `fmt`. Raises LookupError if unknown or unavailable."""
+    cls = _exporters.get((fmt or "").lower().lstrip("."))
+    if cls is None:
+        raise LookupError(f"Unknown export format '{fmt}'. Available: {', '.join(available_formats())}.")
+    if not cls.is_available():
+        raise LookupError(f"Export format '{fmt}' is not available (missing optional dependency).")
+    return cls()
+
+
+# --- Exporters ---
+@register_exporter
+class PdfExporter(Exporter):
+    name = "pdf"
+    extension = "pdf"
+
+    def write_table(self, rows, path):
+        from .pdf_export import render_table
+        return render_table(rows, path)
+
+    def write_summary(self, lines, path):
+        from .pdf_export import render_summary
+        return render_summary(lines, path)
+
+
+@register_exporter
+class CsvExporter(Exporter):
+    name = "csv"
+    extension = "csv"
+
+    def write_table(self, rows, path):
+        count = 0
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        return {"rows": max(count - 1, 0)}
+
+    def write_summary(self, lines, path):
+        return self.write_table(_summary_rows(lines), path)
+
+
+def unique_keys(header, width: int = 0):
+    """Header names usable as object keys: repeats get ``_2``, ``_3``..., blanks and extra columns ``column_N``."""
+    keys = []
+    taken = set()
+    names = [str(h) for h in header]
+    names += [""] * (width - len(names))
+    for i, name in enumerate(names):
+        base = name or f"column_{i + 1}"
+        key, n = base, 1
+        while key in taken:
+            n += 1
+            key = f"{base}_{n}"
+        taken.add(key)
+        keys.append(key)
+    return keys
+
+
+@register_exporter
+class JsonlExporter(Exporter):
+    """One JSON object per line: body rows keyed by header, or ``{"note": ...}`` per summary line."""
+
+    name = "jsonl"
+    extension = "jsonl"
+
+    def write_table(self, rows, path):
+        rows = iter(rows)
+        header = list(next(rows, []))
+        keys = unique_keys(header)
+        count = 0
+        with open(path, "w", encoding="utf-8") as f:
+            for row in rows:
+                if len(row) > len(keys):
+                    # cells beyond the header get keys of their own instead of being dropped
+                    keys = unique_keys(header, len(row))
+                f.write(json.dumps(dict(zip(keys, row)), ensure_ascii=False))
+                f.write("\n")
+                count += 1
+        return {"rows": count}
+
+    def write_summary(self, lines, path):
+        return self.write_table(_summary_rows(lines, header="note"), path)
+
+
+@register_exporter
+class JsonExporter(Exporter):
+    """``{"mode": ..., "rows": [...]}`` (header first) or ``{"mode": ..., "lines": [...]}``, written row by row."""
+
+    name = "json"
+    extension = "json"
+
+    def _write(self, mode, key, items, path):
+        count = 0
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f'{{"mode": "{mode}", "{key}": [')
+            for item in items:
+                f.write(",\n  " if count else "\n  ")
+                f.write(json.dumps(item, ensure_ascii=False))
+                count += 1
+            f.write("\n]}\n" if count else "]}\n")
+        return count
+
+    def write_table(self, rows, path):
+        return {"rows": max(self._write("table", "rows", rows, path) - 1, 0)}
+
+    def write_summary(self, lines, path):
+        return {"lines": self._write("summary", "lines", _clean_lines(lines), path)}
+
+
+@register_exporter
+class MarkdownExporter(Exporter):
+    name = "md"
+    extension = "md"
+
+    @staticmethod
+    def _cell(value) -> str:
+        return str(value).replace("\\", "\\\\").replace("|", "\\|").replace("\n", " ")
+
+    def write_table(self, rows, path):
+        rows = iter(rows)
+        header = next(rows, None)
+        if not header:
+            raise ValueError("table has no header row")
+        n = len(header)
+        count = 0
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("| " + " | ".join(self._cell(h) for h in header) + " |\n")
+            f.write("|" + " --- |" * n + "\n")
+            for row in rows:
+                cells = [self._cell(c) for c in row[:n]] + [""] * (n - len(row))
+                f.write("| " + " | ".join(cells) + " |\n")
+                count += 1
+        return {"rows": count}
+
+    def write_summary(self, lines, path):
+        count = 0
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("# Summary of Captured Notes\n\n")
+            for line in _clean_lines(lines):
+                f.write(f"- {line}\n")
+                count += 1
+        return {"lines": count}
+
+
+@register_exporter
+class XlsxExporter(Exporter):
+    name = "xlsx"
+    extension = "xlsx"
+
+    @classmethod
+    def is_available(cls):
+        return module_available("openpyxl")  # optional, for XLSX
+
+    def write_table(self, rows, path):
+        import openpyxl
+
+        # write-only workbooks stream rows to disk instead of building the sheet in memory
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet("Data")
+        count = 0
+        for row in rows:
+            sheet.append(list(row))
+            count += 1
+        workbook.save(path)
+        return {"rows": max(count - 1, 0)}
+
+    def write_summary(self, lines, path):
+        return self.write_table(_summary_rows(lines), path)
+
+
+def _clean_lines(lines):
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def _summary_rows(lines, header="Note"):
+    yield [header]
+    for line in _clean_lines(lines):
+        yield [line]
+
+
+# --- Content-addressed output ---
+def export_dir() -> str:
+    return os.getenv("PHYSICALIZER_EXPORT_DIR", ".")
+
+
+def _hashed(items, digest):
+    """Pass `items` through unchanged while feeding each one into `digest`."""
+    for item in items:
+        digest.update(json.dumps(item, ensure_ascii=False, default=str).encode())
+        digest.update(b"\n")
+        yield item
+
+
+def export(data, fmt: str = "pdf", mode: str = "table", out_dir: str = None, filename: str = None):
+    """Write `data` (table rows, header first, or summary lines) in format `fmt`.
+
+    Without `filename` the file is named after a hash of the content, format
+    and mode, under `out_dir` (default PHYSICALIZER_EXPORT_DIR). Returns
+    ``(path, stats)``. Raises LookupError for unknown formats and ValueError
+    for an unknown mode or empty table.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}'. Use 'summary' or 'table'.")
+    exporter = get_exporter(fmt)
+    write = exporter.write_table if mode == "table" else exporter.write_summary
+    if filename:
+        return filename, write(data, filename)
+
+    out_dir = out_dir or export_dir()
+    os.makedirs(out_dir, exist_ok=True)
+    digest = hashlib.blake2b(f"{exporter.name}|{mode}\n".encode(), digest_size=8)
+    tmp = os.path.join(out_dir, f".physicalized_{os.getpid()}_{threading.get_ident()}.{exporter.extension}.tmp")
+    try:
+        stats = write(_hashed(data, digest), tmp)
+        path = os.path.join(out_dir, f"physicalized_{mode}_{digest.hexdigest()}.{exporter.extension}")
+        # atomic; an existing file with this name already holds the same content
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path, stats
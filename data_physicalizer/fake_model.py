@@ -0,0 +1,47 @@
+"""Local stand-in for Gemini, for exercising the session driver offline.
+
+Select it with PHYSICALIZER_MODEL=fake (always answers) or fake:N (the
+first N calls fail with a 429 RESOURCE_EXHAUSTED that carries a RetryInfo
+delay, like the real API).
+"""
+import asyncio
+from typing import AsyncGenerator
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.genai import errors, types
+
+
+class FakeModel(BaseLlm):
+    """Echoes the last user text; the first `fail_first` calls raise a 429."""
+
+    model: str = "fake"
+    fail_first: int = 0
+    retry_delay: float = 1.0
+    latency: float = 0.0
+    calls: int = 0
+
+    @classmethod
+    def from_spec(cls, spec: str):
+        """Build from "fake" or "fake:N"."""
+        _, _, count = spec.partition(":")
+        return cls(fail_first=int(count or 0))
+
+    async def generate_content_async(self, llm_request, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.calls <= self.fail_first:
+            raise errors.ClientError(429, {"error": {
+                "code": 429,
+                "status": "RESOURCE_EXHAUSTED",
+                "message": f"Quota exceeded (fake model). Please retry in {self.retry_delay}s.",
+                "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{self.retry_delay}s"}],
+            }})
+        prompt = ""
+        for content in reversed(llm_request.contents or []):
+            if content.role == "user" and content.parts:
+                prompt = " ".join(p.text for p in content.parts if p.text)
+                if prompt:
+                    break
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=f"[fake] {prompt}")]))
@@ -0,0 +1,128 @@
+"""Frame-change detection so an unchanged board is not re-processed.
+
+Each frame is reduced to a binarized ink map: grayscale, scaled down to at
+most SIGNATURE_SIZE px on the long side, lightly blurred and adaptively
+thresholded, so exposure drift and sensor noise do not register. Two maps
+are compared with one pixel of slack for camera jitter; ink that appears or
+disappears in blobs of at least MIN_BLOB pixels counts as a change, so a
+rewritten digit is seen even on a 1080p frame. A new frame with no changed
+ink compared to a recent frame is treated as the same board, and whatever
+was stored for it (OCR text, the agent's summary) is reused.
+"""
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+SIGNATURE_SIZE = 1024
+MIN_BLOB = 6  # changed ink pixels (at signature scale) that make up a real stroke, not noise
+_JITTER = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
+
+
+def frame_signature(image):
+    """Return the ink map of a BGR or grayscale image, bit-packed along its rows."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    h, w = gray.shape
+    scale = SIGNATURE_SIZE / max(h, w)
+    if scale < 1.0:
+        gray = cv2.resize(gray, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    gray = cv2.GaussianBlur(gray, (3, 3), 0)
+    ink = cv2.adaptiveThreshold(gray, 1, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 15, 20)
+    return np.packbits(ink, axis=1)
+
+
+def change_score(a, b, min_blob: int = MIN_BLOB) -> float:
+    """Fraction of the ink map that gained or lost ink, counting blobs of at least `min_blob` pixels."""
+    if a.shape != b.shape:
+        return 1.0
+    a, b = np.unpackbits(a, axis=1), np.unpackbits(b, axis=1)
+    changed = (a & ~cv2.dilate(b, _JITTER)) | (b & ~cv2.dilate(a, _JITTER))
+    # the frame edge flickers when the camera shifts by a fraction of a pixel
+    changed[:2], changed[-2:], changed[:, :2], changed[:, -2:] = 0, 0, 0, 0
+    if not changed.any():
+        return 0.0
+    _, _, stats, _ = cv2.connectedComponentsWithStats(changed, connectivity=8)
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    return float(areas[areas >= min_blob].sum()) / changed.size
+
+
+class FrameChangeGate:
+    """LRU of recently seen frames with data attached to each.
+
+    Two frames count as the same board when their change_score is at most
+    `threshold` (a fraction of the ink map); the default 0 misses as soon as
+    any ink blob appears or disappears.
+    """
+
+    def __init__(self, threshold: float = 0.0, capacity: int = 8):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_key = 0
+        # lookup() and remember() usually see the same image back to back
+        self._last = (None, None)
+
+    @classmethod
+    def from_env(cls):
+        """Build a gate from PHYSICALIZER_CHANGE_THRESHOLD / PHYSICALIZER_CHANGE_CACHE."""
+        return cls(threshold=float(os.getenv("PHYSICALIZER_CHANGE_THRESHOLD", "0")),
+                   capacity=int(os.getenv("PHYSICALIZER_CHANGE_CACHE", "8")))
+
+    def _signature(self, image):
+        ref, signature = self._last
+        if ref is not None and ref() is image:
+            return signature
+        signature = frame_signature(image)
+        self._last = (weakref.ref(image), signature)
+        return signature
+
+    def _find(self, signature):
+        best_key, best_score = None, None
+        for key, entry in self._entries.items():
+            score = change_score(entry["signature"], signature)
+            if score <= self.threshold and (best_score is None or score < best_score):
+                best_key, best_score = key, score
+        return best_key
+
+    def lookup(self, image):
+        """Return the data stored for a matching recent frame, or None if the board changed."""
+        signature = self._signature(image)
+        with self._lock:
+            key = self._find(signature)
+            if key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(self._entries[key]["data"])
+
+    def remember(self, image, replace: bool = False, **data):
+        """Attach `data` (e.g. ocr_text=..., summary=...) to this frame, merging with a matching entry.
+
+        `replace` drops what the matching entry held first, for a board known to differ from it.
+        """
+        signature = self._signature(image)
+        with self._lock:
+            key = self._find(signature)
+            if key is not None and replace:
+                del self._entries[key]
+                key = None
+            if key is None:
+                key = self._next_key
+                self._next_key += 1
+                self._entries[key] = {"signature": signature, "data": {}}
+            self._entries[key]["data"].update(data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
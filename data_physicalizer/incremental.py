@@ -0,0 +1,357 @@
+"""Incremental physicalization: re-OCR only what changed on the board.
+
+The board is kept as a list of text blocks (boxes found by
+detect_text_regions, each with its OCR text). For a new frame the grey
+levels are compared with the previous frame on a quarter-size copy, and the
+boxes that changed are found. Text blocks are then detected on the new
+frame again (cheap next to OCR). Blocks that touch a changed area are
+OCR'd; the others take the text of the retained block at the same place.
+The text is re-assembled in reading order and re-parsed into a table, and
+the difference to the previous board is reported as a Delta: added,
+changed and removed rows (or lines, for boards that are not tables).
+
+A frame that changed too much (the camera moved, the lights changed, a new
+board) or has a different size is rebuilt from scratch. Engines that cannot
+OCR crops (Cloud Vision) always OCR the whole frame, and so does a frame
+that still has too many text blocks after noise removal.
+
+Deltas go to the exporters (export_delta(): only the rows that changed,
+tagged added/changed/removed) and to the agent (see driver.py and
+live.py, PHYSICALIZER_INCREMENTAL=1).
+"""
+import difflib
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from . import exporters, ocr_engines, tracing
+from .preprocess import PRESETS, default_preset, preprocess
+from .regions import detect_text_regions, join_regions, ocr_crops
+from .tables import parse_table_from_ocr
+
+
+DIFF_SCALE = 0.25
+SPECK_AREA = 12  # ink components smaller than this (in frame pixels) are noise
+
+
+def incremental_enabled() -> bool:
+    return os.getenv("PHYSICALIZER_INCREMENTAL", "").lower() in ("1", "true", "yes")
+
+
+# --- Frame diff ---
+def diff_signature(image):
+    """Quarter-size, lightly blurred, mean-centred grayscale copy of a BGR or grayscale frame."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, None, fx=DIFF_SCALE, fy=DIFF_SCALE, interpolation=cv2.INTER_AREA)
+    small = cv2.GaussianBlur(small, (3, 3), 0).astype(np.int16)
+    # exposure drift shifts every pixel alike and should not count as a change
+    small -= int(small.mean())
+    return small
+
+
+def changed_boxes(previous, current, level: int = 24, min_area: int = 6, pad: int = 3):
+    """Boxes ``(x, y, w, h)`` in full-frame coordinates where two diff_signature()s differ.
+
+    Returns (boxes, changed fraction of the frame).
+    """
+    mask = (cv2.absdiff(previous, current) > level).astype(np.uint8)
+    # sensor noise flips isolated pixels; a stroke changes a connected patch
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))
+    fraction = float(np.count_nonzero(mask)) / mask.size
+    if not fraction:
+        return [], 0.0
+    mask = cv2.dilate(mask, np.ones((3, 3), np.uint8), iterations=2)
+    n, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    h, w = mask.shape
+    boxes = []
+    for x, y, bw, bh, area in stats[1:]:
+        if area < min_area:
+            continue
+        x0, y0 = max(0, x - pad), max(0, y - pad)
+        x1, y1 = min(w, x + bw + pad), min(h, y + bh + pad)
+        boxes.append(tuple(int(round(v / DIFF_SCALE)) for v in (x0, y0, x1 - x0, y1 - y0)))
+    return boxes, fraction
+
+
+def _intersects(a, b) -> bool:
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+def _iou(a, b) -> float:
+    ix = max(0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / float(union) if union else 0.0
+
+
+def union_box(boxes):
+    x0 = min(b[0] for b in boxes)
+    y0 = min(b[1] for b in boxes)
+    x1 = max(b[0] + b[2] for b in boxes)
+    y1 = max(b[1] + b[3] for b in boxes)
+    return x0, y0, x1 - x0, y1 - y0
+
+
+# --- Text blocks ---
+def text_blocks(th, min_ink: float = 0.02, min_speck: int = SPECK_AREA):
+    """(th without ruled lines and specks, text blocks) for a binarized frame.
+
+    Ruled lines are removed first, since a table grid would join every cell
+    into one block and any edit would re-OCR the whole table. Ink components
+    smaller than `min_speck` pixels are sensor noise: they move between
+    frames, and the dilation would grow each into a block to OCR. Blocks with
+    less than `min_ink` of their area inked are dropped for the same reason.
+    """
+    h, w = th.shape[:2]
+    ink = cv2.bitwise_not(th)
+    rules = cv2.morphologyEx(ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (max(40, w // 30), 1)))
+    rules |= cv2.morphologyEx(ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(40, h // 30))))
+    ink = cv2.subtract(ink, rules)
+    _, labels, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    specks = stats[:, cv2.CC_STAT_AREA] < min_speck
+    specks[0] = False  # background
+    ink[specks[labels]] = 0
+    clean = cv2.bitwise_not(ink)
+    blocks = [(x, y, bw, bh) for x, y, bw, bh in detect_text_regions(clean)
+              if cv2.countNonZero(ink[y:y + bh, x:x + bw]) >= min_ink * bw * bh]
+    return clean, blocks
+
+
+# --- Deltas ---
+class Delta:
+    """What changed between two versions of the board: rows for tables, lines otherwise.
+
+    `changed` holds ``(old, new)`` pairs. For tables `header` is the new header row.
+    """
+
+    def __init__(self, kind: str = "lines", added=None, changed=None, removed=None, header=None):
+        self.kind = kind
+        self.added = added or []
+        self.changed = changed or []
+        self.removed = removed or []
+        self.header = header
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.changed or self.removed)
+
+    def counts(self) -> str:
+        return f"+{len(self.added)} ~{len(self.changed)} -{len(self.removed)} {self.kind}"
+
+    def to_dict(self):
+        return {"kind": self.kind, "header": self.header, "added": self.added,
+                "changed": [{"old": old, "new": new} for old, new in self.changed], "removed": self.removed}
+
+    def describe(self) -> str:
+        """Plain-text listing for the agent and the console."""
+        if self.empty:
+            return "No changes."
+
+        def fmt(item):
+            return " | ".join(str(c) for c in item) if isinstance(item, (list, tuple)) else str(item)
+
+        noun = "rows" if self.kind == "rows" else "lines"
+        out = []
+        if self.header:
+            out.append(f"Table columns: {fmt(self.header)}")
+        if self.added:
+            out.append(f"Added {noun}:")
+            out.extend(f"- {fmt(item)}" for item in self.added)
+        if self.changed:
+            out.append(f"Changed {noun}:")
+            out.extend(f"- {fmt(old)}  ->  {fmt(new)}" for old, new in self.changed)
+        if self.removed:
+            out.append(f"Removed {noun}:")
+            out.extend(f"- {fmt(item)}" for item in self.removed)
+        return "\n".join(out)
+
+
+def diff_items(old, new, kind: str = "lines", header=None) -> Delta:
+    """Delta between two sequences of lines or rows; replaced runs pair up as changes."""
+    key = (lambda item: tuple(item)) if kind == "rows" else (lambda item: item)
+    matcher = difflib.SequenceMatcher(None, [key(i) for i in old], [key(i) for i in new], autojunk=False)
+    delta = Delta(kind, header=header)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        olds, news = old[i1:i2], new[j1:j2]
+        if tag == "replace":
+            pairs = min(len(olds), len(news))
+            delta.changed.extend(zip(olds[:pairs], news[:pairs]))
+            olds, news = olds[pairs:], news[pairs:]
+        delta.removed.extend(olds)
+        delta.added.extend(news)
+    return delta
+
+
+def board_delta(old_text: str, old_table, new_text: str, new_table) -> Delta:
+    """Row delta when both versions parse as tables with the same header, else a line delta."""
+    if old_table and new_table and list(old_table[0]) == list(new_table[0]):
+        return diff_items(old_table[1:], new_table[1:], "rows", header=list(new_table[0]))
+    if new_table and not old_table:
+        return diff_items([], new_table[1:], "rows", header=list(new_table[0]))
+    lines = lambda text: [ln.strip() for ln in (text or "").splitlines() if ln.strip()]
+    return diff_items(lines(old_text), lines(new_text), "lines")
+
+
+def export_delta(delta: Delta, fmt: str = "csv", out_dir: str = None, filename: str = None):
+    """Write only what changed: a table with a leading Change column (added/changed/removed).
+
+    Returns ``(path, stats)`` as exporters.export() does. Raises ValueError for an empty delta.
+    """
+    if delta.empty:
+        raise ValueError("Nothing changed; no delta to export.")
+    if delta.kind == "rows":
+        rows = [["Change"] + list(delta.header or [])]
+        rows += [["added"] + list(r) for r in delta.added]
+        rows += [["changed"] + list(new) for _, new in delta.changed]
+        rows += [["removed"] + list(r) for r in delta.removed]
+    else:
+        rows = [["Change", "Note"]]
+        rows += [["added", line] for line in delta.added]
+        rows += [["changed", new] for _, new in delta.changed]
+        rows += [["removed", line] for line in delta.removed]
+    with tracing.span("export", format=fmt, mode="delta"):
+        return exporters.export(rows, fmt, "table", out_dir=out_dir, filename=filename)
+
+
+# --- Retained board ---
+class BoardUpdate:
+    """Result of IncrementalBoard.update()."""
+
+    def __init__(self, text, table, delta, full, changed=None, fraction=0.0, blocks=0, ocr_blocks=0,
+                 ocr_share=1.0, timings=None):
+        self.text = text
+        self.table = table
+        self.delta = delta
+        self.full = full
+        self.changed = changed or []
+        self.fraction = fraction
+        self.blocks = blocks
+        self.ocr_blocks = ocr_blocks
+        self.ocr_share = ocr_share
+        self.timings = timings or {}
+
+    @property
+    def incremental(self) -> bool:
+        return not self.full
+
+    def describe(self) -> str:
+        how = "rebuilt" if self.full else "updated"
+        if self.full and not self.blocks:
+            what = "OCR'd as one page"
+        else:
+            what = (f"{self.ocr_blocks} of {self.blocks} text block(s) OCR'd "
+                    f"({self.ocr_share:.0%} of the text area)")
+        return f"[Incremental] Board {how}: {what}, {self.delta.counts()}, {sum(self.timings.values()):.0f} ms"
+
+
+class IncrementalBoard:
+    """The last board seen, as text blocks with their OCR text, plus its text and table.
+
+    `max_change` is the share of the frame that may change before the board
+    is rebuilt from scratch. A frame with more than `max_blocks` text blocks
+    is OCR'd as one page instead, since that many crops cost more than the
+    page. One instance per session; update() is not meant to be called
+    concurrently.
+    """
+
+    def __init__(self, engine: str = None, preset: str = None, max_change: float = 0.25, max_blocks: int = 200,
+                 executor=None):
+        self.engine = engine
+        self.preset = preset
+        self.max_change = max_change
+        self.max_blocks = max_blocks
+        self.executor = executor
+        self.signature = None
+        self.scale = 1.0
+        self.blocks = []  # [(box in threshold-image coordinates, text)]
+        self.text = None
+        self.table = None
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.signature, self.blocks, self.text, self.table = None, [], None, None
+
+    def _steps(self):
+        # deskew would move every block whenever the estimated angle wobbles; keep frame coordinates
+        preset = self.preset or default_preset()
+        steps = PRESETS[preset] if not isinstance(preset, list) else preset
+        return [(name, params) for name, params in steps if name not in ("deskew", "write_debug")]
+
+    def update(self, frame) -> BoardUpdate:
+        """Diff `frame` (a Frame or BGR array) against the retained board and OCR only what changed."""
+        image = getattr(frame, "image", frame)
+        with self._lock, tracing.span("incremental.update") as sp:
+            timings = {}
+            started = time.perf_counter()
+            engine = ocr_engines.get_engine(self.engine)
+            signature = diff_signature(image)
+            changed, fraction = [], 1.0
+            full = self.signature is None or self.signature.shape != signature.shape
+            if not full:
+                changed, fraction = changed_boxes(self.signature, signature)
+                full = fraction > self.max_change
+            timings["diff_ms"] = (time.perf_counter() - started) * 1000.0
+            if not full and not changed:
+                # nothing moved: the retained board stands. The reference stays the last OCR'd frame, so
+                # an edit made in steps each too small to count still adds up to a change
+                sp.set(full=False, ocr_blocks=0)
+                return BoardUpdate(self.text, self.table, Delta(), False, [], 0.0, len(self.blocks), 0, 0.0,
+                                   timings)
+
+            started = time.perf_counter()
+            prep = preprocess(image, self._steps())
+            th = prep.image
+            timings["preprocess_ms"] = (time.perf_counter() - started) * 1000.0
+
+            started = time.perf_counter()
+            scale = th.shape[1] / float(image.shape[1])
+            boxes = []
+            if engine.supports_crops:
+                # specks are a few pixels of the frame, however much the preset upscales it
+                th, boxes = text_blocks(th, min_speck=max(4, int(SPECK_AREA * scale * scale)))
+            if not engine.supports_crops or len(boxes) > self.max_blocks:
+                text = engine.recognize(th, frame)
+                text = "\n".join(ln.strip() for ln in (text or "").splitlines() if ln.strip())
+                sp.set(page_ocr=True, detected=len(boxes))
+                boxes, texts, ocr_indices = [], [], []
+                full = True
+            else:
+                scaled = [tuple(int(v * scale) for v in box) for box in changed]
+                texts = [None] * len(boxes)
+                for i, box in enumerate(boxes):
+                    if full or any(_intersects(box, c) for c in scaled):
+                        continue
+                    match = max(self.blocks, key=lambda b: _iou(box, b[0]), default=None)
+                    if match is not None and _iou(box, match[0]) >= 0.6:
+                        texts[i] = match[1]
+                ocr_indices = [i for i, t in enumerate(texts) if t is None]
+                if ocr_indices:
+                    # a couple of blocks are quicker in this process than shipped to the pool
+                    executor = self.executor or ("inline" if len(ocr_indices) <= 2 else None)
+                    found = ocr_crops(th, [boxes[i] for i in ocr_indices], engine.name, executor)
+                    for i, t in zip(ocr_indices, found):
+                        texts[i] = " ".join((t or "").split())
+                text = join_regions(boxes, texts)
+                self.scale = scale
+            timings["ocr_ms"] = (time.perf_counter() - started) * 1000.0
+
+            started = time.perf_counter()
+            table = parse_table_from_ocr(text)
+            delta = board_delta(self.text, self.table, text, table)
+            timings["merge_ms"] = (time.perf_counter() - started) * 1000.0
+
+            area = sum(b[2] * b[3] for b in boxes)
+            ocr_area = sum(boxes[i][2] * boxes[i][3] for i in ocr_indices)
+            self.signature, self.blocks, self.text, self.table = signature, list(zip(boxes, texts)), text, table
+            sp.set(full=full, blocks=len(boxes), ocr_blocks=len(ocr_indices))
+            tracing.count("incremental.ocr_blocks", len(ocr_indices))
+            tracing.count("incremental.reused_blocks", len(boxes) - len(ocr_indices))
+            return BoardUpdate(text, table, delta, full, changed, round(fraction, 4), len(boxes), len(ocr_indices),
+                               ocr_area / float(area) if area else (1.0 if full else 0.0), timings)
@@ -0,0 +1,260 @@
+"""Continuous live mode: watch the feed and physicalize the board whenever it settles.
+
+    python -m data_physicalizer.live [--source meeting.mp4] [--fps 5] [--stable 8] [--agent] [--export csv] [--incremental]
+
+Frames are sampled from the shared CaptureService at a target rate. Each
+sample is compared with the previous one; once the picture has held still
+for `--stable` samples in a row (nobody writing or standing in front of the
+board) and it differs from the last board that was processed, the frame is
+enhanced, OCR'd and - with --agent - summarized by the model.
+
+Nothing queues up under load. Sampling always takes the newest frame, so
+frames that arrive between samples are dropped, and a stable board that
+shows up while the previous one is still being processed is skipped (the
+next stable period triggers again). Recorded video plays back at its own
+frame rate, which makes a recording a stand-in for the camera. On exit the
+counts of captured, sampled, processed (handled boards) and dropped frames,
+the boards whose handling failed and the end-to-end latency (capture to
+result) are reported.
+
+With --incremental (or PHYSICALIZER_INCREMENTAL=1) each stable board is
+diffed against the previous one and only the text blocks that changed are
+OCR'd. The agent is sent the added/changed rows, and exports after the
+first board hold only those rows (see incremental.py).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from . import agent, ocr_engines
+from .frame_gate import change_score, frame_signature
+from .incremental import IncrementalBoard, export_delta, incremental_enabled
+
+
+class StabilityTrigger:
+    """Fires once per still period, when the picture has barely moved for `stable_frames` samples.
+
+    `motion_threshold` and `change_threshold` are change_score fractions: the
+    first between consecutive samples, the second against the last board
+    that fired, so holding a finished board in view does not fire again
+    while any edit to it (by default, one changed ink blob) does.
+    """
+
+    def __init__(self, stable_frames: int = 8, motion_threshold: float = 0.002, change_threshold: float = 0.0):
+        self.stable_frames = stable_frames
+        self.motion_threshold = motion_threshold
+        self.change_threshold = change_threshold
+        self.stable = 0
+        self._previous = None
+        self._last_fired = None
+
+    def update(self, image) -> bool:
+        signature = frame_signature(image)
+        motion = change_score(self._previous, signature) if self._previous is not None else 1.0
+        self._previous = signature
+        self.stable = self.stable + 1 if motion <= self.motion_threshold else 0
+        if self.stable != self.stable_frames:
+            return False
+        if self._last_fired is not None and change_score(self._last_fired, signature) <= self.change_threshold:
+            return False
+        self._last_fired = signature
+        return True
+
+
+class LiveStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.frames_captured = 0
+        self.frames_sampled = 0
+        self.frames_processed = 0
+        self.triggers = 0
+        self.triggers_dropped = 0
+        self.handler_errors = 0
+        self.latencies_ms = []
+
+    @property
+    def frames_dropped(self) -> int:
+        return max(0, self.frames_captured - self.frames_processed)
+
+    def to_dict(self):
+        ordered = sorted(self.latencies_ms)
+        elapsed = time.perf_counter() - self.started
+
+        def pct(p):
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 1) if ordered else None
+
+        return {
+            "seconds": round(elapsed, 2),
+            "frames_captured": self.frames_captured,
+            "frames_sampled": self.frames_sampled,
+            "frames_processed": self.frames_processed,
+            "frames_dropped": self.frames_dropped,
+            "processed_fps": round(self.frames_processed / elapsed, 2) if elapsed > 0 else 0.0,
+            "triggers": self.triggers,
+            "triggers_dropped": self.triggers_dropped,
+            "handler_errors": self.handler_errors,
+            "latency_p50_ms": pct(0.5),
+            "latency_p99_ms": pct(0.99),
+        }
+
+
+async def run_live(service, handle, fps: float = 5.0, trigger: StabilityTrigger = None, duration: float = None,
+                   stats: LiveStats = None, out=print):
+    """Sample `service` at `fps` and call ``await handle(timestamp, image)`` for each stable board.
+
+    Runs until `duration` seconds have passed or a finite source is used up,
+    then waits for the handlers still running. A handler that raises is
+    reported and counted; the loop keeps going. Returns the LiveStats.
+    """
+    trigger = trigger or StabilityTrigger()
+    stats = stats or LiveStats()
+    interval = 1.0 / fps
+    deadline = time.monotonic() + duration if duration else None
+    last_seen = None
+    task = None
+    tasks = set()
+
+    async def _process(timestamp, image):
+        try:
+            await handle(timestamp, image)
+            stats.frames_processed += 1
+        except Exception as e:
+            stats.handler_errors += 1
+            out(f"[Live] Handler failed: {type(e).__name__}: {e}")
+        finally:
+            stats.latencies_ms.append((time.time() - timestamp) * 1000.0)
+
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            tick = time.monotonic()
+            timestamp, image, count = service.latest_with_time()
+            stats.frames_captured = count
+            if image is not None and timestamp != last_seen:
+                last_seen = timestamp
+                stats.frames_sampled += 1
+                if trigger.update(image):
+                    stats.triggers += 1
+                    if task is not None and not task.done():
+                        # still busy with the previous board: drop, never queue
+                        stats.triggers_dropped += 1
+                    else:
+                        task = asyncio.create_task(_process(timestamp, image))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+            elif not service.running:
+                break  # recording finished and every buffered frame was seen
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - tick)))
+    finally:
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, BaseException):
+                out(f"[Live] Handler did not finish: {type(result).__name__}: {result}")
+    return stats
+
+
+def make_handler(driver=None, export_format: str = None, out=print, board: IncrementalBoard = None):
+    """Default trigger handler: enhance, OCR, optionally summarize with the agent and export.
+
+    With a `board`, each stable board is diffed against the previous one: only changed text blocks
+    are OCR'd, the agent gets the delta, and exports after the first hold only the changed rows.
+    """
+
+    async def handle(timestamp, image):
+        frame = await asyncio.to_thread(agent.enhance_frame, image, timestamp)
+        text = update = None
+        if board is not None:
+            try:
+                update = await asyncio.to_thread(board.update, frame)
+                text = update.text
+                # changed text replaces whatever the gate kept for a look-alike frame (e.g. its summary)
+                agent.get_frame_gate().remember(frame.image, replace=not update.delta.empty, ocr_text=text)
+                out(update.describe())
+            except Exception as e:
+                out(f"[Live] Incremental update failed: {e}")
+                board.reset()
+        elif ocr_engines.default_engine_name() is not None:
+            text, err = await asyncio.to_thread(agent.ocr_frame, frame)
+            if err:
+                out(f"[Live] OCR error: {err}")
+        # the board (if any) was updated above; a failed update must not be retried by the driver
+        summary = await driver.physicalize(frame, update=update, diff=False) if driver is not None else None
+        lines = len([ln for ln in (text or "").splitlines() if ln.strip()])
+        out(f"[Live] Stable board: {lines} OCR line(s), "
+            f"{(time.time() - timestamp) * 1000.0:.0f} ms after capture")
+        if export_format and update is not None and update.incremental:
+            if update.delta.empty:
+                out("[Live] No text changed; nothing to export.")
+                return
+            try:
+                path, _ = await asyncio.to_thread(export_delta, update.delta, export_format)
+                out(f"[Live] Delta ({update.delta.counts()}) saved to {path}")
+            except (LookupError, ValueError) as e:
+                out(f"[Live] Error: {e}")
+        elif export_format:
+            if update is not None:
+                table = update.table
+            else:
+                table = await asyncio.to_thread(agent.extract_table, frame, text) if text else None
+            if table:
+                result = await asyncio.to_thread(agent.write_export, json.dumps(table), export_format, "table")
+            else:
+                result = await asyncio.to_thread(agent.write_export, text or summary or "", export_format, "summary")
+            out(f"[Live] {result}")
+
+    return handle
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Physicalize a live feed (or recording) whenever the board settles.")
+    parser.add_argument("--source", default=None, help="camera index or video file (default: PHYSICALIZER_CAMERA)")
+    parser.add_argument("--fps", type=float, default=5.0, help="frames sampled per second")
+    parser.add_argument("--stable", type=int, default=8, help="still samples in a row before a board counts as ready")
+    parser.add_argument("--motion", type=float, default=0.002, help="max change_score between still samples")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--agent", action="store_true", help="also summarize each board with the agent")
+    parser.add_argument("--export", default=None, help="export each board in this format (pdf, csv, md, ...)")
+    parser.add_argument("--incremental", action="store_true", default=None,
+                        help="re-OCR only what changed and export deltas (default: PHYSICALIZER_INCREMENTAL)")
+    args = parser.parse_args(argv)
+
+    agent.load_env()
+    if args.source is not None:
+        os.environ["PHYSICALIZER_CAMERA"] = args.source
+    ocr_engines.warm_up()
+    service = agent.get_capture_service()
+    if service.error:
+        print(f"[Live] {service.error}")
+        return 1
+
+    board = None
+    if args.incremental or (args.incremental is None and incremental_enabled()):
+        if ocr_engines.default_engine_name() is None:
+            print("[Live] No OCR engine installed; incremental mode is off.")
+        else:
+            board = IncrementalBoard()
+    driver = None
+    if args.agent:
+        from .driver import SessionDriver, build_runner
+        driver = SessionDriver(build_runner())
+        driver.board = board
+    trigger = StabilityTrigger(stable_frames=args.stable, motion_threshold=args.motion)
+    try:
+        stats = asyncio.run(run_live(service, make_handler(driver, args.export, board=board), fps=args.fps,
+                                     trigger=trigger, duration=args.duration))
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        service.stop()
+    s = stats.to_dict()
+    print(f"[Live] {s['seconds']}s: {s['frames_captured']} frames captured, {s['frames_sampled']} sampled, "
+          f"{s['frames_processed']} processed ({s['processed_fps']}/s), {s['frames_dropped']} dropped; "
+          f"{s['triggers']} stable board(s), {s['triggers_dropped']} skipped while busy, "
+          f"{s['handler_errors']} failed; latency p50 {s['latency_p50_ms']} ms, "
+          f"p99 {s['latency_p99_ms']} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
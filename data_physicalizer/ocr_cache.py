@@ -0,0 +1,139 @@
+"""Content-addressed cache of OCR results.
+
+Results are keyed by a hash of the decoded image pixels plus everything that
+changes the output (the preset's resolved steps, the binarization method,
+the preprocessing pipeline version, engine name and version, tiling),
+so OCR'ing the same image twice - in the same process or across runs -
+costs one hash. A small in-memory LRU sits in front of a sqlite store.
+
+PHYSICALIZER_OCR_CACHE sets the sqlite path (default
+data_physicalizer/.adk/ocr_cache.db); set it to "off" to keep the cache
+in memory only.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".adk", "ocr_cache.db")
+
+
+def cache_key(img, **params) -> str:
+    """Hash of the pixel data (shape, dtype, bytes) and the OCR parameters."""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"{img.shape}|{img.dtype}".encode())
+    h.update(memoryview(img if img.flags.c_contiguous else img.copy()).cast("B"))
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+class OcrCache:
+    """In-memory LRU of ``{"text": ..., "words": ...}`` entries backed by sqlite.
+
+    Either field may be None when only the other one was computed; `words`
+    is a list of word-box dicts (see OcrEngine.recognize_words).
+    """
+
+    def __init__(self, path: str = None, capacity: int = 128):
+        self.path = path
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS ocr_results ("
+                " key TEXT PRIMARY KEY, text TEXT, words TEXT, created REAL)"
+            )
+            self._conn.commit()
+
+    @classmethod
+    def from_env(cls):
+        path = os.getenv("PHYSICALIZER_OCR_CACHE", DEFAULT_PATH)
+        if path.lower() in ("off", "none", "0", ""):
+            path = None
+        try:
+            return cls(path)
+        except sqlite3.Error:
+            # an unwritable location should not break OCR; fall back to memory only
+            return cls(None)
+
+    def get(self, key: str):
+        """Return the cached entry for `key`, or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry
+            if self._conn is not None:
+                row = self._conn.execute("SELECT text, words FROM ocr_results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = {"text": row[0], "words": json.loads(row[1]) if row[1] else None}
+                    self._remember(key, entry)
+                    self.hits += 1
+                    return entry
+            self.misses += 1
+            return None
+
+    def put(self, key: str, text: str = None, words=None):
+        """Store OCR output; whichever of text/words is not given is kept from the existing entry."""
+        with self._lock:
+            if text is None or words is None:
+                old = self._memory.get(key)
+                if old is None and self._conn is not None:
+                    row = self._conn.execute("SELECT text, words FROM ocr_results WHERE key = ?", (key,)).fetchone()
+                    if row is not None:
+                        old = {"text": row[0], "words": json.loads(row[1]) if row[1] else None}
+                if old is not None:
+                    text = old["text"] if text is None else text
+                    words = old["words"] if words is None else words
+            entry = {"text": text, "words": words}
+            self._remember(key, entry)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT INTO ocr_results (key, text, words, created) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT(key) DO UPDATE SET text = excluded.text, words = excluded.words",
+                    (key, text, json.dumps(words) if words is not None else None, time.time()),
+                )
+                self._conn.commit()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM ocr_results")
+                self._conn.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> OcrCache:
+    """Process-wide OcrCache, created from the environment on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = OcrCache.from_env()
+        return _cache
+
+
+def set_cache(cache: OcrCache):
+    global _cache
+    with _cache_lock:
+        _cache = cache
@@ -0,0 +1,348 @@
+"""OCR engine registry.
+
+Each engine is created once per process and cached, so heavy setup such as
+loading the easyocr torch model or creating a Cloud Vision client is paid on
+first use (or during warm-up) instead of on every capture.
+
+Engines:
+1) tesseract (recommended) — install binary and `pip install pytesseract`.
+2) easyocr (pure Python) — `pip install easyocr torch torchvision`.
+3) vision (Google Cloud Vision) — set GOOGLE_APPLICATION_CREDENTIALS or
+   otherwise authenticate with Application Default Credentials. Requires
+   `pip install google-cloud-vision`.
+4) stub — returns canned text; for exercising the pipeline without OCR.
+
+Set PHYSICALIZER_OCR_ENGINE to pick one explicitly. Otherwise the first
+available engine in DEFAULT_ORDER is used. Availability is a find_spec probe;
+an engine's libraries are only imported when it is loaded.
+"""
+import importlib.util
+import os
+import threading
+
+
+def module_available(name: str) -> bool:
+    """Whether `name` can be imported, without importing it (and whatever it drags in, e.g. torch)."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def _import_pytesseract():
+    import pytesseract
+
+    # On Windows we attempt to auto-detect common Tesseract install paths.
+    tess_env = os.environ.get('TESSERACT_CMD') or os.environ.get('TESSERACT_PATH')
+    if tess_env:
+        pytesseract.pytesseract.tesseract_cmd = tess_env
+    elif os.name == 'nt':
+        possible = [r"C:\Program Files\Tesseract-OCR\tesseract.exe", r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe"]
+        for p in possible:
+            if os.path.exists(p):
+                pytesseract.pytesseract.tesseract_cmd = p
+                break
+    return pytesseract
+
+
+DEFAULT_ORDER = ["tesseract", "easyocr", "vision"]
+
+
+class OcrEngine:
+    """Base class for OCR engines.
+
+    Subclasses set `name`, implement `is_available()` (cheap, no model loading),
+    `load()` (one-time heavy setup) and `recognize()`. Engines that can OCR
+    cropped regions of the binarized image set `supports_crops`. `version`
+    is part of the OCR cache key; engines whose output should never be
+    cached set `cacheable = False`.
+    """
+    name = None
+    supports_crops = True
+    cacheable = True
+    version = "0"
+
+    def __init__(self):
+        self.loaded = False
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return True
+
+    def load(self):
+        self.loaded = True
+
+    def recognize(self, image, frame=None) -> str:
+        """Return the text in `image` (the preprocessed array).
+
+        `frame` is the original Frame, for engines that prefer the colour JPEG.
+        """
+        raise NotImplementedError
+
+    def recognize_words(self, image, frame=None):
+        """Return word boxes: dicts with text, left, top, width, height and conf (0-100).
+
+        Coordinates are in `image` pixels (or the frame's, for engines that use it).
+        """
+        raise NotImplementedError(f"OCR engine '{self.name}' does not report word boxes")
+
+    def recognize_layout(self, image, frame=None):
+        """Return (text, words) from a single recognition pass; words is None if the engine has no boxes."""
+        return self.recognize(image, frame), None
+
+
+def lines_to_text(lines, column_gap: float = 1.0) -> str:
+    """Join lines of word boxes into text; gaps wider than `column_gap` x the word height become a column break."""
+    out = []
+    for words in lines:
+        parts = [words[0]["text"]]
+        for prev, word in zip(words, words[1:]):
+            gap = word["left"] - (prev["left"] + prev["width"])
+            parts.append("   " if gap > column_gap * max(prev["height"], word["height"]) else " ")
+            parts.append(word["text"])
+        out.append("".join(parts))
+    return "\n".join(out)
+
+
+def _box_from_points(points):
+    xs = [int(p[0]) for p in points]
+    ys = [int(p[1]) for p in points]
+    return min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys)
+
+
+class TesseractEngine(OcrEngine):
+    name = "tesseract"
+
+    def __init__(self):
+        super().__init__()
+        self.pytesseract = None
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return module_available("pytesseract")
+
+    def load(self):
+        self.pytesseract = _import_pytesseract()
+        self.version = str(self.pytesseract.get_tesseract_version())
+        self.loaded = True
+
+    def recognize(self, image, frame=None) -> str:
+        return self.pytesseract.image_to_string(image)
+
+    def recognize_words(self, image, frame=None):
+        return self.recognize_layout(image, frame)[1]
+
+    def recognize_layout(self, image, frame=None):
+        # image_to_data reads the page once and reports every word with its line; no image_to_string pass needed
+        data = self.pytesseract.image_to_data(image, output_type=self.pytesseract.Output.DICT)
+        words, lines, last = [], [], None
+        for i, text in enumerate(data["text"]):
+            conf = float(data["conf"][i])
+            if conf < 0 or not text.strip():
+                continue
+            word = {"text": text.strip(), "left": int(data["left"][i]), "top": int(data["top"][i]),
+                    "width": int(data["width"][i]), "height": int(data["height"][i]), "conf": conf}
+            words.append(word)
+            line = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            if line != last:
+                lines.append([])
+                last = line
+            lines[-1].append(word)
+        return lines_to_text(lines), words
+
+
+class EasyOcrEngine(OcrEngine):
+    name = "easyocr"
+
+    def __init__(self):
+        super().__init__()
+        self.reader = None
+
+    @classmethod
+    def is_available(cls) -> bool:
+        # easyocr is a pure-python fallback (requires torch)
+        return module_available("easyocr") and module_available("torch")
+
+    def load(self):
+        import easyocr
+
+        self.reader = easyocr.Reader(['en'], gpu=False)
+        self.version = str(getattr(easyocr, "__version__", "0"))
+        self.loaded = True
+
+    def recognize(self, image, frame=None) -> str:
+        result = self.reader.readtext(image)
+        return '\n'.join([r[1] for r in result])
+
+    def recognize_words(self, image, frame=None):
+        return self.recognize_layout(image, frame)[1]
+
+    def recognize_layout(self, image, frame=None):
+        result = self.reader.readtext(image)
+        words = []
+        for points, text, conf in result:
+            left, top, width, height = _box_from_points(points)
+            words.append({"text": text, "left": left, "top": top, "width": width, "height": height,
+                          "conf": float(conf) * 100.0})
+        return '\n'.join([r[1] for r in result]), words
+
+
+class VisionEngine(OcrEngine):
+    name = "vision"
+    supports_crops = False
+    version = "v1"
+
+    def __init__(self):
+        super().__init__()
+        self.client = None
+        self.vision = None
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return module_available("google.cloud.vision")
+
+    def load(self):
+        from google.cloud import vision
+
+        self.vision = vision
+        self.client = vision.ImageAnnotatorClient()
+        self.loaded = True
+
+    def _detect(self, frame):
+        if frame is None:
+            raise ValueError("Cloud Vision needs the original frame")
+        resp = self.client.text_detection(image=self.vision.Image(content=frame.jpeg))
+        if resp.error.message:
+            raise RuntimeError(resp.error.message)
+        return resp
+
+    def recognize(self, image, frame=None) -> str:
+        return self._detect(frame).full_text_annotation.text
+
+    def recognize_words(self, image, frame=None):
+        return self.recognize_layout(image, frame)[1]
+
+    def recognize_layout(self, image, frame=None):
+        resp = self._detect(frame)
+        words = []
+        # the first annotation is the whole text block; the rest are words
+        for ann in resp.text_annotations[1:]:
+            left, top, width, height = _box_from_points([(v.x, v.y) for v in ann.bounding_poly.vertices])
+            words.append({"text": ann.description, "left": left, "top": top, "width": width, "height": height,
+                          "conf": 100.0})
+        return resp.full_text_annotation.text, words
+
+
+class StubEngine(OcrEngine):
+    """Returns `text` (or `text_fn(image)`) and `words` without doing any OCR."""
+    name = "stub"
+    cacheable = False
+
+    def __init__(self, text: str = "", text_fn=None, words=None):
+        super().__init__()
+        self.text = text
+        self.text_fn = text_fn
+        self.words = words or []
+        self.calls = 0
+
+    def recognize(self, image, frame=None) -> str:
+        self.calls += 1
+        if self.text_fn is not None:
+            return self.text_fn(image)
+        return self.text
+
+    def recognize_words(self, image, frame=None):
+        self.calls += 1
+        return [dict(w) for w in self.words]
+
+    def recognize_layout(self, image, frame=None):
+        text = self.recognize(image, frame)
+        return text, [dict(w) for w in self.words]
+
+
+# --- Registry ---
+_registry = {}
+_instances = {}
+_lock = threading.Lock()
+
+
+def register_engine(engine_cls):
+    """Register an OcrEngine subclass under its `name`. Usable as a decorator."""
+    _registry[engine_cls.name] = engine_cls
+    return engine_cls
+
+
+for _cls in (TesseractEngine, EasyOcrEngine, VisionEngine, StubEngine):
+    register_engine(_cls)
+
+
+def available_engines():
+    """Names of registered engines whose dependencies are importable (excluding stub)."""
+    return [name for name, cls in _registry.items() if name != "stub" and cls.is_available()]
+
+
+def default_engine_name():
+    """Engine chosen by PHYSICALIZER_OCR_ENGINE, else the first available in DEFAULT_ORDER."""
+    configured = os.getenv("PHYSICALIZER_OCR_ENGINE")
+    if configured:
+        return configured
+    for name in DEFAULT_ORDER:
+        cls = _registry.get(name)
+        if cls is not None and cls.is_available():
+            return name
+    return None
+
+
+def set_engine(name: str, engine: OcrEngine):
+    """Install a ready-made engine instance under `name` (e.g. a configured StubEngine)."""
+    with _lock:
+        _instances[name] = engine
+
+
+def get_engine(name: str = None) -> OcrEngine:
+    """Return the cached engine instance, creating and loading it on first use.
+
+    Raises LookupError if the engine is unknown or its dependencies are missing.
+    """
+    name = name or default_engine_name()
+    if name is None:
+        raise LookupError("no OCR engine available")
+    engine = _instances.get(name)
+    if engine is not None and engine.loaded:
+        return engine
+    with _lock:
+        engine = _instances.get(name)
+        if engine is None:
+            cls = _registry.get(name)
+            if cls is None:
+                raise LookupError(f"unknown OCR engine '{name}'")
+            if not cls.is_available():
+                raise LookupError(f"OCR engine '{name}' is not installed")
+            engine = cls()
+            _instances[name] = engine
+        if not engine.loaded:
+            engine.load()
+        return engine
+
+
+def warm_up(names=None, background: bool = True):
+    """Create and load engines ahead of the first capture.
+
+    With background=True this returns the started thread; load errors are
+    swallowed so a missing engine never breaks startup.
+    """
+    names = names or [n for n in [default_engine_name()] if n]
+
+    def _load():
+        for name in names:
+            try:
+                get_engine(name)
+            except Exception:
+                pass
+
+    if not background:
+        _load()
+        return None
+    thread = threading.Thread(target=_load, name="ocr-warm-up", daemon=True)
+    thread.start()
+    return thread
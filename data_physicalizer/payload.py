@@ -0,0 +1,208 @@
+"""Shrink what is sent to Gemini for each Physicalize.
+
+The captured frame is cropped to the area that holds ink, scaled down to a
+target long edge and re-encoded (JPEG or WebP) with the highest quality that
+fits a byte budget. Optionally, when local OCR is confident enough, only the
+OCR text is sent and the image is left out altogether.
+
+Configured from the environment:
+
+- PHYSICALIZER_PAYLOAD_CROP (default 1): crop to the detected text area
+- PHYSICALIZER_PAYLOAD_LONG_EDGE (default 1280): longest side in pixels, 0 keeps the size
+- PHYSICALIZER_PAYLOAD_FORMAT (default jpeg): jpeg or webp
+- PHYSICALIZER_PAYLOAD_MAX_KB (default 200): byte budget for the encoded image
+- PHYSICALIZER_PAYLOAD_TEXT_CONF (default off): send OCR text only when the
+  mean word confidence (0-100) is at least this
+"""
+import math
+import os
+
+import cv2
+import numpy as np
+
+from . import tracing
+
+
+# Gemini 2.x bills images up to 384 px on both sides as 258 tokens; larger
+# ones are cut into square tiles (side min(w, h) / 1.5, clamped to 256..768)
+# of 258 tokens each.
+TOKENS_PER_TILE = 258
+ENCODERS = {"jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY), "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY)}
+MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+def image_tokens(width: int, height: int) -> int:
+    """Estimated input tokens Gemini charges for an image of this size."""
+    if width <= 384 and height <= 384:
+        return TOKENS_PER_TILE
+    tile = min(768, max(256, int(min(width, height) / 1.5)))
+    return math.ceil(width / tile) * math.ceil(height / tile) * TOKENS_PER_TILE
+
+
+def text_tokens(text: str) -> int:
+    """Rough token count for English text (about 4 characters per token)."""
+    return max(1, len(text) // 4) if text else 0
+
+
+class PayloadPolicy:
+    """Settings for build_payload()."""
+
+    def __init__(self, crop: bool = True, long_edge: int = 1280, fmt: str = "jpeg", max_bytes: int = 200 * 1024,
+                 quality: int = 85, min_quality: int = 40, text_only_conf: float = None):
+        if fmt not in ENCODERS:
+            raise ValueError(f"Unknown payload format '{fmt}'. Use 'jpeg' or 'webp'.")
+        self.crop = crop
+        self.long_edge = long_edge
+        self.fmt = fmt
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self.min_quality = min_quality
+        self.text_only_conf = text_only_conf
+
+    @classmethod
+    def from_env(cls):
+        conf = os.getenv("PHYSICALIZER_PAYLOAD_TEXT_CONF", "off").lower()
+        return cls(
+            crop=os.getenv("PHYSICALIZER_PAYLOAD_CROP", "1") not in ("0", "false", "off"),
+            long_edge=int(os.getenv("PHYSICALIZER_PAYLOAD_LONG_EDGE", "1280")),
+            fmt=os.getenv("PHYSICALIZER_PAYLOAD_FORMAT", "jpeg").lower(),
+            max_bytes=int(float(os.getenv("PHYSICALIZER_PAYLOAD_MAX_KB", "200")) * 1024),
+            text_only_conf=None if conf in ("off", "none", "") else float(conf),
+        )
+
+
+def content_box(image, pad: float = 0.04, work_size: int = 480, min_share: float = 0.85):
+    """Bounding box ``(x, y, w, h)`` of the written area, or None when it covers (almost) the whole frame.
+
+    Works on a downscaled copy. Ink is whatever adaptive thresholding marks
+    as darker than its surroundings; connected blobs that are too big to be
+    handwriting or print (board edges, frames, shadows) are ignored, and the
+    box spans the 1st..99th percentile of the remaining ink so stray specks
+    do not stretch it.
+    """
+    h, w = image.shape[:2]
+    scale = min(1.0, work_size / float(max(h, w)))
+    small = cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA) \
+        if scale < 1.0 else image
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+    sh, sw = gray.shape
+    ink = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 25, 15)
+    _, labels, comp, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    widths, heights = comp[:, cv2.CC_STAT_WIDTH], comp[:, cv2.CC_STAT_HEIGHT]
+    keep = (widths <= 0.5 * sw) & (heights <= 0.2 * sh) & (comp[:, cv2.CC_STAT_AREA] >= 3)
+    keep[0] = False  # background
+    ys, xs = np.nonzero(keep[labels])
+    if xs.size < 50:
+        return None
+    x0, x1 = np.percentile(xs, [1, 99]) / scale
+    y0, y1 = np.percentile(ys, [1, 99]) / scale
+    px, py = pad * w, pad * h
+    x0, y0 = max(0, int(x0 - px)), max(0, int(y0 - py))
+    x1, y1 = min(w, int(math.ceil(x1 + px))), min(h, int(math.ceil(y1 + py)))
+    if (x1 - x0) * (y1 - y0) >= min_share * w * h:
+        return None
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def downscale(image, long_edge: int):
+    h, w = image.shape[:2]
+    if not long_edge or max(h, w) <= long_edge:
+        return image
+    scale = long_edge / float(max(h, w))
+    return cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+
+
+def encode(image, fmt: str = "jpeg", max_bytes: int = None, quality: int = 85, min_quality: int = 40):
+    """Encode at the highest quality in [min_quality, quality] that fits `max_bytes`. Returns (bytes, quality)."""
+    ext, flag = ENCODERS[fmt]
+
+    def _encode(q):
+        ok, buf = cv2.imencode(ext, image, [flag, int(q)])
+        if not ok:
+            raise ValueError(f"Failed to encode image as {fmt}")
+        return buf.tobytes()
+
+    data = _encode(quality)
+    if not max_bytes or len(data) <= max_bytes:
+        return data, quality
+    # binary search over quality; keep the best encoding that fits (or the smallest one)
+    lo, hi = min_quality, quality - 1
+    best, best_q = None, None
+    while lo <= hi:
+        q = (lo + hi) // 2
+        candidate = _encode(q)
+        if len(candidate) <= max_bytes:
+            best, best_q = candidate, q
+            lo = q + 1
+        else:
+            hi = q - 1
+    if best is None:
+        return _encode(min_quality), min_quality
+    return best, best_q
+
+
+def ocr_confidence(words) -> float:
+    """Mean word confidence (0-100) weighted by word length; 0.0 without words."""
+    total = sum(len(w.get("text", "")) for w in words or [])
+    if not total:
+        return 0.0
+    return sum(float(w.get("conf", 0.0)) * len(w.get("text", "")) for w in words) / total
+
+
+class Payload:
+    """What to send for one frame: image bytes (with mime type), or OCR text only, plus size stats."""
+
+    def __init__(self, data: bytes = None, mime_type: str = None, text: str = None, stats: dict = None):
+        self.data = data
+        self.mime_type = mime_type
+        self.text = text
+        self.stats = stats or {}
+
+    @property
+    def text_only(self) -> bool:
+        return self.data is None
+
+    def describe(self) -> str:
+        s = self.stats
+        what = "OCR text only" if self.text_only else f"{s['width']}x{s['height']} {s['format']} q{s['quality']}"
+        if s["original_bytes"]:
+            saved = 1.0 - s["sent_bytes"] / float(s["original_bytes"])
+            size = f"{s['original_bytes'] / 1024:.0f} KB -> {s['sent_bytes'] / 1024:.0f} KB ({saved:.0%} smaller)"
+        else:
+            size = f"{s['sent_bytes'] / 1024:.0f} KB"
+        return (f"[Payload] {what}: {size}, ~{s['original_tokens']} -> ~{s['sent_tokens']} tokens "
+                f"(~{s['original_tokens'] - s['sent_tokens']} saved)")
+
+
+@tracing.traced("payload.build")
+def build_payload(frame, policy: PayloadPolicy = None, ocr_text: str = None, ocr_conf: float = None) -> Payload:
+    """Prepare a Frame for upload according to `policy` (default: from the environment).
+
+    The baseline for the stats is the full-resolution JPEG the frame would
+    otherwise be sent as. Encoding it only for a stat would cost more than
+    the rest of this function, so unless the frame already holds its JPEG
+    ``stats["original_bytes"]`` is None and no byte saving is reported.
+    """
+    policy = policy or PayloadPolicy.from_env()
+    h, w = frame.image.shape[:2]
+    original = frame.cached_jpeg
+    stats = {"original_bytes": len(original) if original is not None else None,
+             "original_tokens": image_tokens(w, h)}
+
+    if (policy.text_only_conf is not None and ocr_text and ocr_text.strip()
+            and ocr_conf is not None and ocr_conf >= policy.text_only_conf):
+        sent = ocr_text.encode("utf-8")
+        stats.update({"sent_bytes": len(sent), "sent_tokens": text_tokens(ocr_text), "ocr_conf": round(ocr_conf, 1)})
+        return Payload(text=ocr_text, stats=stats)
+
+    image = frame.image
+    box = content_box(image) if policy.crop else None
+    if box is not None:
+        x, y, bw, bh = box
+        image = image[y:y + bh, x:x + bw]
+    image = downscale(image, policy.long_edge)
+    data, quality = encode(image, policy.fmt, policy.max_bytes, policy.quality, policy.min_quality)
+    sh, sw = image.shape[:2]
+    stats.update({"sent_bytes": len(data), "sent_tokens": image_tokens(sw, sh), "width": sw, "height": sh,
+                  "format": policy.fmt, "quality": quality, "crop": list(box) if box else None})
+    return Payload(data=data, mime_type=MIME_TYPES[policy.fmt], stats=stats)
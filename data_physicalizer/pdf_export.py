@@ -0,0 +1,257 @@
+"""PDF rendering for the export tools.
+
+Tables are streamed: rows come from any iterator, column widths are measured
+once from the header and the first `sample_rows` rows, and each row is drawn
+with a handful of text operations while the cell grid is drawn once per
+page. Headers repeat on every page. The table is as wide as the longest of
+the header and the sampled rows; a later row with even more cells continues
+on extra lines below it, so no cell is dropped. Font metrics and table styles are cached
+at module level, so repeated exports do not measure the same font again.
+
+fpdf keeps the rendered pages in memory until output. Rows themselves are
+never collected, so memory grows with the size of the PDF, not with the
+Python objects behind a large table.
+"""
+import time
+from itertools import chain, islice
+
+from fpdf import FPDF, XPos, YPos
+
+from . import tracing
+
+
+# --- Font metrics ---
+class FontMetrics:
+    """Per-character widths (mm) of one font/style/size, for measuring and clipping strings."""
+
+    def __init__(self, family: str, style: str, size: float):
+        pdf = FPDF()
+        pdf.set_font(family, style, size)
+        self.widths = {chr(c): pdf.get_string_width(chr(c)) for c in range(32, 256)}
+        self.default = self.widths["n"]
+        self.ellipsis = self.width("...")
+
+    def width(self, text: str) -> float:
+        widths = self.widths
+        default = self.default
+        return sum(widths.get(ch, default) for ch in text)
+
+    def fit(self, text: str, max_width: float) -> str:
+        """Return `text`, or its longest prefix plus "..." that fits in `max_width`."""
+        if self.width(text) <= max_width:
+            return text
+        budget = max_width - self.ellipsis
+        used = 0.0
+        widths = self.widths
+        for i, ch in enumerate(text):
+            used += widths.get(ch, self.default)
+            if used > budget:
+                return text[:i] + "..." if i else ""
+        return text
+
+
+_metrics = {}
+
+
+def get_metrics(family: str = "Helvetica", style: str = "", size: float = 10) -> FontMetrics:
+    key = (family.lower(), style.upper(), float(size))
+    metrics = _metrics.get(key)
+    if metrics is None:
+        metrics = _metrics[key] = FontMetrics(family, style, size)
+    return metrics
+
+
+# --- Styles ---
+class TableStyle:
+    """Fonts, colours and spacing for table exports."""
+
+    def __init__(self, family="Helvetica", title_size=16, header_size=10, body_size=10,
+                 row_height=7.0, header_height=9.0, padding=1.5, header_fill=(200, 220, 255),
+                 min_col_width=12.0):
+        self.family = family
+        self.title_size = title_size
+        self.header_size = header_size
+        self.body_size = body_size
+        self.row_height = row_height
+        self.header_height = header_height
+        self.padding = padding
+        self.header_fill = header_fill
+        self.min_col_width = min_col_width
+
+    @property
+    def header_metrics(self) -> FontMetrics:
+        return get_metrics(self.family, "B", self.header_size)
+
+    @property
+    def body_metrics(self) -> FontMetrics:
+        return get_metrics(self.family, "", self.body_size)
+
+
+STYLES = {"default": TableStyle()}
+
+
+_PUNCTUATION = str.maketrans({
+    "\u2018": "'", "\u2019": "'", "\u201c": '"', "\u201d": '"',
+    "\u2013": "-", "\u2014": "-", "\u2022": "-", "\u2026": "...",
+})
+
+
+def to_latin1(text: str) -> str:
+    """Core PDF fonts only cover latin-1: map common punctuation, replace anything else with '?'."""
+    return text.translate(_PUNCTUATION).encode("latin-1", "replace").decode("latin-1")
+
+
+def column_widths(header, sample, available: float, style: TableStyle):
+    """Split `available` width between columns from measured header and sample widths.
+
+    Columns narrower than their fair share get their natural width; the rest
+    share what is left equally. Spare width is spread proportionally.
+    """
+    n = len(header)
+    pad = 2 * style.padding
+    natural = [style.header_metrics.width(str(h)) + pad for h in header]
+    body = style.body_metrics
+    for row in sample:
+        for i in range(min(n, len(row))):
+            w = body.width(str(row[i])) + pad
+            if w > natural[i]:
+                natural[i] = w
+    natural = [max(w, style.min_col_width) for w in natural]
+    total = sum(natural)
+    if total <= available:
+        return [w * available / total for w in natural]
+    # water-filling: satisfy small columns, split the remainder among wide ones
+    widths = [None] * n
+    remaining = available
+    open_cols = list(range(n))
+    while open_cols:
+        share = remaining / len(open_cols)
+        small = [i for i in open_cols if natural[i] <= share]
+        if not small:
+            for i in open_cols:
+                widths[i] = share
+            break
+        for i in small:
+            widths[i] = natural[i]
+            remaining -= natural[i]
+        open_cols = [i for i in open_cols if widths[i] is None]
+    return widths
+
+
+# --- Renderers ---
+def _new_pdf():
+    pdf = FPDF()
+    pdf.set_auto_page_break(False)
+    pdf.add_page()
+    return pdf
+
+
+@tracing.traced("pdf.render_table")
+def render_table(rows, filename: str, title: str = "Structured Data Table", style=None,
+                 sample_rows: int = 200):
+    """Stream `rows` (an iterable of sequences, header first) into a paginated table PDF.
+
+    Returns a dict with rows, pages and seconds.
+    """
+    started = time.perf_counter()
+    style = STYLES.get(style, style) if isinstance(style, str) else (style or STYLES["default"])
+    rows = iter(rows)
+    header = next(rows, None)
+    if not header:
+        raise ValueError("table has no header row")
+    header = [to_latin1(str(h)) for h in header]
+    sample = [[to_latin1(str(c)) for c in r] for r in islice(rows, sample_rows)]
+    # cells past the header get columns of their own rather than being cut off
+    n = max(len(header), max(map(len, sample), default=0))
+    header += [""] * (n - len(header))
+
+    pdf = _new_pdf()
+    pdf.set_font(style.family, "B", style.title_size)
+    pdf.cell(0, 10, text=title, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
+    pdf.ln(10)
+
+    widths = column_widths(header, sample, pdf.epw, style)
+    xs = [pdf.l_margin]
+    for w in widths:
+        xs.append(xs[-1] + w)
+    header_metrics, body_metrics = style.header_metrics, style.body_metrics
+    header_cells = [header_metrics.fit(h, w - 2 * style.padding) for h, w in zip(header, widths)]
+    bottom = pdf.h - pdf.b_margin
+    # baseline offset that vertically centres text of the given size in a row
+    header_base = (style.header_height + style.header_size * 0.3528 * 0.7) / 2
+    body_base = (style.row_height + style.body_size * 0.3528 * 0.7) / 2
+
+    def draw_header(y):
+        pdf.set_fill_color(*style.header_fill)
+        pdf.rect(xs[0], y, xs[-1] - xs[0], style.header_height, style="F")
+        pdf.set_font(style.family, "B", style.header_size)
+        for i, text in enumerate(header_cells):
+            if not text:
+                continue
+            offset = (widths[i] - header_metrics.width(text)) / 2
+            pdf.text(xs[i] + offset, y + header_base, text)
+        pdf.set_font(style.family, "", style.body_size)
+        return y + style.header_height
+
+    def draw_grid(top, y):
+        # one set of lines per page instead of a bordered cell per value
+        for x in xs:
+            pdf.line(x, top, x, y)
+        pdf.line(xs[0], top, xs[-1], top)
+        pdf.line(xs[0], top + style.header_height, xs[-1], top + style.header_height)
+        row_y = top + style.header_height + style.row_height
+        while row_y <= y + 0.01:
+            pdf.line(xs[0], row_y, xs[-1], row_y)
+            row_y += style.row_height
+
+    page_top = pdf.get_y()
+    y = draw_header(page_top)
+    count = 0
+    fit = body_metrics.fit
+    pad = style.padding
+    limits = [w - 2 * pad for w in widths]
+    text = pdf.text
+    for row in chain(sample, rows):
+        # a row wider than the table wraps: its extra cells go on the next line(s)
+        for start in range(0, max(len(row), 1), n):
+            if y + style.row_height > bottom:
+                draw_grid(page_top, y)
+                pdf.add_page()
+                page_top = pdf.get_y()
+                y = draw_header(page_top)
+            base = y + body_base
+            for i in range(min(n, len(row) - start)):
+                cell = row[start + i]
+                value = cell if isinstance(cell, str) else str(cell)
+                if value:
+                    text(xs[i] + pad, base, fit(to_latin1(value), limits[i]))
+            y += style.row_height
+        count += 1
+    draw_grid(page_top, y)
+    pdf.output(filename)
+    return {"rows": count, "pages": pdf.page_no(), "seconds": time.perf_counter() - started}
+
+
+@tracing.traced("pdf.render_summary")
+def render_summary(lines, filename: str, title: str = "Summary of Captured Notes"):
+    """Write non-empty `lines` as a bulleted list PDF. Returns a dict with lines, pages and seconds."""
+    started = time.perf_counter()
+    pdf = FPDF()
+    pdf.add_page()
+    # use default font; avoid unicode bullets by substituting '-'
+    pdf.set_font("Helvetica", 'B', 16)
+    pdf.cell(0, 10, text=title, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
+    pdf.ln(5)
+    pdf.set_font("Helvetica", size=11)
+    # indent the bullet list once rather than per line
+    pdf.set_left_margin(15)
+    pdf.set_x(15)
+    count = 0
+    for line in lines:
+        clean_line = line.strip()
+        if clean_line:
+            pdf.multi_cell(0, 6, text=f"- {to_latin1(clean_line)}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+            count += 1
+    pdf.set_left_margin(10)
+    pdf.output(filename)
+    return {"lines": count, "pages": pdf.page_no(), "seconds": time.perf_counter() - started}
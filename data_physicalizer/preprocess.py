@@ -0,0 +1,257 @@
+"""Image preprocessing pipeline for OCR.
+
+A pipeline is a list of ``(stage_name, params)`` steps run in order over a
+shared state dict (``img`` colour image, ``gray``, ``th`` binarized image).
+Each stage is timed, so slow steps show up in ``PreprocessResult.timings``.
+
+Presets:
+- "fast": no upscale, no debug writes, deskew only when the skew is noticeable.
+- "quality": 2x upscale and the full enhance/threshold/deskew chain.
+- "debug": "quality" plus the intermediate images written to disk.
+
+Skew is estimated from a projection profile of a downscaled copy, and only
+the binarized image (what the OCR engine reads) is rotated, and only when
+the skew is above the preset's tolerance. PHYSICALIZER_BINARIZE=integral
+switches the threshold stage from OpenCV's Gaussian adaptive threshold to
+Bradley-Roth thresholding on an integral image, which leaves less speckle
+under glare and sensor noise and costs the same for any window size.
+"""
+import os
+import time
+
+import cv2
+import numpy as np
+
+from . import tracing
+
+
+# --- Stages ---
+def _upscale(state, scale=2.0, interpolation=cv2.INTER_CUBIC):
+    if scale != 1.0:
+        state["img"] = cv2.resize(state["img"], None, fx=scale, fy=scale, interpolation=interpolation)
+
+
+def _grayscale(state):
+    img = state["img"]
+    state["gray"] = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+
+
+def _blur(state, ksize=5):
+    state["gray"] = cv2.GaussianBlur(state["gray"], (ksize, ksize), 0)
+
+
+def _clahe(state, clip_limit=2.0, tile_grid=8):
+    # apply CLAHE local contrast enhancement
+    try:
+        clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(tile_grid, tile_grid))
+        state["gray"] = clahe.apply(state["gray"])
+    except Exception:
+        pass
+
+
+def integral_threshold(gray, window: int = 31, t: float = 0.15):
+    """Bradley-Roth binarization: ink where a pixel is more than `t` darker than its window x window mean.
+
+    Window sums come from one integral image, so the cost does not grow with
+    the window size. Borders are mirrored, as for cv2.adaptiveThreshold.
+    """
+    h, w = gray.shape[:2]
+    half = window // 2
+    padded = cv2.copyMakeBorder(gray, half, half, half, half, cv2.BORDER_REFLECT_101)
+    s = cv2.integral(padded, sdepth=cv2.CV_32S)
+    total = cv2.add(cv2.subtract(s[window:window + h, window:window + w], s[:h, window:window + w]),
+                    cv2.subtract(s[:h, :w], s[window:window + h, :w]))
+    threshold = cv2.multiply(total, (1.0 - t) / (window * window), dtype=cv2.CV_32F)
+    return cv2.compare(gray.astype(np.float32), threshold, cv2.CMP_GT)
+
+
+def default_binarize() -> str:
+    """Threshold method chosen by PHYSICALIZER_BINARIZE ("adaptive" or "integral"), else "adaptive"."""
+    return os.getenv("PHYSICALIZER_BINARIZE", "adaptive").lower()
+
+
+def _threshold(state, block_size=15, c=8, method=None, window=31, t=0.15):
+    method = method or default_binarize()
+    if method == "integral":
+        state["th"] = integral_threshold(state["gray"], window=window, t=t)
+        return
+    state["th"] = cv2.adaptiveThreshold(state["gray"], 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                        cv2.THRESH_BINARY, block_size, c)
+
+
+def _close(state, ksize=3):
+    # morphological closing to fill small holes
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (ksize, ksize))
+    state["th"] = cv2.morphologyEx(state["th"], cv2.MORPH_CLOSE, kernel)
+
+
+def skew_angle(th) -> float:
+    """Rotation in degrees that makes the dark content of `th` upright, in [-45, 45)."""
+    coords = cv2.findNonZero(255 - th)
+    if coords is None:
+        return 0.0
+    angle = cv2.minAreaRect(coords)[-1]
+    # minAreaRect reports [-90, 0); fold into [-45, 45) so an upright page is 0
+    while angle < -45:
+        angle += 90
+    while angle >= 45:
+        angle -= 90
+    return float(angle)
+
+
+def projection_skew(th, max_angle: float = 15.0, work_size: int = 800, step: float = 1.0,
+                    fine_step: float = 0.1, max_points: int = 40000) -> float:
+    """Rotation in degrees that makes the text lines of `th` horizontal, in [-max_angle, max_angle].
+
+    Ink pixels of a copy subsampled to about `work_size` are projected onto
+    the vertical axis for every candidate angle at once; the angle with the
+    sharpest row histogram (largest sum of squares) wins. A pass in `step`
+    increments is refined in `fine_step` increments around the best angle.
+    """
+    h, w = th.shape[:2]
+    # strided sampling of a binary image: far cheaper than a resize, and strokes survive it
+    stride = max(1, -(-max(h, w) // work_size))
+    ink = th[::stride, ::stride] < 128
+    ys, xs = np.nonzero(ink)
+    if xs.size < 50:
+        return 0.0
+    if xs.size > max_points:
+        stride = xs.size // max_points + 1
+        ys, xs = ys[::stride], xs[::stride]
+    xs = xs.astype(np.float32) - ink.shape[1] / 2.0
+    ys = ys.astype(np.float32) - ink.shape[0] / 2.0
+
+    def sharpest(angles):
+        rad = np.deg2rad(angles).astype(np.float32)[:, None]
+        rows = np.rint(ys * np.cos(rad) - xs * np.sin(rad)).astype(np.int32)
+        rows -= rows.min()
+        span = int(rows.max()) + 1
+        # one bincount for all angles: each angle gets its own block of `span` bins
+        rows += np.arange(len(angles), dtype=np.int32)[:, None] * span
+        hist = np.bincount(rows.ravel(), minlength=len(angles) * span).reshape(len(angles), span)
+        return float(angles[int(np.argmax((hist.astype(np.float64) ** 2).sum(axis=1)))])
+
+    coarse = sharpest(np.arange(-max_angle, max_angle + step / 2, step))
+    return round(sharpest(np.arange(coarse - step, coarse + step + fine_step / 2, fine_step)), 3)
+
+
+def _deskew(state, min_angle=0.0, rotate_color=False, method="projection"):
+    try:
+        angle = projection_skew(state["th"]) if method == "projection" else skew_angle(state["th"])
+    except Exception:
+        return
+    state["angle"] = angle
+    if abs(angle) <= min_angle:
+        return
+    # only the binarized image is read by the OCR engine; the colour one is rotated for debug output.
+    # nearest-neighbour keeps it binary and is several times cheaper than cubic interpolation
+    (h, w) = state["th"].shape[:2]
+    M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+    state["th"] = cv2.warpAffine(state["th"], M, (w, h), flags=cv2.INTER_NEAREST, borderMode=cv2.BORDER_CONSTANT,
+                                 borderValue=255)
+    if rotate_color:
+        state["img"] = cv2.warpAffine(state["img"], M, (w, h), flags=cv2.INTER_LINEAR,
+                                      borderMode=cv2.BORDER_REPLICATE)
+
+
+def _write_debug(state, keys=("img", "th"), prefix="vision_capture", suffix=None):
+    # save intermediate images for debugging
+    names = {"img": "enhanced", "gray": "gray", "th": "threshold"}
+    for key in keys:
+        if key in state:
+            name = suffix or names.get(key, key)
+            try:
+                cv2.imwrite(f"{prefix}_{name}.jpg", state[key])
+            except Exception:
+                pass
+
+
+STAGES = {
+    "upscale": _upscale,
+    "grayscale": _grayscale,
+    "blur": _blur,
+    "clahe": _clahe,
+    "threshold": _threshold,
+    "close": _close,
+    "deskew": _deskew,
+    "write_debug": _write_debug,
+}
+
+
+# --- Presets ---
+# Bump when a stage's code changes what it outputs, so cached OCR results made
+# with the old pipeline are not reused.
+PIPELINE_VERSION = 2
+
+PRESETS = {
+    "fast": [
+        ("grayscale", {}),
+        ("blur", {"ksize": 3}),
+        ("clahe", {}),
+        ("threshold", {}),
+        ("close", {}),
+        ("deskew", {"min_angle": 1.0}),
+    ],
+    "quality": [
+        ("upscale", {"scale": 2.0}),
+        ("grayscale", {}),
+        ("blur", {"ksize": 5}),
+        ("clahe", {}),
+        ("threshold", {}),
+        ("close", {}),
+        ("deskew", {"min_angle": 0.3}),
+    ],
+    "debug": [
+        ("upscale", {"scale": 2.0}),
+        ("grayscale", {}),
+        ("blur", {"ksize": 5}),
+        ("clahe", {}),
+        ("threshold", {}),
+        ("close", {}),
+        ("write_debug", {"keys": ("img", "th")}),
+        ("deskew", {"rotate_color": True}),
+        ("write_debug", {"keys": ("img",), "suffix": "deskewed"}),
+    ],
+}
+
+
+def default_preset() -> str:
+    """Preset chosen by PHYSICALIZER_PREPROCESS, else "quality"."""
+    return os.getenv("PHYSICALIZER_PREPROCESS", "quality")
+
+
+def preset_steps(preset=None) -> list:
+    """The ``(stage, params)`` steps of a preset name, or `preset` itself when it is a list."""
+    return PRESETS[preset or default_preset()] if not isinstance(preset, list) else preset
+
+
+class PreprocessResult:
+    """Output of a pipeline run: the binarized image, the state and per-stage timings (ms)."""
+
+    def __init__(self, state, timings):
+        self.state = state
+        self.timings = timings
+
+    @property
+    def image(self):
+        """The image to hand to the OCR engine."""
+        return self.state.get("th", self.state.get("gray", self.state["img"]))
+
+    @property
+    def total_ms(self) -> float:
+        return sum(self.timings.values())
+
+
+def preprocess(img, preset=None) -> PreprocessResult:
+    """Run a preset name (or a list of ``(stage, params)`` steps) over a BGR image."""
+    steps = preset_steps(preset)
+    state = {"img": img}
+    timings = {}
+    for name, params in steps:
+        started = time.perf_counter()
+        with tracing.span("preprocess." + name):
+            STAGES[name](state, **params)
+        elapsed = (time.perf_counter() - started) * 1000.0
+        # repeated stages (e.g. two debug writes) accumulate under one name
+        timings[name] = timings.get(name, 0.0) + elapsed
+    return PreprocessResult(state, timings)
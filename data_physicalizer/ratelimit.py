@@ -0,0 +1,110 @@
+"""Asyncio rate limiting for model calls.
+
+RateLimiter is a token bucket: `rate` requests per second on average, with
+up to `burst` back to back. When the API answers 429 the bucket is drained
+and closed until the server's retry-after, or an exponential backoff when
+none was given. Every wait is jittered so concurrent sessions do not retry in
+lockstep. Waiting is an ``await``: the event loop keeps serving the console
+and other sessions while a request is held back.
+"""
+import asyncio
+import os
+import random
+import re
+import time
+
+
+RETRY_IN = re.compile(r'retry (?:in|after) ([\d.]+)\s*s', re.IGNORECASE)
+RETRY_DELAY = re.compile(r"""['"]retryDelay['"]:\s*['"]([\d.]+)s""")
+
+
+def is_rate_limit_error(exc) -> bool:
+    """True for 429 / RESOURCE_EXHAUSTED errors from the model API."""
+    if getattr(exc, "code", None) == 429:
+        return True
+    text = str(exc)
+    return "429" in text or "RESOURCE_EXHAUSTED" in text
+
+
+def retry_after(exc):
+    """Seconds the server asked us to wait, from a Retry-After header or RetryInfo detail; None if absent."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    text = f"{getattr(exc, 'details', '')} {exc}"
+    match = RETRY_DELAY.search(text) or RETRY_IN.search(text)
+    return float(match.group(1)) if match else None
+
+
+class RateLimiter:
+    """Jittered token bucket that also honours 429 backoff."""
+
+    def __init__(self, rate: float = 0.25, burst: int = 2, base_backoff: float = 5.0, max_backoff: float = 300.0,
+                 jitter: float = 0.2, clock=time.monotonic, sleep=asyncio.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.failures = 0
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Build a limiter from PHYSICALIZER_MODEL_RPM (requests per minute, default 15) / PHYSICALIZER_MODEL_BURST."""
+        rpm = float(os.getenv("PHYSICALIZER_MODEL_RPM", "15"))
+        return cls(rate=rpm / 60.0, burst=int(os.getenv("PHYSICALIZER_MODEL_BURST", "2")))
+
+    def _refill(self, now):
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _jittered(self, delay: float) -> float:
+        return delay * (1.0 + random.uniform(0.0, self.jitter))
+
+    @property
+    def blocked_for(self) -> float:
+        """Seconds until the bucket reopens after a 429 (0 when open)."""
+        return max(0.0, self._blocked_until - self._clock())
+
+    async def acquire(self):
+        """Wait until a request may be sent. Returns the seconds spent waiting."""
+        started = self._clock()
+        # one waiter at a time, so queued requests leave in order
+        async with self._lock:
+            while True:
+                now = self._clock()
+                if now < self._blocked_until:
+                    await self._sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return self._clock() - started
+                await self._sleep(self._jittered((1.0 - self._tokens) / self.rate))
+
+    def on_rate_limited(self, retry_after_s: float = None) -> float:
+        """Record a 429: drain the bucket and close it for retry-after (or exponential backoff). Returns the delay."""
+        self.failures += 1
+        if retry_after_s is None:
+            retry_after_s = min(self.max_backoff, self.base_backoff * 2 ** (self.failures - 1))
+        delay = self._jittered(retry_after_s)
+        now = self._clock()
+        self._blocked_until = max(self._blocked_until, now + delay)
+        self._tokens = 0.0
+        self._updated = now
+        return delay
+
+    def on_success(self):
+        self.failures = 0
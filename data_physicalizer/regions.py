@@ -0,0 +1,142 @@
+"""Text-region detection and tiled, parallel OCR.
+
+Whiteboards are mostly empty space, so instead of OCR'ing the whole
+binarized frame we find blocks of ink on the threshold image, crop each
+block, OCR the crops concurrently in a process pool and stitch the text
+back together in reading order.
+"""
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from . import ocr_engines
+
+
+def detect_text_regions(th, min_area: int = 150, pad: int = 6, merge_x: int = None, merge_y: int = None):
+    """Return bounding boxes ``(x, y, w, h)`` of text blocks in a binarized image.
+
+    `th` has dark text on a light background (as produced by the preprocess
+    threshold stage). Characters are merged into blocks by dilating with a
+    wide, short kernel sized from the median glyph height, so words on one
+    line join up while separate lines and columns stay apart.
+    """
+    h, w = th.shape[:2]
+    ink = cv2.bitwise_not(th)
+    if merge_x is None or merge_y is None:
+        glyph_h = _median_glyph_height(ink)
+        merge_x = merge_x or max(9, int(glyph_h * 1.2))
+        merge_y = merge_y or max(3, glyph_h // 4)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (merge_x, merge_y))
+    blocks = cv2.dilate(ink, kernel, iterations=1)
+    contours, _ = cv2.findContours(blocks, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    regions = []
+    for c in contours:
+        x, y, bw, bh = cv2.boundingRect(c)
+        if bw * bh < min_area or bh < 6:
+            continue
+        # drop blocks that span the whole frame (borders, shadows)
+        if bw >= w * 0.98 and bh >= h * 0.98:
+            continue
+        x0, y0 = max(0, x - pad), max(0, y - pad)
+        x1, y1 = min(w, x + bw + pad), min(h, y + bh + pad)
+        regions.append((x0, y0, x1 - x0, y1 - y0))
+    return regions
+
+
+def _median_glyph_height(ink) -> int:
+    n, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    # ignore specks and long rules when estimating the text size
+    heights = heights[(heights >= 4) & (heights <= ink.shape[0] // 4)]
+    if heights.size == 0:
+        return 12
+    return int(np.median(heights))
+
+
+def reading_order(regions):
+    """Group boxes into lines (overlapping vertical centres) and sort top-to-bottom, left-to-right.
+
+    Returns a list of lines, each a list of indices into `regions`.
+    """
+    order = sorted(range(len(regions)), key=lambda i: regions[i][1])
+    lines = []
+    line_bottom = None
+    for i in order:
+        x, y, w, h = regions[i]
+        centre = y + h / 2.0
+        if lines and centre < line_bottom:
+            lines[-1].append(i)
+            line_bottom = max(line_bottom, y + h * 0.75)
+        else:
+            lines.append([i])
+            line_bottom = y + h * 0.75
+    return [sorted(line, key=lambda i: regions[i][0]) for line in lines]
+
+
+# --- Worker pool ---
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Shared process pool for crop OCR (PHYSICALIZER_OCR_WORKERS, default: all cores)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = int(os.getenv("PHYSICALIZER_OCR_WORKERS", "0")) or os.cpu_count() or 1
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            atexit.register(shutdown_pool)
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _ocr_crop(engine_name, crop):
+    # runs in a worker process; the engine is cached per worker
+    return ocr_engines.get_engine(engine_name).recognize(crop)
+
+
+def ocr_crops(th, regions, engine_name: str, executor=None):
+    """OCR each region of `th` concurrently. Returns one text per region, in the order given.
+
+    `executor` defaults to the shared process pool; pass any
+    concurrent.futures executor, or "inline" to run in this process.
+    """
+    crops = [th[y:y + h, x:x + w] for x, y, w, h in regions]
+    if executor == "inline" or len(crops) <= 1:
+        return [_ocr_crop(engine_name, c) for c in crops]
+    executor = executor or get_pool()
+    return list(executor.map(_ocr_crop, [engine_name] * len(crops), crops))
+
+
+def join_regions(regions, texts, column_sep: str = "   "):
+    """Join per-region texts in reading order: `column_sep` within a line, newlines between lines."""
+    lines = []
+    for line in reading_order(regions):
+        parts = [" ".join(texts[i].split()) for i in line]
+        parts = [p for p in parts if p]
+        if parts:
+            lines.append(column_sep.join(parts))
+    return "\n".join(lines)
+
+
+def ocr_regions(th, regions, engine_name: str, executor=None, column_sep: str = "   "):
+    """OCR each region of `th` concurrently and join the text in reading order.
+
+    Blocks on the same line are joined with `column_sep` (multiple spaces, so
+    parse_table_from_ocr still sees the columns); lines are joined with newlines.
+    `executor` is as for ocr_crops.
+    """
+    if not regions:
+        return ""
+    return join_regions(regions, ocr_crops(th, regions, engine_name, executor), column_sep)
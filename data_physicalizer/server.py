@@ -0,0 +1,353 @@
+"""Multi-session HTTP/WebSocket server for the Data Physicalizer agent.
+
+    python -m data_physicalizer.server [--host 127.0.0.1] [--port 8080]
+
+Endpoints (JSON unless noted):
+
+- ``POST /sessions`` -> ``{"session_id"}``
+- ``POST /sessions/{id}/physicalize`` with an image upload (multipart field
+  ``image``) -> summary, OCR text and timings
+- ``POST /sessions/{id}/messages`` ``{"text"}`` -> the agent's reply
+- ``POST /sessions/{id}/export`` ``{"mode", "format"}`` -> saved file path
+- ``GET /stats`` -> load, rejections and p50/p99 latency per endpoint
+- ``WS /sessions/{id}/ws``: binary frames are images to physicalize, text
+  frames are ``{"text": ...}`` or ``{"export": mode, "format": fmt}``
+
+All sessions share one Runner, one RateLimiter, the process-wide OCR engines
+and caches, and a thread pool for decoding and OCR. The OCR text and
+summaries of unchanged boards are only reused within the session that made
+them. Turns within a
+session run one at a time. At most PHYSICALIZER_MAX_INFLIGHT requests run at once and
+at most PHYSICALIZER_MAX_QUEUED wait; beyond that requests are rejected with
+503 and Retry-After instead of piling up. Every response carries its latency
+in X-Latency-Ms.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+from google.genai import types
+
+from . import agent, ocr_engines, sessions
+from .capture import Frame
+from .driver import SessionDriver, build_runner, ocr_with_confidence, physicalize_message
+from .frame_gate import FrameChangeGate
+from .payload import build_payload
+from .ratelimit import RateLimiter
+
+
+class Overloaded(Exception):
+    """Raised when the admission queue is full."""
+
+
+class Admission:
+    """At most `max_inflight` requests run at once and `max_queued` wait; the rest are refused."""
+
+    def __init__(self, max_inflight: int = 8, max_queued: int = 32):
+        self.max_inflight = max_inflight
+        self.max_queued = max_queued
+        self.inflight = 0
+        self.queued = 0
+        self.rejected = 0
+        self._slots = asyncio.Semaphore(max_inflight)
+
+    async def __aenter__(self):
+        if self.inflight >= self.max_inflight and self.queued >= self.max_queued:
+            self.rejected += 1
+            raise Overloaded()
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        self.inflight += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.inflight -= 1
+        self._slots.release()
+
+
+class LatencyStats:
+    """Rolling window of request latencies per endpoint."""
+
+    def __init__(self, window: int = 2048):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+
+    def record(self, route: str, ms: float):
+        self._samples.setdefault(route, deque(maxlen=self.window)).append(ms)
+        self._counts[route] = self._counts.get(route, 0) + 1
+
+    def snapshot(self):
+        out = {}
+        for route, samples in self._samples.items():
+            ordered = sorted(samples)
+            out[route] = {
+                "count": self._counts[route],
+                "p50_ms": round(ordered[len(ordered) // 2], 2),
+                "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 2),
+                "max_ms": round(ordered[-1], 2),
+            }
+        return out
+
+
+class Session:
+    def __init__(self, driver: SessionDriver, gate: FrameChangeGate = None):
+        self.driver = driver
+        # OCR text and summaries are only reused within a session: they must never describe another
+        # operator's board, and another session's history never saw the image
+        self.gate = gate or driver.gate
+        self.frame = None
+        self.ocr_text = None
+        self.lock = asyncio.Lock()
+
+
+class PhysicalizerService:
+    """Session registry plus the shared runner, rate limiter, admission control and worker pool."""
+
+    def __init__(self, runner=None, limiter: RateLimiter = None, workers: int = None, max_inflight: int = None,
+                 max_queued: int = None, max_sessions: int = None):
+        self.runner = runner or build_runner()
+        self.limiter = limiter or RateLimiter.from_env()
+        self.pool = ThreadPoolExecutor(max_workers=workers or int(os.getenv("PHYSICALIZER_SERVER_WORKERS", "0"))
+                                       or os.cpu_count() or 4, thread_name_prefix="physicalizer")
+        self.admission = Admission(max_inflight or int(os.getenv("PHYSICALIZER_MAX_INFLIGHT", "8")),
+                                   max_queued if max_queued is not None
+                                   else int(os.getenv("PHYSICALIZER_MAX_QUEUED", "32")))
+        self.max_sessions = max_sessions or int(os.getenv("PHYSICALIZER_MAX_SESSIONS", "1000"))
+        self.latency = LatencyStats()
+        self._sessions = OrderedDict()
+
+    # --- Sessions ---
+    def create_session(self, session_id: str = None) -> str:
+        session_id = session_id or uuid.uuid4().hex
+        self.session(session_id)
+        return session_id
+
+    def session(self, session_id: str) -> Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            # a session mostly re-sends its latest board; a small gate keeps per-session memory low
+            gate = FrameChangeGate(threshold=agent.get_frame_gate().threshold, capacity=2)
+            driver = SessionDriver(self.runner, self.limiter, user_id="server", session_id=session_id,
+                                   out=lambda *args: None, gate=gate)
+            session = self._sessions[session_id] = Session(driver, gate)
+            while len(self._sessions) > self.max_sessions:
+                old_id, _ = self._sessions.popitem(last=False)
+                asyncio.ensure_future(self._drop_session(old_id))
+        self._sessions.move_to_end(session_id)
+        return session
+
+    async def _drop_session(self, session_id: str):
+        sessions.get_compactor().forget("server", session_id)
+        try:
+            await self.runner.session_service.delete_session(app_name=self.runner.app_name, user_id="server",
+                                                             session_id=session_id)
+        except Exception:
+            pass
+
+    def _run(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    # --- Requests ---
+    # The session lock is taken before an admission slot: requests queued behind their own session's
+    # earlier turn must not hold slots other sessions could use.
+    async def physicalize(self, session_id: str, data: bytes):
+        started = time.perf_counter()
+        session = self.session(session_id)
+        async with session.lock, self.admission:
+            frame = await self._run(_decode, data)
+            if frame is None:
+                raise ValueError("could not decode the uploaded image")
+            timings = {"decode_ms": (time.perf_counter() - started) * 1000.0}
+            session.frame, session.ocr_text = frame, None
+            cached = session.gate.lookup(frame.image)
+            summary = cached.get("summary") if cached else None
+            reused = summary is not None
+            ocr = None
+            ocr_text = ocr_conf = payload_stats = None
+            if ocr_engines.default_engine_name() is not None:
+                if not reused and session.driver.payload_policy.text_only_conf is not None:
+                    ocr_text, ocr_conf = await self._run(ocr_with_confidence, frame, session.gate)
+                    session.ocr_text = ocr_text
+                else:
+                    ocr = self._run(agent.ocr_frame, frame, session.gate)
+            if not reused:
+                payload = await self._run(build_payload, frame, session.driver.payload_policy, ocr_text, ocr_conf)
+                session.driver.record_payload(payload, ocr_text)
+                payload_stats = payload.stats
+                model_started = time.perf_counter()
+                summary = await session.driver.ask_model(physicalize_message(payload), frame)
+                timings["model_ms"] = (time.perf_counter() - model_started) * 1000.0
+                if summary:
+                    session.gate.remember(frame.image, summary=summary)
+            else:
+                session.driver.last_summary = summary
+            ocr_err = None
+            if ocr is not None:
+                session.ocr_text, ocr_err = await ocr
+                if payload_stats is not None and not ocr_err:
+                    session.driver.remember_ocr(payload, session.ocr_text)
+        return {"session_id": session_id, "summary": summary, "reused_summary": reused,
+                "ocr_text": session.ocr_text, "ocr_error": ocr_err, "payload": payload_stats, "timings": timings}
+
+    async def message(self, session_id: str, text: str):
+        session = self.session(session_id)
+        async with session.lock, self.admission:
+            # there is no camera here: the tool reads the session's last upload
+            reply = await session.driver.ask_model(types.Content(role="user", parts=[types.Part(text=text)]),
+                                                   session.frame)
+        return {"session_id": session_id, "reply": reply}
+
+    async def export(self, session_id: str, mode: str = "table", fmt: str = "pdf"):
+        session = self.session(session_id)
+        async with session.lock, self.admission:
+            if session.frame is None and not session.driver.last_summary:
+                raise ValueError("nothing captured yet; physicalize an image first")
+            result = await self._run(self._export, session, mode, fmt)
+        if not result.startswith("Successfully"):
+            raise ValueError(result)
+        return {"session_id": session_id, "path": result.split(" to ", 1)[1]}
+
+    def _export(self, session: Session, mode: str, fmt: str):
+        text = session.ocr_text or session.driver.last_summary
+        if mode == "table":
+            table = agent.extract_table(session.frame, text) if session.frame is not None else None
+            if table:
+                return agent.write_export(json.dumps(table), fmt, mode="table")
+            mode = "summary"
+        return agent.write_export(text or "", fmt, mode=mode)
+
+    def stats(self):
+        return {
+            "sessions": len(self._sessions),
+            "inflight": self.admission.inflight,
+            "queued": self.admission.queued,
+            "rejected": self.admission.rejected,
+            "rate_limited_for_s": round(self.limiter.blocked_for, 2),
+            "latency": self.latency.snapshot(),
+        }
+
+
+def _decode(data: bytes):
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    return Frame(image) if image is not None else None
+
+
+# --- HTTP / WebSocket ---
+def create_app(service: PhysicalizerService = None) -> FastAPI:
+    app = FastAPI(title="Data Physicalizer")
+    app.state.service = service
+
+    def svc() -> PhysicalizerService:
+        # built lazily so the event loop exists when asyncio primitives are created
+        if app.state.service is None:
+            app.state.service = PhysicalizerService()
+        return app.state.service
+
+    @app.middleware("http")
+    async def measure(request: Request, call_next):
+        started = time.perf_counter()
+        response = await call_next(request)
+        ms = (time.perf_counter() - started) * 1000.0
+        route = request.scope.get("route")
+        svc().latency.record(f"{request.method} {getattr(route, 'path', request.url.path)}", ms)
+        response.headers["X-Latency-Ms"] = f"{ms:.2f}"
+        return response
+
+    @app.exception_handler(Overloaded)
+    async def overloaded(request, exc):
+        return JSONResponse({"error": "server busy, retry later"}, status_code=503, headers={"Retry-After": "1"})
+
+    @app.exception_handler(ValueError)
+    async def bad_request(request, exc):
+        return JSONResponse({"error": str(exc)}, status_code=400)
+
+    @app.post("/sessions")
+    async def create_session():
+        return {"session_id": svc().create_session()}
+
+    @app.post("/sessions/{session_id}/physicalize")
+    async def physicalize(session_id: str, image: UploadFile = File(...)):
+        return await svc().physicalize(session_id, await image.read())
+
+    @app.post("/sessions/{session_id}/messages")
+    async def message(session_id: str, body: dict):
+        if not body.get("text"):
+            raise HTTPException(400, "missing 'text'")
+        return await svc().message(session_id, body["text"])
+
+    @app.post("/sessions/{session_id}/export")
+    async def export(session_id: str, body: dict = None):
+        body = body or {}
+        return await svc().export(session_id, body.get("mode", "table"), body.get("format", "pdf"))
+
+    @app.get("/stats")
+    async def stats():
+        return svc().stats()
+
+    @app.websocket("/sessions/{session_id}/ws")
+    async def websocket(ws: WebSocket, session_id: str):
+        await ws.accept()
+        service = svc()
+        try:
+            while True:
+                msg = await ws.receive()
+                if msg.get("type") == "websocket.disconnect":
+                    break
+                started = time.perf_counter()
+                try:
+                    if msg.get("bytes") is not None:
+                        route = "WS physicalize"
+                        reply = await service.physicalize(session_id, msg["bytes"])
+                    else:
+                        body = json.loads(msg.get("text") or "{}")
+                        if "export" in body:
+                            route = "WS export"
+                            reply = await service.export(session_id, body["export"], body.get("format", "pdf"))
+                        else:
+                            route = "WS message"
+                            reply = await service.message(session_id, body.get("text", ""))
+                except Overloaded:
+                    route, reply = "WS rejected", {"error": "server busy, retry later", "retry_after": 1}
+                except ValueError as e:
+                    route, reply = "WS error", {"error": str(e)}
+                ms = (time.perf_counter() - started) * 1000.0
+                service.latency.record(route, ms)
+                reply["latency_ms"] = round(ms, 2)
+                await ws.send_json(reply)
+        except WebSocketDisconnect:
+            pass
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Data Physicalizer agent to many concurrent sessions.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    agent.load_env()
+    # load the OCR engine once, before the first request needs it
+    ocr_engines.warm_up(background=False)
+    uvicorn.run(create_app(), host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,408 @@
+"""Persistent, compact session history for long-running agents.
+
+Two pieces keep long sessions from growing without bound:
+
+- CompactSqliteSessionService stores sessions in sqlite (ADK's
+  SqliteSessionService schema plus an index on event lookups), so the
+  console and the server survive restarts. Before an event is written,
+  every inline image in it is replaced by a short reference carrying its
+  content hash, so the store - and every history reloaded from it - holds
+  no image bytes. The running turn still sees the real image. Sessions
+  idle for longer than PHYSICALIZER_SESSION_MAX_AGE_DAYS are pruned at
+  startup.
+- HistoryCompactor runs before every model call. Images older than the
+  latest user turn are swapped for their hash plus the OCR text when it is
+  known. Turns older than the last PHYSICALIZER_HISTORY_TURNS are condensed
+  into one short recap, and older turns are folded into it until the
+  request fits within PHYSICALIZER_HISTORY_MAX_TOKENS (estimated).
+
+Both record per-session statistics, dropped when a session is deleted and
+capped at the STATS_CAPACITY most recently active sessions; describe()
+reports the token and byte reduction.
+
+- PHYSICALIZER_SESSION_DB: sqlite path (default
+  data_physicalizer/.adk/sessions.db), or "memory" for ADK's in-memory store
+- PHYSICALIZER_SESSION_EVENTS (default 60): most recent events loaded per turn, 0 loads all
+- PHYSICALIZER_SESSION_MAX_AGE_DAYS (default 30): prune sessions idle longer than this, 0 keeps all
+- PHYSICALIZER_HISTORY_TURNS (default 2): user turns sent verbatim, 0 turns the compactor off
+- PHYSICALIZER_HISTORY_MAX_TOKENS (default 8000): estimated input token cap per model call
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+import cv2
+import numpy as np
+from google.adk.agents.run_config import RunConfig
+from google.adk.sessions import InMemorySessionService
+from google.adk.sessions.base_session_service import GetSessionConfig
+from google.adk.sessions.sqlite_session_service import SqliteSessionService
+from google.genai import types
+
+from . import tracing
+from .payload import image_tokens, text_tokens
+
+try:
+    # not part of ADK's public API; without it ADK creates the tables on first use
+    from google.adk.sessions.sqlite_session_service import CREATE_SCHEMA_SQL
+except ImportError:
+    CREATE_SCHEMA_SQL = None
+
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".adk", "sessions.db")
+EVENTS_INDEX_SQL = ("CREATE INDEX IF NOT EXISTS idx_events_session_time"
+                    " ON events (app_name, user_id, session_id, timestamp)")
+IMAGE_REF = re.compile(r"\[image ([0-9a-f]{16})\b[^\]]*\]")
+RECAP_HEADER = "Earlier in this session (condensed):"
+STATS_CAPACITY = 1024  # sessions whose statistics are kept; the least recently active go first
+
+
+# --- Images ---
+_images = OrderedDict()
+_images_lock = threading.Lock()
+_IMAGES_CAPACITY = 256
+
+
+def image_digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def remember_image(data: bytes, text: str = None, width: int = None, height: int = None) -> dict:
+    """Record what is known about an uploaded image (size, OCR text) under its content hash."""
+    digest = image_digest(data)
+    with _images_lock:
+        info = _images.get(digest)
+        if info is None:
+            info = _images[digest] = {"digest": digest, "bytes": len(data), "width": width, "height": height,
+                                      "text": None}
+        if text:
+            info["text"] = text
+        if width and height:
+            info["width"], info["height"] = width, height
+        _images.move_to_end(digest)
+        while len(_images) > _IMAGES_CAPACITY:
+            _images.popitem(last=False)
+    return info
+
+
+def image_info(data: bytes) -> dict:
+    """Hash, size in bytes and pixels, and OCR text (if remembered) of an encoded image."""
+    info = remember_image(data)
+    if info["width"] is None:
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        if image is not None:
+            info["height"], info["width"] = image.shape[:2]
+    return info
+
+
+def image_text(digest: str):
+    with _images_lock:
+        info = _images.get(digest)
+        return info["text"] if info else None
+
+
+def image_ref(blob) -> str:
+    """The text that stands in for an inline image once it has been sent."""
+    info = image_info(blob.data)
+    size = f" {info['width']}x{info['height']}" if info["width"] else ""
+    return f"[image {info['digest']}{size} {blob.mime_type or ''}, {info['bytes'] / 1024:.0f} KB, sent earlier]"
+
+
+def _expand_refs(text: str) -> str:
+    """Append the OCR text to image references whose image was OCR'd."""
+
+    def expand(match):
+        ocr = image_text(match.group(1))
+        return match.group(0) + (f"\nOCR text of that image:\n{ocr.strip()}" if ocr else "")
+
+    return IMAGE_REF.sub(expand, text) if "[image " in text else text
+
+
+def _strip_images(content):
+    """(content with inline images replaced by references, image bytes removed). Returns the input if none."""
+    if content is None or not content.parts or not any(p.inline_data for p in content.parts):
+        return content, 0
+    parts, removed = [], 0
+    for part in content.parts:
+        if part.inline_data and part.inline_data.data:
+            parts.append(types.Part(text=image_ref(part.inline_data)))
+            removed += len(part.inline_data.data)
+        else:
+            parts.append(part)
+    return types.Content(role=content.role, parts=parts), removed
+
+
+def _session_stats(stats: OrderedDict, key, fields) -> dict:
+    """The stats entry for `key` in a bounded LRU of per-session statistics."""
+    s = stats.get(key)
+    if s is None:
+        s = stats[key] = dict.fromkeys(fields, 0)
+        while len(stats) > STATS_CAPACITY:
+            stats.popitem(last=False)
+    stats.move_to_end(key)
+    return s
+
+
+# --- Storage ---
+class CompactSqliteSessionService(SqliteSessionService):
+    """ADK's sqlite session store, indexed, keeping content-hash references instead of inline images."""
+
+    def __init__(self, db_path: str = DEFAULT_PATH, max_age_days: float = None):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)) or ".", exist_ok=True)
+        super().__init__(db_path)
+        self.path = db_path
+        self.pruned = 0
+        self.stats = OrderedDict()
+        self._lock = threading.Lock()
+        # ADK keeps the parsed path in private attributes; a plain file path is what they hold for ours
+        connect_path = getattr(self, "_db_connect_path", db_path)
+        connect_uri = getattr(self, "_db_connect_uri", False)
+        with closing(sqlite3.connect(connect_path, uri=connect_uri)) as conn:
+            if CREATE_SCHEMA_SQL:
+                conn.executescript(CREATE_SCHEMA_SQL)
+            conn.execute("PRAGMA journal_mode=WAL")
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            if "events" in tables:
+                # get_session filters on the session and orders by timestamp; the primary key alone sorts every event
+                conn.execute(EVENTS_INDEX_SQL)
+            if max_age_days and "sessions" in tables:
+                conn.execute("PRAGMA foreign_keys = ON")  # events go with their session
+                cutoff = time.time() - max_age_days * 86400.0
+                self.pruned = conn.execute("DELETE FROM sessions WHERE update_time < ?", (cutoff,)).rowcount
+            conn.commit()
+
+    async def append_event(self, session, event):
+        stored_content, removed = _strip_images(event.content)
+        if event.partial or not removed:
+            return await super().append_event(session, event)
+        stored = event.model_copy(update={"content": stored_content})
+        with tracing.span("sessions.append", image_bytes=removed):
+            await super().append_event(session, stored)
+        # only storage gets the reference; the turn in progress still needs the image itself
+        if session.events and session.events[-1] is stored:
+            session.events[-1] = event
+        with self._lock:
+            s = _session_stats(self.stats, (session.user_id, session.id), ("images", "image_bytes"))
+            s["images"] += 1
+            s["image_bytes"] += removed
+        tracing.count("sessions.image_bytes_stripped", removed)
+        return event
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str):
+        with self._lock:
+            self.stats.pop((user_id, session_id), None)
+        return await super().delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+
+    def db_bytes(self) -> int:
+        return sum(os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p))
+
+
+def build_session_service():
+    """Session store from the environment: compact sqlite by default, ADK's in-memory one on request."""
+    path = os.getenv("PHYSICALIZER_SESSION_DB", DEFAULT_PATH)
+    if path.lower() in ("memory", "off", "none", "0", ""):
+        return InMemorySessionService()
+    max_age = float(os.getenv("PHYSICALIZER_SESSION_MAX_AGE_DAYS", "30"))
+    try:
+        service = CompactSqliteSessionService(path, max_age_days=max_age)
+    except (sqlite3.Error, OSError, RuntimeError) as e:
+        # an unwritable or incompatible store should not stop the session
+        print(f"[System] Session store {path} unavailable ({e}); keeping sessions in memory.")
+        return InMemorySessionService()
+    if service.pruned:
+        print(f"[System] Pruned {service.pruned} session(s) idle for more than {max_age:g} day(s).")
+    return service
+
+
+def run_config():
+    """RunConfig that loads only the most recent PHYSICALIZER_SESSION_EVENTS events of a session."""
+    recent = int(os.getenv("PHYSICALIZER_SESSION_EVENTS", "60"))
+    return RunConfig(get_session_config=GetSessionConfig(num_recent_events=recent) if recent > 0 else None)
+
+
+# --- Context compaction ---
+def _snippet(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+def _part_tokens(part) -> int:
+    if part.text:
+        return text_tokens(part.text)
+    if part.inline_data and part.inline_data.data:
+        info = image_info(part.inline_data.data)
+        return image_tokens(info["width"] or 0, info["height"] or 0)
+    if part.function_call:
+        return text_tokens(part.function_call.name + json.dumps(part.function_call.args or {}, default=str))
+    if part.function_response:
+        return text_tokens(json.dumps(part.function_response.response or {}, default=str))
+    return 0
+
+
+def content_cost(content):
+    """(estimated input tokens, inline image bytes) of one content."""
+    tokens = image_bytes = 0
+    for part in content.parts or ():
+        tokens += _part_tokens(part)
+        if part.inline_data and part.inline_data.data:
+            image_bytes += len(part.inline_data.data)
+    return tokens, image_bytes
+
+
+def estimate(contents, cost=content_cost):
+    """(estimated input tokens, inline image bytes) of a list of contents."""
+    costs = [cost(c) for c in contents]
+    return sum(c[0] for c in costs), sum(c[1] for c in costs)
+
+
+class _CostCache:
+    """content_cost() memoized by content for one model call, so each inline image is hashed once."""
+
+    def __init__(self):
+        # the contents stay alive for the whole call, so their ids are not reused meanwhile
+        self._costs = {}
+
+    def __call__(self, content):
+        cost = self._costs.get(id(content))
+        if cost is None:
+            cost = self._costs[id(content)] = content_cost(content)
+        return cost
+
+
+class HistoryCompactor:
+    """before_model_callback that bounds what each model call replays from the session history."""
+
+    def __init__(self, keep_turns: int = 2, max_tokens: int = 8000, snippet_chars: int = 300):
+        self.keep_turns = keep_turns
+        self.max_tokens = max_tokens
+        self.snippet_chars = snippet_chars
+        self.stats = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(keep_turns=int(os.getenv("PHYSICALIZER_HISTORY_TURNS", "2")),
+                   max_tokens=int(os.getenv("PHYSICALIZER_HISTORY_MAX_TOKENS", "8000")))
+
+    def __call__(self, callback_context, llm_request):
+        contents = list(llm_request.contents or [])
+        cost = _CostCache()
+        with tracing.span("history.compact") as sp:
+            before = estimate(contents, cost)
+            if self.keep_turns > 0:
+                contents = self.compact(contents, cost)
+            # contents carried over unchanged are not estimated again
+            after = estimate(contents, cost)
+            sp.set(tokens_before=before[0], tokens_after=after[0])
+        llm_request.contents = contents
+        session = callback_context.session
+        with self._lock:
+            s = _session_stats(self.stats, (session.user_id, session.id), (
+                "calls", "tokens_before", "tokens_after", "image_bytes_before", "image_bytes_after"))
+            s["calls"] += 1
+            s["tokens_before"] += before[0]
+            s["tokens_after"] += after[0]
+            s["image_bytes_before"] += before[1]
+            s["image_bytes_after"] += after[1]
+        return None
+
+    def forget(self, user_id: str, session_id: str):
+        """Drop the statistics of a deleted session."""
+        with self._lock:
+            self.stats.pop((user_id, session_id), None)
+
+    def compact(self, contents, cost=content_cost):
+        """Contents to send: older turns condensed, old images as references, within max_tokens if possible."""
+        # a turn starts at a user message; function responses also have the user role
+        starts = [i for i, c in enumerate(contents)
+                  if c.role == "user" and any(p.text or p.inline_data for p in c.parts or ())]
+        if not starts:
+            return contents
+        latest = starts[-1]
+        recent = []
+        for i, content in enumerate(contents):
+            if i < latest:
+                content, _ = _strip_images(content)
+                content = self._expand(content)
+            recent.append(content)
+        split = starts[max(0, len(starts) - self.keep_turns)]
+        # fold the oldest kept turns into the recap until the rest fits, but always keep the latest turn
+        kept = [s for s in starts if s >= split]
+        while len(kept) > 1 and self.max_tokens and estimate(recent[kept[0]:], cost)[0] > self.max_tokens:
+            kept.pop(0)
+        split = kept[0]
+        if split == 0:
+            return recent
+        # the recap gets at most a quarter of the cap, whatever the recent turns leave over
+        budget = (min(self.max_tokens // 4, self.max_tokens - estimate(recent[split:], cost)[0])
+                  if self.max_tokens else None)
+        recap = self.recap(contents[:split], budget)
+        first = recent[split]
+        return [types.Content(role=first.role, parts=[types.Part(text=recap)] + list(first.parts))] + recent[split + 1:]
+
+    def recap(self, contents, budget: int = None) -> str:
+        """One line per older message, newest kept when it has to be cut to `budget` tokens."""
+        lines = []
+        for content in contents:
+            who = "User" if content.role == "user" else "Agent"
+            for part in content.parts or ():
+                if part.text:
+                    lines.append(f"{who}: {_snippet(_expand_refs(part.text), self.snippet_chars)}")
+                elif part.inline_data and part.inline_data.data:
+                    ref = image_ref(part.inline_data)
+                    lines.append(f"{who} sent {_snippet(_expand_refs(ref), self.snippet_chars)}")
+                elif part.function_call:
+                    args = json.dumps(part.function_call.args or {}, default=str)
+                    lines.append(f"Agent called {part.function_call.name}({_snippet(args, 80)})")
+                elif part.function_response:
+                    result = json.dumps(part.function_response.response or {}, default=str)
+                    lines.append(f"{part.function_response.name} returned {_snippet(result, 120)}")
+        # repeated prompts ("Please analyze this whiteboard...") only need to appear once, where last said
+        lines = list(reversed(dict.fromkeys(reversed(lines))))
+        if budget is not None:
+            # keep at least a few lines of context even when the recent turns use up the budget
+            limit = max(budget, 100) * 4
+            while len(lines) > 1 and sum(len(line) + 1 for line in lines) > limit:
+                lines.pop(0)
+        return RECAP_HEADER + "\n" + "\n".join(lines)
+
+    @staticmethod
+    def _expand(content):
+        if not any(p.text and "[image " in p.text for p in content.parts or ()):
+            return content
+        parts = [types.Part(text=_expand_refs(p.text)) if p.text else p for p in content.parts]
+        return types.Content(role=content.role, parts=parts)
+
+    def describe(self, user_id: str, session_id: str, store=None) -> str:
+        """One line with the token and image-byte reduction for a session."""
+        s = self.stats.get((user_id, session_id))
+        if not s:
+            return f"[History] {session_id}: no model calls."
+        change = s["tokens_after"] / float(s["tokens_before"]) - 1.0 if s["tokens_before"] else 0.0
+        line = (f"[History] {session_id}: {s['calls']} model call(s), ~{s['tokens_before']} -> "
+                f"~{s['tokens_after']} input tokens ({change:+.0%}), inline images "
+                f"{s['image_bytes_before'] / 1024:.0f} -> {s['image_bytes_after'] / 1024:.0f} KB")
+        stored = getattr(store, "stats", {}).get((user_id, session_id))
+        if stored:
+            line += (f"; {stored['images']} image(s), {stored['image_bytes'] / 1024:.0f} KB kept out of "
+                     f"the session store ({store.db_bytes() / 1024:.0f} KB on disk)")
+        return line + "."
+
+
+_compactor = None
+_compactor_lock = threading.Lock()
+
+
+def get_compactor() -> HistoryCompactor:
+    """Process-wide HistoryCompactor, created from the environment on first use."""
+    global _compactor
+    with _compactor_lock:
+        if _compactor is None:
+            _compactor = HistoryCompactor.from_env()
+        return _compactor
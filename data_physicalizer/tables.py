@@ -0,0 +1,293 @@
+"""Table inference from OCR output.
+
+table_from_words() rebuilds a grid from OCR word boxes: rows come from
+clustering word centres on the y axis and columns from gaps in the x
+coverage of all rows, both computed with NumPy. parse_table() is the
+text-only fallback for engines or inputs without word boxes. It makes one
+pass over the lines and scores every candidate delimiter (tab, pipe,
+comma, runs of whitespace) at the same time. A delimiter drops out as soon
+as a line yields fewer than two cells, so later lines are only split for
+the delimiters that are still in the running. The result carries
+per-column types (numeric/date/text) and a confidence score.
+"""
+import re
+
+import numpy as np
+
+from . import tracing
+
+
+MULTISPACE = re.compile(r'\s{2,}')
+DIGIT = re.compile(r'[0-9]')
+LETTER = re.compile(r'[A-Za-z]')
+# anchored per line (MULTILINE) so a whole column can be classified with one findall
+NUMERIC = re.compile(r'^[-+(]?[$€£₹]?[ \t]*\d[\d,]*(?:\.\d+)?\)?[ \t]*%?$', re.MULTILINE)
+DATE = re.compile(
+    r'^(?:\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}'
+    r'|\d{1,2}[ \t]+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?,?[ \t]+\d{2,4}'
+    r'|(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?[ \t]+\d{1,2},?[ \t]+\d{2,4})$',
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# tried in this order; on equal column-count spread the earlier one wins
+DELIMITERS = ['\t', '|', ',', None]  # None means multi-space or single-space fallback
+
+
+class ParsedTable:
+    """A table (header row first) with per-column types and a 0..1 confidence.
+
+    Column types are inferred from the body rows on first access, so callers
+    that only want the rows do not pay for them.
+    """
+
+    def __init__(self, rows, confidence: float, delimiter=None, synthesized_header: bool = False, column_types=None):
+        self.rows = rows
+        self.confidence = confidence
+        self.delimiter = delimiter
+        self.synthesized_header = synthesized_header
+        self._column_types = column_types
+
+    @property
+    def header(self):
+        return self.rows[0]
+
+    @property
+    def column_types(self):
+        if self._column_types is None:
+            self._column_types = infer_column_types(self.rows[1:]) or ["text"] * len(self.header)
+        return self._column_types
+
+    def to_dict(self):
+        return {
+            "rows": self.rows,
+            "column_types": self.column_types,
+            "confidence": self.confidence,
+            "delimiter": self.delimiter,
+            "synthesized_header": self.synthesized_header,
+        }
+
+
+def _split(line, d):
+    if d is None:
+        # `line` is stripped, so the parts of a whitespace split are already clean
+        parts = MULTISPACE.split(line)
+        return parts if len(parts) > 1 else line.split()
+    return [p for p in (raw.strip() for raw in line.split(d)) if p]
+
+
+def cell_type(value: str) -> str:
+    """Classify one cell as "numeric", "date", "text" or "empty"."""
+    if not value:
+        return "empty"
+    if NUMERIC.match(value):
+        return "numeric"
+    if DATE.match(value):
+        return "date"
+    return "text"
+
+
+def infer_column_types(rows, min_share: float = 0.8):
+    """Type of each column from its body cells: the majority type if it covers `min_share` of non-empty cells."""
+    if not rows:
+        return []
+    types = []
+    for column in zip(*rows):
+        filled = len(column) - column.count('')
+        joined = '\n'.join(column)
+        numeric = len(NUMERIC.findall(joined))
+        # a cell matching both patterns counts as numeric, like cell_type()
+        date = len(DATE.findall(joined)) if numeric < filled else 0
+        counts = {"numeric": numeric, "date": date, "text": filled - numeric - date}
+        best = max(counts, key=counts.get)
+        types.append(best if filled and counts[best] >= min_share * filled else "text")
+    return types
+
+
+def _is_mostly_numeric(vals):
+    n = 0
+    for v in vals:
+        if DIGIT.search(v):
+            n += 1
+    return n >= max(1, len(vals) // 2)
+
+
+def _key_value_table(lines, confidence: float):
+    table = [["Key", "Value"]]
+    for ln in lines:
+        if ':' in ln:
+            k, v = ln.split(':', 1)
+            table.append([k.strip(), v.strip()])
+    parsed = ParsedTable(table, round(confidence, 3), delimiter=':')
+    # keys are labels whatever they look like
+    parsed._column_types = ["text", parsed.column_types[1]]
+    return parsed
+
+
+def parse_table(text: str):
+    """Infer a table from OCR text. Returns a ParsedTable or None.
+
+    Heuristics used:
+    - If lines contain ':' treat as key:value pairs -> 2-col table
+    - Prefer tab, pipe, comma, or multi-space delimiters (in that order)
+    - If rows have inconsistent columns, pad shorter rows with ''
+    - If first row looks like header (contains letters) and subsequent rows are more numeric, treat first as header
+
+    Confidence combines column-count consistency, the share of non-empty
+    cells and whether a real header row was found.
+    """
+    if not text:
+        return None
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    if not lines:
+        return None
+
+    # If most lines contain ':' -> key:value pairs
+    colon_count = sum(1 for ln in lines if ':' in ln)
+    if colon_count >= max(1, len(lines) // 3):
+        return _key_value_table(lines, colon_count / len(lines))
+
+    # single pass: split each line for every delimiter still in the running
+    alive = list(DELIMITERS)
+    rows = {d: [] for d in DELIMITERS}
+    lo = {d: None for d in DELIMITERS}
+    hi = {d: 0 for d in DELIMITERS}
+    for ln in lines:
+        for d in list(alive):
+            if d is not None and d not in ln:
+                alive.remove(d)
+                continue
+            parts = _split(ln, d)
+            n = len(parts)
+            if n < 2:
+                alive.remove(d)
+                continue
+            rows[d].append(parts)
+            lo[d] = n if lo[d] is None else min(lo[d], n)
+            hi[d] = max(hi[d], n)
+        if not alive:
+            break
+
+    if alive:
+        # prefer low variability in column counts; earlier delimiters win ties
+        best = min(alive, key=lambda d: hi[d] - lo[d])
+        max_cols = hi[best]
+        table = [r + [''] * (max_cols - len(r)) for r in rows[best]]
+        consistency = 1.0 - (hi[best] - lo[best]) / max_cols
+        filled = sum(len(r) for r in rows[best]) / float(max_cols * len(table))
+
+        # Heuristic: if first row contains letters and following rows have numeric in many columns -> header
+        first = table[0]
+        rest = table[1:]
+        if rest and any(_is_mostly_numeric(r) for r in rest) and any(LETTER.search(c) for c in first):
+            confidence = round(0.5 * consistency + 0.3 * filled + 0.2, 3)
+            return ParsedTable(table, confidence, delimiter=best)
+
+        # If no clear header, synthesize headers
+        if rest:
+            header = [f"Col{i+1}" for i in range(len(table[0]))]
+            confidence = round(0.5 * consistency + 0.3 * filled + 0.1, 3)
+            return ParsedTable([header] + table, confidence, delimiter=best, synthesized_header=True)
+
+    # Fallback: return key:value single-column pairs if available
+    if colon_count:
+        return _key_value_table(lines, 0.5 * colon_count / len(lines))
+
+    return None
+
+
+@tracing.traced()
+def parse_table_from_ocr(text: str):
+    """Attempt to infer a table from OCR text.
+
+    Returns a list-of-lists table (header row first) or None on failure.
+    See parse_table() for the heuristics and for column types/confidence.
+    """
+    parsed = parse_table(text)
+    return parsed.rows if parsed is not None else None
+
+
+@tracing.traced()
+def table_from_words(words, min_rows: int = 2, min_cols: int = 2, min_conf: float = 20.0,
+                     row_tol: float = 0.5, gap_factor: float = 0.8, noise_share: float = 0.15):
+    """Rebuild a table from word boxes (dicts with text, left, top, width, height, conf).
+
+    Words whose vertical centres are within `row_tol` x the median word height
+    share a row. Columns are the x ranges covered by words in at least two
+    rows and more than `noise_share` of them (so a title spanning the board
+    does not merge columns), split wherever the uncovered gap is at least `gap_factor` x
+    the median word height. Returns a ParsedTable or None if fewer than
+    `min_rows` x `min_cols` cells were found.
+    """
+    n = len(words)
+    if n < min_rows * min_cols:
+        return None
+    # one column array per field; a Python loop building tuples costs as much as the layout itself
+    texts = [w.get("text", "").strip() for w in words]
+    left, top, width, height = (np.fromiter([w[k] for w in words], dtype=np.float64, count=n)
+                                for k in ("left", "top", "width", "height"))
+    conf = np.fromiter([w.get("conf", 100.0) for w in words], dtype=np.float64, count=n)
+    keep = (conf >= min_conf) & np.fromiter(map(bool, texts), dtype=bool, count=n)
+    if not keep.all():
+        idx = np.flatnonzero(keep)
+        texts = [texts[i] for i in idx.tolist()]
+        left, top, width, height, conf = left[idx], top[idx], width[idx], height[idx], conf[idx]
+    if len(texts) < min_rows * min_cols:
+        return None
+    left = np.maximum(left, 0).astype(np.int64)
+    right = left + np.maximum(width, 1).astype(np.int64)
+    med_h = float(np.median(height)) or 1.0
+
+    # rows: break the sorted y centres wherever they jump by more than row_tol * median height
+    yc = top + height / 2.0
+    order = np.argsort(yc, kind="stable")
+    breaks = np.diff(yc[order]) > row_tol * med_h
+    row_id = np.empty(len(texts), dtype=np.int64)
+    row_id[order] = np.concatenate(([0], np.cumsum(breaks)))
+    n_rows = int(row_id.max()) + 1
+    if n_rows < min_rows:
+        return None
+
+    # columns: x coverage via a difference array, then runs of covered pixels
+    size = int(right.max()) + 1
+    coverage = np.cumsum(np.bincount(left, minlength=size) - np.bincount(right, minlength=size))
+    # a column needs ink in at least two rows (e.g. header and one value)
+    occupied = coverage > max(1, int(noise_share * n_rows))
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], occupied.astype(np.int8), [0]))))
+    starts, ends = edges[::2], edges[1::2]
+    if starts.size == 0:
+        return None
+    keep = (starts[1:] - ends[:-1]) >= gap_factor * med_h
+    col_starts = np.concatenate((starts[:1], starts[1:][keep]))
+    n_cols = int(col_starts.size)
+    if n_cols < min_cols:
+        return None
+    xc = (left + right) // 2
+    col_id = np.clip(np.searchsorted(col_starts, xc, side="right") - 1, 0, n_cols - 1)
+
+    # leading rows whose words mostly sit between the columns are titles, not table rows
+    on_grid = np.bincount(row_id, weights=occupied[xc], minlength=n_rows) / np.bincount(row_id, minlength=n_rows)
+    first_row = int(np.argmax(on_grid >= 0.5))
+    if n_rows - first_row < min_rows:
+        return None
+    n_rows -= first_row
+    row_id = row_id - first_row
+
+    # assemble cells: words sorted by row, column, then x, into one flat list of cells
+    cells = n_rows * n_cols
+    flat = [""] * cells
+    cell_id = row_id * n_cols + col_id
+    order = np.lexsort((left, cell_id))
+    order = order[cell_id[order] >= 0]
+    for k, i in zip(cell_id[order].tolist(), order.tolist()):
+        flat[k] = f"{flat[k]} {texts[i]}" if flat[k] else texts[i]
+    table = [flat[r:r + n_cols] for r in range(0, cells, n_cols)]
+
+    filled = (cells - flat.count("")) / float(cells)
+    first = table[0]
+    rest = table[1:]
+    if any(_is_mostly_numeric(r) for r in rest) and any(LETTER.search(c) for c in first):
+        confidence = round(0.5 * float(conf[row_id >= 0].mean()) / 100.0 + 0.3 * filled + 0.2, 3)
+        return ParsedTable(table, confidence, delimiter="layout")
+    header = [f"Col{i+1}" for i in range(n_cols)]
+    confidence = round(0.5 * float(conf[row_id >= 0].mean()) / 100.0 + 0.3 * filled + 0.1, 3)
+    return ParsedTable([header] + table, confidence, delimiter="layout", synthesized_header=True)
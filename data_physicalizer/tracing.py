@@ -0,0 +1,402 @@
+"""Lightweight tracing: span timings, counters and memory high-water marks.
+
+    PHYSICALIZER_TRACE=trace.jsonl python -m data_physicalizer.driver
+    python -m data_physicalizer.tracing trace.jsonl        # per-span summary
+
+Off by default. With PHYSICALIZER_TRACE set (or after enable()), span()
+times a block, count() bumps a named counter, and at exit everything is
+written as JSON Lines, or in Chrome trace format when the path ends in
+``.json`` (open it in chrome://tracing or ui.perfetto.dev). Every span
+records the process peak RSS when it ended, so the stage that raised the
+high-water mark stands out. PHYSICALIZER_TRACE_MEMORY=1 also tracks Python
+allocations with tracemalloc and records each span's own peak; that slows
+the traced code down noticeably.
+
+At most PHYSICALIZER_TRACE_MAX_EVENTS (default 100000, 0 for no limit)
+events are held in memory, so a long-running server or live session does
+not grow without bound. A JSON Lines trace is appended to its file each
+time the buffer fills; for a Chrome trace, or one without a file, the
+oldest events are dropped and counted.
+
+When tracing is off, span() returns a shared no-op context manager and
+count() returns at once, so the instrumentation can stay in hot paths.
+Spans nest through a context variable, which follows asyncio tasks and
+asyncio.to_thread calls. Only the process that enabled tracing records:
+batch worker processes are not traced.
+"""
+import atexit
+import contextvars
+import functools
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+try:
+    import resource  # peak RSS; not available on Windows
+except ImportError:
+    resource = None
+
+
+_tracer = None
+_current = contextvars.ContextVar("physicalizer_span", default=None)
+MAX_EVENTS = 100_000
+
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """A timed block. ``set(key=value)`` attaches attributes before it ends."""
+
+    __slots__ = ("tracer", "name", "attrs", "id", "parent", "start", "mem_start", "child_peak", "_token")
+
+    def __init__(self, tracer, name: str, attrs: dict):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.id = next(tracer.ids)
+        self.parent = None
+        self.start = 0
+        self.mem_start = 0
+        self.child_peak = 0
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.parent = _current.get()
+        self._token = _current.set(self)
+        if self.tracer.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # the parent's peak so far survives the reset below
+            if self.parent is not None:
+                self.parent.child_peak = max(self.parent.child_peak, peak)
+            self.mem_start = current
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # exited in another context (e.g. a generator resumed elsewhere)
+            _current.set(self.parent)
+        tracer = self.tracer
+        event = {
+            "type": "span",
+            "name": self.name,
+            "id": self.id,
+            "parent": self.parent.id if self.parent is not None else None,
+            "ts_us": (self.start - tracer.origin) // 1000,
+            "dur_us": (end - self.start) // 1000,
+            "tid": threading.get_ident(),
+        }
+        if self.attrs:
+            event["attrs"] = self.attrs
+        if exc_type is not None:
+            event["error"] = exc_type.__name__
+        rss = _peak_rss_kb()
+        if rss is not None:
+            event["peak_rss_kb"] = rss
+        if tracer.memory:
+            peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+            event["py_peak_kb"] = max(0, peak - self.mem_start) // 1024
+            if self.parent is not None:
+                self.parent.child_peak = max(self.parent.child_peak, peak)
+        tracer.record(event)
+        return False
+
+
+class Tracer:
+    """Collects span and counter events in memory until written out.
+
+    At most `max_events` (0: no limit) are held. With a JSON Lines `path` a
+    full buffer is appended to the file; otherwise the oldest events are dropped.
+    """
+
+    def __init__(self, path: str = None, memory: bool = False, max_events: int = MAX_EVENTS):
+        self.path = path
+        self.memory = memory
+        self.origin = time.perf_counter_ns()
+        self.started_at = time.time()
+        self.pid = os.getpid()
+        self.ids = itertools.count(1)
+        self.max_events = max_events
+        self.spills = bool(path) and bool(max_events) and not path.lower().endswith(".json")
+        self.events = deque(maxlen=None if self.spills else (max_events or None))
+        self.spilled = 0
+        self.dropped = 0
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+
+    def record(self, event: dict):
+        events = self.events
+        if events.maxlen is not None and len(events) == events.maxlen:
+            self.dropped += 1
+        events.append(event)
+        if self.spills and len(events) >= self.max_events:
+            self.spill()
+
+    def spill(self):
+        """Append the buffered events to the JSON Lines file (header first) and clear the buffer."""
+        with self._spill_lock:
+            batch = []
+            while self.events:
+                batch.append(self.events.popleft())
+            write_jsonl(self, self.path, batch, append=self.spilled > 0)
+            self.spilled += len(batch)
+
+    def count(self, name: str, n=1):
+        with self._lock:
+            value = self.counters.get(name, 0) + n
+            self.counters[name] = value
+        self.record({"type": "counter", "name": name, "value": value,
+                     "ts_us": (time.perf_counter_ns() - self.origin) // 1000})
+
+
+# --- Switching on and off ---
+def enable(path: str = None, memory: bool = False, max_events: int = MAX_EVENTS) -> Tracer:
+    """Start recording (a no-op if already on). `path` is where flush() writes by default."""
+    global _tracer
+    if _tracer is None:
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracer = Tracer(path, memory, max_events)
+        if path:
+            atexit.register(_flush_at_exit)
+    return _tracer
+
+
+def enable_from_env():
+    """Turn tracing on if PHYSICALIZER_TRACE names an output file."""
+    path = os.getenv("PHYSICALIZER_TRACE")
+    if path and path.lower() not in ("0", "off", "false"):
+        memory = os.getenv("PHYSICALIZER_TRACE_MEMORY", "").lower() in ("1", "true", "yes")
+        return enable(path, memory, int(os.getenv("PHYSICALIZER_TRACE_MAX_EVENTS", MAX_EVENTS)))
+    return _tracer
+
+
+def disable():
+    """Stop recording and return the Tracer (or None) with what was collected."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None and tracer.memory:
+        tracemalloc.stop()
+    return tracer
+
+
+def get_tracer():
+    return _tracer
+
+
+# --- Instrumentation ---
+def span(name: str, **attrs):
+    """``with span("ocr.recognize", engine=...):`` times the block when tracing is on."""
+    tracer = _tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return Span(tracer, name, attrs)
+
+
+def traced(name: str = None):
+    """Decorator form of span(); the span is named after the function by default."""
+
+    def decorate(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with Span(_tracer, span_name, {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def count(name: str, n=1):
+    """Add `n` to counter `name` when tracing is on."""
+    tracer = _tracer
+    if tracer is not None:
+        tracer.count(name, n)
+
+
+# --- Export ---
+def write_jsonl(tracer: Tracer, path: str, events=None, append: bool = False):
+    """One JSON object per line: a header, then span and counter events in the order they happened.
+
+    `append` adds `events` (default: the tracer's) to a file already started, without a header.
+    """
+    with open(path, "a" if append else "w", encoding="utf-8") as f:
+        if not append:
+            f.write(json.dumps({"type": "trace", "pid": tracer.pid, "started_at": tracer.started_at,
+                                "memory": tracer.memory}) + "\n")
+        for event in sorted(tracer.events if events is None else events, key=lambda e: e["ts_us"]):
+            f.write(json.dumps(event) + "\n")
+
+
+def write_chrome(tracer: Tracer, path: str):
+    """Chrome trace event format: complete ("X") events for spans, counter ("C") events."""
+    trace_events = []
+    for event in tracer.events:
+        if event["type"] == "span":
+            args = dict(event.get("attrs", {}))
+            for key in ("peak_rss_kb", "py_peak_kb", "error"):
+                if key in event:
+                    args[key] = event[key]
+            trace_events.append({"name": event["name"], "cat": event["name"].split(".")[0], "ph": "X",
+                                 "ts": event["ts_us"], "dur": event["dur_us"], "pid": tracer.pid,
+                                 "tid": event["tid"], "args": args})
+        else:
+            trace_events.append({"name": event["name"], "ph": "C", "ts": event["ts_us"], "pid": tracer.pid,
+                                 "args": {"value": event["value"]}})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms",
+                   "otherData": {"started_at": tracer.started_at}}, f)
+
+
+def flush(path: str = None, tracer: Tracer = None):
+    """Write the collected events to `path` (default: the enable() path). Returns the path or None.
+
+    A JSON Lines trace going to its own file gets the events not written yet appended.
+    """
+    tracer = tracer or _tracer
+    path = path or (tracer.path if tracer else None)
+    if tracer is None or not path:
+        return None
+    if tracer.spills and path == tracer.path:
+        tracer.spill()
+    elif path.lower().endswith(".json"):
+        write_chrome(tracer, path)
+    else:
+        write_jsonl(tracer, path)
+    return path
+
+
+def _flush_at_exit():
+    tracer = _tracer
+    if tracer is None or not tracer.path:
+        return
+    try:
+        written = len(tracer.events)
+        flush()
+        written = tracer.spilled if tracer.spills else written
+        dropped = f" ({tracer.dropped} oldest dropped)" if tracer.dropped else ""
+        print(f"[Trace] {written} event(s) written to {tracer.path}{dropped}")
+    except Exception as e:
+        print(f"[Trace] Could not write {tracer.path}: {e}")
+
+
+# --- Analysis ---
+def collected_events(tracer: Tracer = None):
+    """Every event recorded so far, including those already appended to the trace file."""
+    tracer = tracer or _tracer
+    if tracer is None:
+        return []
+    if tracer.spilled:
+        flush(tracer=tracer)
+        return load_events(tracer.path)
+    return list(tracer.events)
+
+
+def summarize(events):
+    """Per-span-name statistics (count, total/mean/p50/p99/max ms, peaks) and final counter values."""
+    durations, rss, py_peak, counters = {}, {}, {}, {}
+    for event in events:
+        name = event["name"]
+        if event["type"] == "counter":
+            counters[name] = event["value"]
+            continue
+        durations.setdefault(name, []).append(event["dur_us"] / 1000.0)
+        if "peak_rss_kb" in event:
+            rss[name] = max(rss.get(name, 0), event["peak_rss_kb"])
+        if "py_peak_kb" in event:
+            py_peak[name] = max(py_peak.get(name, 0), event["py_peak_kb"])
+    spans = {}
+    for name, values in durations.items():
+        values.sort()
+
+        def pct(p):
+            return round(values[min(len(values) - 1, int(len(values) * p))], 2)
+
+        spans[name] = {"count": len(values), "total_ms": round(sum(values), 2),
+                       "mean_ms": round(sum(values) / len(values), 2), "p50_ms": pct(0.5), "p99_ms": pct(0.99),
+                       "max_ms": round(values[-1], 2), "peak_rss_kb": rss.get(name),
+                       "py_peak_kb": py_peak.get(name)}
+    return {"spans": spans, "counters": counters}
+
+
+def load_events(path: str):
+    """Read span/counter events back from a JSONL or Chrome trace file."""
+    with open(path, encoding="utf-8") as f:
+        if not path.lower().endswith(".json"):
+            return [e for e in (json.loads(line) for line in f if line.strip()) if e["type"] != "trace"]
+        data = json.load(f)
+    events = []
+    for e in data["traceEvents"]:
+        if e["ph"] == "X":
+            args = e.get("args", {})
+            event = {"type": "span", "name": e["name"], "ts_us": e["ts"], "dur_us": e["dur"]}
+            for key in ("peak_rss_kb", "py_peak_kb"):
+                if key in args:
+                    event[key] = args[key]
+            events.append(event)
+        elif e["ph"] == "C":
+            events.append({"type": "counter", "name": e["name"], "ts_us": e["ts"], "value": e["args"]["value"]})
+    return events
+
+
+def report(summary: dict, out=print):
+    """Print a summarize() result as a table, slowest total first."""
+    out(f"{'span':<28} {'count':>6} {'total ms':>10} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'peak RSS':>10}")
+    for name, s in sorted(summary["spans"].items(), key=lambda kv: -kv[1]["total_ms"]):
+        rss = f"{s['peak_rss_kb'] / 1024:.0f} MB" if s["peak_rss_kb"] is not None else "-"
+        py = f"  (+{s['py_peak_kb'] / 1024:.1f} MB py)" if s["py_peak_kb"] else ""
+        out(f"{name:<28} {s['count']:>6} {s['total_ms']:>10.1f} {s['p50_ms']:>9.1f} {s['p99_ms']:>9.1f} "
+            f"{s['max_ms']:>9.1f} {rss:>10}{py}")
+    for name, value in sorted(summary["counters"].items()):
+        out(f"counter {name}: {value}")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print("usage: python -m data_physicalizer.tracing TRACE_FILE (.jsonl or Chrome .json)")
+        return 2
+    report(summarize(load_events(argv[0])))
+    return 0
+
+
+enable_from_env()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Benchmark: cold-start import time of the agent and of the OCR-only path.
+
+    python scripts/bench_import.py [--runs 5] [--budget-ocr-ms 1500] [--budget-agent-ms 8000]
+
+Each target is imported in a fresh interpreter under ``-X importtime``; the
+median total import time over `--runs` runs is reported together with the
+heaviest top-level imports. The OCR-only path must not pull in the model
+stack (google.adk, fastapi), the PDF writer (fpdf) or torch/easyocr. Exits
+non-zero if that happens or a budget is exceeded, so it can guard startup
+time in CI.
+
+cv2 is not on that list: preprocessing, the frame gate and capture call it
+on every frame, and on top of numpy it costs about 17 ms to import.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parents[1]
+
+TARGETS = {
+    "ocr": "from data_physicalizer.agent import ocr_image",
+    "agent-module": "import data_physicalizer.agent",
+    "agent": "from data_physicalizer import root_agent",
+}
+# must stay out of the OCR-only path
+HEAVY = ["torch", "easyocr", "google.adk", "google.genai", "google.cloud.vision", "fastapi", "fpdf"]
+
+
+def import_profile(statement: str):
+    """Run `statement` under -X importtime; return (total_ms, {package: cumulative_ms}, loaded heavy modules)."""
+    probe = f"{statement}\nimport sys\nprint(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    env = dict(os.environ, PYTHONPATH=str(REPO) + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], capture_output=True, text=True,
+                          env=env, cwd=REPO)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    total = 0.0
+    packages = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        _, cumulative_us, name = parts
+        ms = int(cumulative_us) / 1000.0
+        # nested imports are indented further; only top-level entries add up to the total
+        if not name.startswith("   "):
+            total += ms
+        module = name.strip()
+        # group by distribution: "cv2", "numpy", but "google.adk" rather than the "google" namespace
+        package = ".".join(module.split(".")[:2]) if module.startswith("google.") else module.split(".")[0]
+        if package == module:
+            if not package.startswith(("_", "data_physicalizer")):
+                packages[package] = max(packages.get(package, 0.0), ms)
+    heavy = [m for m in proc.stdout.strip().splitlines()[-1].split(",") if m] if proc.stdout.strip() else []
+    return total, packages, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ocr-ms", type=float, default=None, help="fail if the OCR path imports slower")
+    parser.add_argument("--budget-agent-ms", type=float, default=None, help="fail if building the agent is slower")
+    parser.add_argument("--top", type=int, default=6, help="heaviest packages to list")
+    args = parser.parse_args()
+
+    budgets = {"ocr": args.budget_ocr_ms, "agent": args.budget_agent_ms}
+    failed = False
+    for target, statement in TARGETS.items():
+        totals, last = [], None
+        for _ in range(args.runs):
+            total, top, heavy = import_profile(statement)
+            totals.append(total)
+            last = (top, heavy)
+        median = statistics.median(totals)
+        print(f"{target:<13} {median:8.1f} ms  (min {min(totals):.1f}, max {max(totals):.1f})  `{statement}`")
+        top, heavy = last
+        for name, ms in sorted(top.items(), key=lambda kv: -kv[1])[:args.top]:
+            print(f"    {ms:8.1f} ms  {name}")
+        if target == "ocr" and heavy:
+            print(f"    FAIL: OCR-only path imported {', '.join(heavy)}")
+            failed = True
+        budget = budgets.get(target)
+        if budget is not None and median > budget:
+            print(f"    FAIL: {median:.1f} ms is over the {budget:.0f} ms budget")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
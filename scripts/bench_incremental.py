@@ -0,0 +1,136 @@
+"""Benchmark: incremental physicalization against the full pipeline, on edited synthetic boards.
+
+    python scripts/bench_incremental.py [--count 12] [--seed 0] [--engine NAME] [--format pdf] [--out FILE]
+
+Each corpus board is shown once, then again as a later camera frame:
+unchanged ("same", fresh sensor noise only), with one row/line written
+("add"), or with one cell rewritten ("change"). For the second frame,
+the full pipeline (OCR every text block, re-parse, export the whole table,
+upload the whole board) is compared with IncrementalBoard.update() (OCR
+the blocks that changed, merge, export the delta, upload a crop of the
+changed area).
+
+Reported per edit: text blocks and share of the text area OCR'd, upload
+bytes and estimated tokens, exported rows, and wall time. `--engine`
+defaults to the installed OCR engine, else the stub engine. The stub does
+no OCR, so its times only cover the work around OCR; the OCR'd share is
+then the figure to read. With a real engine the delta is also checked
+against the ground truth.
+"""
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ensure repo root is on sys.path so we can import the package when running from the package folder
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_physicalizer import corpus, exporters, ocr_engines
+from data_physicalizer.capture import Frame
+from data_physicalizer.incremental import IncrementalBoard, board_delta, export_delta, union_box
+from data_physicalizer.payload import PayloadPolicy, build_payload
+
+EDITS = ("same", "add", "change")
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - started) * 1000.0
+
+
+def expected_delta(before, after):
+    return board_delta(before.text, before.table, after.text, after.table)
+
+
+def bench_pair(before, after, engine: str, fmt: str, policy: PayloadPolicy, out_dir: str):
+    """(full pipeline row, incremental row) for showing `after` once `before` was processed."""
+    # full pipeline: a fresh board OCRs every block
+    fresh = IncrementalBoard(engine=engine, executor="inline")
+    update, ocr_ms = timed(fresh.update, after.image)
+    rows = update.table or [["Note"]] + [[ln] for ln in (update.text or "").splitlines()]
+    (_, stats), export_ms = timed(exporters.export, rows, fmt, "table", out_dir=out_dir)
+    payload, payload_ms = timed(build_payload, Frame(after.image), policy)
+    full = {"blocks": update.ocr_blocks, "ocr_share": 1.0, "upload_bytes": payload.stats["sent_bytes"],
+            "upload_tokens": payload.stats["sent_tokens"], "export_rows": stats.get("rows", len(rows) - 1),
+            "ms": ocr_ms + export_ms + payload_ms}
+
+    board = IncrementalBoard(engine=engine, executor="inline")
+    board.update(before.image)
+    update, update_ms = timed(board.update, after.image)
+    export_rows, export_ms, upload_bytes, upload_tokens, payload_ms = 0, 0.0, 0, 0, 0.0
+    if update.full:
+        export_rows, export_ms = full["export_rows"], 0.0
+    elif not update.delta.empty:
+        (_, stats), export_ms = timed(export_delta, update.delta, fmt, out_dir=out_dir)
+        export_rows = stats.get("rows", 0)
+    if update.changed:
+        x, y, w, h = union_box(update.changed)
+        crop = after.image[max(0, y - 24):y + h + 24, max(0, x - 24):x + w + 24]
+        payload, payload_ms = timed(build_payload, Frame(crop), policy)
+        upload_bytes, upload_tokens = payload.stats["sent_bytes"], payload.stats["sent_tokens"]
+    incremental = {"blocks": update.ocr_blocks, "ocr_share": update.ocr_share, "upload_bytes": upload_bytes,
+                   "upload_tokens": upload_tokens, "export_rows": export_rows, "full": update.full,
+                   "ms": update_ms + export_ms + payload_ms, "delta": update.delta.counts()}
+    if engine != "stub":
+        truth = expected_delta(before, after)
+        incremental["delta_ok"] = truth.counts() == update.delta.counts()
+    return full, incremental
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engine", default=None, help="OCR engine (default: the installed one, else stub)")
+    parser.add_argument("--format", default="pdf", help="export format")
+    parser.add_argument("--out", default=None, help="also write the results as JSON")
+    args = parser.parse_args()
+
+    engine = args.engine or ocr_engines.default_engine_name() or "stub"
+    try:
+        ocr_engines.get_engine(engine)
+    except Exception as e:
+        if args.engine:
+            raise
+        print(f"engine {engine} unusable ({e}); using the stub engine")
+        engine = "stub"
+    policy = PayloadPolicy.from_env()
+    out_dir = tempfile.mkdtemp(prefix="bench_incremental_")
+    results = {}
+    for edit in EDITS:
+        full_rows, inc_rows = [], []
+        for index in range(args.count):
+            before = corpus.render_sample(index, args.seed)
+            after = corpus.render_sample(index, args.seed, edit=None if edit == "same" else edit, frame=1)
+            full, incremental = bench_pair(before, after, engine, args.format, policy, out_dir)
+            full_rows.append(full)
+            inc_rows.append(incremental)
+
+        def mean(rows, key):
+            return round(statistics.mean(r[key] for r in rows), 3)
+
+        r = results[edit] = {key: {"full": mean(full_rows, key), "incremental": mean(inc_rows, key)}
+                             for key in ("blocks", "ocr_share", "upload_bytes", "upload_tokens", "export_rows", "ms")}
+        r["rebuilt"] = sum(1 for row in inc_rows if row["full"])
+        if engine != "stub":
+            r["delta_ok"] = sum(1 for row in inc_rows if row["delta_ok"])
+        print(f"{edit:<7} blocks OCR'd {r['blocks']['full']:5.1f} -> {r['blocks']['incremental']:4.1f}  "
+              f"(text area {r['ocr_share']['incremental']:.0%})  upload {r['upload_bytes']['full'] / 1024:5.0f} -> "
+              f"{r['upload_bytes']['incremental'] / 1024:4.0f} KB, ~{r['upload_tokens']['full']:.0f} -> "
+              f"~{r['upload_tokens']['incremental']:.0f} tokens  export rows {r['export_rows']['full']:.1f} -> "
+              f"{r['export_rows']['incremental']:.1f}  {r['ms']['full']:6.1f} -> {r['ms']['incremental']:6.1f} ms"
+              + (f"  delta correct {r['delta_ok']}/{args.count}" if "delta_ok" in r else "")
+              + (f"  ({r['rebuilt']} rebuilt)" if r["rebuilt"] else ""))
+    print(f"engine: {engine}" + (" (no OCR; times exclude recognition)" if engine == "stub" else ""))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"seed": args.seed, "count": args.count, "engine": engine, "results": results}, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
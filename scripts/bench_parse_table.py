@@ -0,0 +1,199 @@
+"""Microbenchmark: parse_table_from_ocr vs. the previous multi-pass implementation.
+
+    python scripts/bench_parse_table.py [--lines 500] [--repeat 20]
+
+Generates large synthetic OCR dumps (pipe/comma/whitespace tables and
+free-form notes), checks both implementations return identical tables and
+prints lines/sec for each. Also times layout reconstruction
+(table_from_words) on the word boxes of an equally large grid.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# Ensure repo root is on sys.path so we can import the package when running from the package folder
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_physicalizer.tables import parse_table, parse_table_from_ocr, table_from_words
+
+
+# --- previous implementation, kept verbatim for comparison ---
+def legacy_parse_table_from_ocr(text: str):
+    """Attempt to infer a table from OCR text.
+
+    Returns a list-of-lists table (header row first) or None on failure.
+    Heuristics used:
+    - If lines contain ':' treat as key:value pairs -> 2-col table
+    - Prefer tab, pipe, comma, or multi-space delimiters (in that order)
+    - If rows have inconsistent columns, pad shorter rows with ''
+    - If first row looks like header (contains letters) and subsequent rows are more numeric, treat first as header
+    """
+    if not text:
+        return None
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    if not lines:
+        return None
+
+    # If most lines contain ':' -> key:value pairs
+    colon_count = sum(1 for ln in lines if ':' in ln)
+    if colon_count >= max(1, len(lines) // 3):
+        table = [["Key", "Value"]]
+        for ln in lines:
+            if ':' in ln:
+                k, v = ln.split(':', 1)
+                table.append([k.strip(), v.strip()])
+        return table
+
+    # Try delimiters in order
+    # delimiters: tab, pipe, comma, then whitespace fallback
+    delimiters = ['\t', '|', ',', None]  # None means multi-space or single-space fallback
+    best_table = None
+    best_var = None
+    for d in delimiters:
+        rows = []
+        if d is not None:
+            for ln in lines:
+                parts = [p.strip() for p in ln.split(d) if p.strip()]
+                rows.append(parts)
+        else:
+            # split on 2+ spaces first
+            import re
+            for ln in lines:
+                if re.search(r'\s{2,}', ln):
+                    parts = [p.strip() for p in re.split(r'\s{2,}', ln) if p.strip()]
+                else:
+                    parts = [p.strip() for p in ln.split() if p.strip()]
+                rows.append(parts)
+
+        # compute variability in column counts
+        counts = [len(r) for r in rows]
+        if not counts:
+            continue
+        var = max(counts) - min(counts)
+        # prefer low variability and reasonable columns (>=2)
+        if min(counts) >= 2 and (best_var is None or var < best_var):
+            best_table = rows
+            best_var = var
+
+    if best_table:
+        max_cols = max(len(r) for r in best_table)
+        table = []
+        for r in best_table:
+            row = r + [''] * (max_cols - len(r))
+            table.append(row)
+
+        # Heuristic: if first row contains letters and following rows have numeric in many columns -> header
+        import re
+        def is_mostly_numeric(vals):
+            n = 0
+            for v in vals:
+                if re.search(r'[0-9]', v):
+                    n += 1
+            return n >= max(1, len(vals) // 2)
+
+        first = table[0]
+        rest = table[1:]
+        if rest and any(is_mostly_numeric(r) for r in rest) and any(re.search('[A-Za-z]', c) for c in first):
+            return table
+
+        # If no clear header, synthesize headers
+        if rest:
+            header = [f"Col{i+1}" for i in range(len(table[0]))]
+            return [header] + table
+
+    # Fallback: return key:value single-column pairs if available
+    kvs = []
+    for ln in lines:
+        if ':' in ln:
+            k, v = ln.split(':', 1)
+            kvs.append([k.strip(), v.strip()])
+    if kvs:
+        return [["Key", "Value"]] + kvs
+
+    return None
+
+
+WORDS = ["alpha", "beta", "gamma", "delta", "total", "north", "south", "q1", "q2", "notes"]
+
+
+def synthetic_text(kind: str, lines: int, rng: random.Random) -> str:
+    out = []
+    if kind == "pipe":
+        out.append("Item | Qty | Price | Date")
+        for i in range(lines):
+            out.append(f"{rng.choice(WORDS)}{i} | {rng.randint(1, 99)} | {rng.random() * 100:.2f} | 2024-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}")
+    elif kind == "comma":
+        out.append("Name,Region,Sales")
+        for i in range(lines):
+            out.append(f"{rng.choice(WORDS)},{rng.choice(WORDS)},{rng.randint(100, 9999)}")
+    elif kind == "spaces":
+        out.append("Region    Units    Revenue")
+        for i in range(lines):
+            out.append(f"{rng.choice(WORDS)}    {rng.randint(1, 500)}    ${rng.randint(1000, 90000):,}")
+    else:
+        for i in range(lines):
+            out.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 8))))
+    return "\n".join(out)
+
+
+def synthetic_words(rows: int, cols: int, rng: random.Random):
+    """Word boxes of a rows x cols grid (header first), with jittered positions."""
+    words = []
+    for r in range(rows + 1):
+        for c in range(cols):
+            text = f"Head{c}" if r == 0 else str(rng.randint(1, 9999))
+            words.append({"text": text, "left": 40 + 220 * c + rng.randint(0, 6), "top": 30 + 45 * r + rng.randint(-3, 3),
+                          "width": 16 * len(text), "height": 28, "conf": 90.0})
+    return words
+
+
+def bench(fn, texts, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for t in texts:
+            fn(t)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(1234)
+    kinds = ["pipe", "comma", "spaces", "notes"]
+    texts = [synthetic_text(k, args.lines, rng) for k in kinds]
+    for k, t in zip(kinds, texts):
+        if parse_table_from_ocr(t) != legacy_parse_table_from_ocr(t):
+            print(f"MISMATCH on {k} input")
+            return 1
+        parsed = parse_table(t)
+        if parsed is not None:
+            print(f"{k:7s} cols={len(parsed.header)} types={parsed.column_types} confidence={parsed.confidence}")
+
+    total_lines = args.repeat * sum(len(t.splitlines()) for t in texts)
+    old = bench(legacy_parse_table_from_ocr, texts, args.repeat)
+    new = bench(parse_table_from_ocr, texts, args.repeat)
+    print(f"legacy : {total_lines / old:12,.0f} lines/sec")
+    print(f"current: {total_lines / new:12,.0f} lines/sec  ({old / new:.1f}x)")
+
+    cols = 6
+    grid_words = synthetic_words(args.lines, cols, rng)
+    grid_text = "\n".join("    ".join(w["text"] for w in grid_words[i:i + cols]) for i in range(0, len(grid_words), cols))
+    parsed = table_from_words(grid_words)
+    if parsed is None or len(parsed.rows) != args.lines + 1 or len(parsed.header) != cols:
+        print("layout reconstruction failed on the synthetic grid")
+        return 1
+    layout = bench(table_from_words, [grid_words], args.repeat)
+    text_only = bench(legacy_parse_table_from_ocr, [grid_text], args.repeat)
+    grid_lines = args.repeat * (args.lines + 1)
+    print(f"grid {args.lines}x{cols} legacy text parse: {grid_lines / text_only:12,.0f} rows/sec")
+    print(f"grid {args.lines}x{cols} word layout      : {grid_lines / layout:12,.0f} rows/sec")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
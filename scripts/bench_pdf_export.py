@@ -0,0 +1,84 @@
+"""Benchmark: streaming table PDF export (rows/sec and memory).
+
+    python scripts/bench_pdf_export.py [--rows 100000] [--cols 5] [--legacy-rows 5000]
+
+Rows are generated lazily and streamed into data_physicalizer.pdf_export.
+render_table. For comparison the previous approach (one bordered fpdf cell
+per value, whole table in a list) is timed on --legacy-rows rows.
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ensure repo root is on sys.path so we can import the package when running from the package folder
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fpdf import FPDF, XPos, YPos
+
+from data_physicalizer.pdf_export import render_table
+
+
+def generate_rows(rows: int, cols: int):
+    yield [f"Column {c + 1}" for c in range(cols)]
+    for r in range(rows):
+        yield [f"item-{r}" if c == 0 else str((r * 7919 + c * 104729) % 100000) for c in range(cols)]
+
+
+def legacy_table_pdf(table, filename):
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Helvetica", 'B', 16)
+    pdf.cell(0, 10, text="Structured Data Table", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
+    pdf.ln(10)
+    col_width = pdf.epw / len(table[0])
+    pdf.set_font("Helvetica", 'B', 10)
+    pdf.set_fill_color(200, 220, 255)
+    for header in table[0]:
+        pdf.cell(col_width, 10, text=str(header)[:20], border=1, fill=True, align='C')
+    pdf.ln()
+    pdf.set_font("Helvetica", size=10)
+    for row in table[1:]:
+        for item in row:
+            pdf.cell(col_width, 10, text=str(item)[:25], border=1)
+        pdf.ln()
+    pdf.output(filename)
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--cols", type=int, default=5)
+    parser.add_argument("--legacy-rows", type=int, default=5000, help="0 skips the legacy comparison")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.legacy_rows:
+            table = list(generate_rows(args.legacy_rows, args.cols))
+            started = time.perf_counter()
+            legacy_table_pdf(table, os.path.join(tmp, "legacy.pdf"))
+            elapsed = time.perf_counter() - started
+            print(f"legacy   : {args.legacy_rows:>8} rows  {args.legacy_rows / elapsed:10,.0f} rows/sec")
+            small = render_table(generate_rows(args.legacy_rows, args.cols), os.path.join(tmp, "small.pdf"))
+            print(f"streaming: {small['rows']:>8} rows  {small['rows'] / small['seconds']:10,.0f} rows/sec")
+
+        rss_before = peak_rss_mb()
+        out = os.path.join(tmp, "large.pdf")
+        stats = render_table(generate_rows(args.rows, args.cols), out)
+        print(f"streaming: {stats['rows']:>8} rows  {stats['rows'] / stats['seconds']:10,.0f} rows/sec  "
+              f"{stats['pages']} pages  {os.path.getsize(out) / 1e6:.1f} MB  "
+              f"peak RSS {peak_rss_mb():.0f} MB (was {rss_before:.0f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Benchmark: deskew and binarization on the synthetic corpus, against the previous deskew.
+
+    python scripts/bench_preprocess.py [--count 24] [--seed 0] [--out preprocess_results.json]
+
+For the "fast" (1x) and "quality" (2x upscale) presets, each corpus board
+is run through the preset up to the deskew stage. The previous deskew
+(minAreaRect over every ink pixel, full-size cubic rotation) and the
+current one (projection profile on a subsampled copy, rotation only above
+the preset's tolerance) are then timed on the same image, and their angles
+are compared with the ground-truth skew. The adaptive and integral-image
+thresholds are timed on the same grayscale input, and their speckle
+(ink outside the ground-truth word boxes) is reported.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Ensure repo root is on sys.path so we can import the package when running from the package folder
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import cv2
+import numpy as np
+
+from data_physicalizer import corpus
+from data_physicalizer.preprocess import PRESETS, STAGES, integral_threshold, preprocess
+
+
+# --- previous implementation, kept verbatim for comparison ---
+def legacy_skew_angle(th) -> float:
+    coords = cv2.findNonZero(255 - th)
+    if coords is None:
+        return 0.0
+    angle = cv2.minAreaRect(coords)[-1]
+    # minAreaRect reports [-90, 0); fold into [-45, 45) so an upright page is 0
+    while angle < -45:
+        angle += 90
+    while angle >= 45:
+        angle -= 90
+    return float(angle)
+
+
+def legacy_deskew(state, min_angle=0.0, rotate_color=False):
+    try:
+        angle = legacy_skew_angle(state["th"])
+    except Exception:
+        return
+    state["angle"] = angle
+    if abs(angle) <= min_angle:
+        return
+    (h, w) = state["th"].shape[:2]
+    M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+    state["th"] = cv2.warpAffine(state["th"], M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+    if rotate_color:
+        state["img"] = cv2.warpAffine(state["img"], M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - started) * 1000.0
+
+
+def speckle(th, sample, scale: float, margin: int = 12) -> float:
+    """Share of ink pixels that fall outside the (padded) ground-truth word boxes."""
+    mask = np.zeros(th.shape[:2], dtype=np.uint8)
+    for _, x0, y0, x1, y1 in sample.words:
+        cv2.rectangle(mask, (int(x0 * scale) - margin, int(y0 * scale) - margin),
+                      (int(x1 * scale) + margin, int(y1 * scale) + margin), 255, -1)
+    ink = th < 128
+    total = int(ink.sum())
+    return float((ink & (mask == 0)).sum()) / total if total else 0.0
+
+
+def bench_preset(samples, preset: str):
+    steps = PRESETS[preset]
+    before = [s for s in steps if s[0] != "deskew"]
+    deskew_params = next(params for name, params in steps if name == "deskew")
+    scale = next((params.get("scale", 2.0) for name, params in steps if name == "upscale"), 1.0)
+    rows = {"legacy_deskew_ms": [], "deskew_ms": [], "legacy_angle_err": [], "angle_err": [], "rotated": [],
+            "adaptive_ms": [], "integral_ms": [], "adaptive_speckle": [], "integral_speckle": [], "other_ms": []}
+    for sample in samples:
+        result = preprocess(sample.image, before)
+        rows["other_ms"].append(result.total_ms)
+        truth = -sample.degradations["skew"]  # the rotation that undoes the rendered skew
+
+        legacy_state = dict(result.state)
+        _, ms = timed(legacy_deskew, legacy_state)
+        rows["legacy_deskew_ms"].append(ms)
+        rows["legacy_angle_err"].append(abs(legacy_state.get("angle", 0.0) - truth))
+
+        state = dict(result.state)
+        _, ms = timed(STAGES["deskew"], state, **deskew_params)
+        rows["deskew_ms"].append(ms)
+        rows["angle_err"].append(abs(state.get("angle", 0.0) - truth))
+        rows["rotated"].append(1.0 if state["th"] is not result.state["th"] else 0.0)
+
+        gray = result.state["gray"]
+        adaptive, ms = timed(cv2.adaptiveThreshold, gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+                             15, 8)
+        rows["adaptive_ms"].append(ms)
+        integral, ms = timed(integral_threshold, gray)
+        rows["integral_ms"].append(ms)
+        # speckle is measured before any rotation, where the ground-truth boxes still line up
+        rows["adaptive_speckle"].append(speckle(adaptive, sample, scale))
+        rows["integral_speckle"].append(speckle(integral, sample, scale))
+
+    summary = {key: round(statistics.mean(values), 3) for key, values in rows.items()}
+    summary["legacy_angle_err_max"] = round(max(rows["legacy_angle_err"]), 2)
+    summary["angle_err_max"] = round(max(rows["angle_err"]), 2)
+    summary["legacy_total_ms"] = round(summary["other_ms"] + summary["legacy_deskew_ms"], 2)
+    summary["total_ms"] = round(summary["other_ms"] + summary["deskew_ms"], 2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="also write the results as JSON")
+    args = parser.parse_args()
+
+    samples = corpus.generate(args.count, args.seed)
+    results = {}
+    for preset in ("fast", "quality"):
+        r = results[preset] = bench_preset(samples, preset)
+        print(f"{preset:<8} deskew   legacy {r['legacy_deskew_ms']:7.1f} ms  (angle error mean "
+              f"{r['legacy_angle_err']:.2f}, max {r['legacy_angle_err_max']:.2f} deg)")
+        print(f"{'':<8}          current {r['deskew_ms']:6.1f} ms  (angle error mean {r['angle_err']:.2f}, "
+              f"max {r['angle_err_max']:.2f} deg; rotated {r['rotated']:.0%} of boards)")
+        print(f"{'':<8} threshold adaptive {r['adaptive_ms']:5.1f} ms  speckle {r['adaptive_speckle']:.1%}   "
+              f"integral {r['integral_ms']:5.1f} ms  speckle {r['integral_speckle']:.1%}")
+        print(f"{'':<8} preprocess total {r['legacy_total_ms']:.1f} -> {r['total_ms']:.1f} ms per board")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"seed": args.seed, "count": args.count, "results": results}, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""Benchmark suite on a synthetic whiteboard corpus (offline: no camera, no API).
+
+    python scripts/bench_suite.py [--count 24] [--seed 0] [--out bench_results.json]
+                                  [--baseline old.json] [--tolerance 0.25]
+
+Renders the corpus from data_physicalizer.corpus (known text, tables, word
+boxes and degradations) and measures:
+
+- ocr_image latency and throughput for each engine and preset, with the
+  character error rate against the ground truth for real engines. The stub
+  engine does no recognition, so its numbers are the preprocessing cost.
+- parse_table_from_ocr cell accuracy and speed on the ground-truth tables
+  written as OCR text with increasing character noise, and table_from_words
+  on jittered ground-truth word boxes.
+- export_to_pdf rows/sec for a large table and lines/sec for a summary.
+
+Everything is written to --out as JSON, with a flat "metrics" map. With
+--baseline, each throughput metric that dropped by more than --tolerance
+(relative) and each accuracy that got worse by more than 0.02 is reported,
+and the script exits 1.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ensure repo root is on sys.path so we can import the package when running from the package folder
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import cv2
+import numpy as np
+
+from data_physicalizer import corpus, ocr_engines, tracing
+from data_physicalizer.agent import ocr_image, write_export
+from data_physicalizer.tables import parse_table_from_ocr, table_from_words
+
+
+NOISE_LEVELS = (0.0, 0.02, 0.05)
+CONFUSIONS = {"o": "0", "0": "o", "l": "1", "1": "l", "s": "5", "5": "s", "e": "c", "a": "o", "i": "l", "8": "B"}
+ACCURACY_SLACK = 0.02
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else None
+
+
+# --- OCR ---
+def bench_ocr(samples, engines, presets):
+    results = []
+    for engine in engines:
+        try:
+            ocr_engines.get_engine(engine)
+        except Exception as e:
+            print(f"ocr    skipping {engine}: {e}")
+            continue
+        for preset in presets:
+            latencies, errors, stages = [], [], {}
+            ocr_image(samples[0].image, engine=engine, preset=preset, cache=False, tiled=False)  # warm-up
+            for sample in samples:
+                stats = {}
+                started = time.perf_counter()
+                text, err = ocr_image(sample.image, engine=engine, preset=preset, stats=stats, cache=False,
+                                      tiled=False)
+                latencies.append((time.perf_counter() - started) * 1000.0)
+                if err:
+                    raise RuntimeError(f"{engine}/{preset}: {err}")
+                if engine != "stub":
+                    errors.append(corpus.char_error_rate(text, sample.text))
+                for stage, ms in stats.get("preprocess_ms", {}).items():
+                    stages.setdefault(stage, []).append(ms)
+            results.append({
+                "engine": engine, "preset": preset, "images": len(samples),
+                "p50_ms": round(percentile(latencies, 0.5), 2), "p99_ms": round(percentile(latencies, 0.99), 2),
+                "images_per_s": round(len(latencies) / (sum(latencies) / 1000.0), 2),
+                "cer": round(statistics.mean(errors), 4) if errors else None,
+                "preprocess_ms": {k: round(statistics.mean(v), 2) for k, v in stages.items()},
+            })
+    return results
+
+
+# --- Tables ---
+def ocr_noise(text: str, rate: float, rng: random.Random) -> str:
+    """Simulate OCR mistakes: confusable or dropped characters and column gaps read as one space."""
+    if not rate:
+        return text
+    out = []
+    for line in text.splitlines():
+        cells = line.split("    ")
+        line = cells[0]
+        for cell in cells[1:]:
+            line += (" " if rng.random() < rate * 5 else "    ") + cell
+        chars = []
+        for ch in line:
+            roll = rng.random()
+            if roll < rate / 2:
+                chars.append(CONFUSIONS.get(ch.lower(), ch))
+            elif roll < rate * 0.75 and ch != " ":
+                continue
+            else:
+                chars.append(ch)
+        out.append("".join(chars))
+    return "\n".join(out)
+
+
+def jittered_words(sample, rng: random.Random, jitter: int = 4):
+    """Ground-truth word boxes in OCR engine format, nudged by a few pixels."""
+    words = []
+    for text, x0, y0, x1, y1 in sample.words:
+        dx, dy = rng.randint(-jitter, jitter), rng.randint(-jitter, jitter)
+        words.append({"text": text, "left": x0 + dx, "top": y0 + dy, "width": x1 - x0, "height": y1 - y0,
+                      "conf": 90.0})
+    return words
+
+
+def bench_tables(samples, seed: int, repeat: int = 20):
+    tables = [s for s in samples if s.table]
+    rng = random.Random(seed)
+    results = []
+    for noise in NOISE_LEVELS:
+        for style in ("spaces", "pipes"):
+            texts = []
+            for sample in tables:
+                text = sample.text if style == "spaces" else "\n".join(" | ".join(row) for row in sample.table)
+                texts.append(ocr_noise(text, noise, rng))
+            scores = [corpus.cell_accuracy(parse_table_from_ocr(t), s.table) for t, s in zip(texts, tables)]
+            started = time.perf_counter()
+            for _ in range(repeat):
+                for text in texts:
+                    parse_table_from_ocr(text)
+            elapsed = time.perf_counter() - started
+            lines = repeat * sum(len(t.splitlines()) for t in texts)
+            results.append({"parser": "parse_table_from_ocr", "style": style, "noise": noise, "tables": len(tables),
+                            "cell_accuracy": round(statistics.mean(scores), 4),
+                            "lines_per_s": round(lines / elapsed, 1)})
+    words = [jittered_words(s, rng) for s in tables]
+    scores, flat = [], []
+    for w, sample in zip(words, tables):
+        parsed = table_from_words(w)
+        scores.append(corpus.cell_accuracy(parsed.rows if parsed else None, sample.table))
+        flat.append(1.0 if abs(sample.degradations["skew"]) < 1.0 else 0.0)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for w in words:
+            table_from_words(w)
+    elapsed = time.perf_counter() - started
+    rows = repeat * sum(len(s.table) for s in tables)
+    upright = [score for score, f in zip(scores, flat) if f]
+    results.append({"parser": "table_from_words", "style": "boxes", "noise": 0.0, "tables": len(tables),
+                    "cell_accuracy": round(statistics.mean(scores), 4),
+                    "cell_accuracy_upright": round(statistics.mean(upright), 4) if upright else None,
+                    "rows_per_s": round(rows / elapsed, 1)})
+    return results
+
+
+# --- Export ---
+def bench_export(rows: int, seed: int):
+    rng = random.Random(seed)
+    header = ["Item", "Owner", "Qty", "Price", "Date"]
+    table = [header] + [[f"{rng.choice(corpus.WORDS)}-{i}", rng.choice(corpus.WORDS), str(rng.randint(1, 500)),
+                         f"{rng.randint(1, 999)}.{rng.randint(0, 99):02d}", f"2024-{rng.randint(1, 12):02d}-01"]
+                        for i in range(rows)]
+    notes = "\n".join(" ".join(rng.choice(corpus.WORDS) for _ in range(8)) for _ in range(rows))
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        write_export(json.dumps(table[:5]), "pdf", "table", os.path.join(tmp, "warm.pdf"))  # imports fpdf
+        for mode, content, unit in (("table", json.dumps(table), "rows"), ("summary", notes, "lines")):
+            path = os.path.join(tmp, f"{mode}.pdf")
+            started = time.perf_counter()
+            message = write_export(content, "pdf", mode, path)
+            elapsed = time.perf_counter() - started
+            if not message.startswith("Successfully"):
+                raise RuntimeError(message)
+            results.append({"format": "pdf", "mode": mode, unit: rows, f"{unit}_per_s": round(rows / elapsed, 1),
+                            "seconds": round(elapsed, 3), "bytes": os.path.getsize(path)})
+    return results
+
+
+# --- Results ---
+def flat_metrics(results):
+    metrics = {}
+    for r in results["ocr"]:
+        key = f"ocr.{r['engine']}.{r['preset']}"
+        metrics[f"{key}.images_per_s"] = r["images_per_s"]
+        if r["cer"] is not None:
+            metrics[f"{key}.cer"] = r["cer"]
+    for r in results["tables"]:
+        key = f"tables.{r['parser']}.{r['style']}.noise{r['noise']}"
+        metrics[f"{key}.cell_accuracy"] = r["cell_accuracy"]
+        speed = "lines_per_s" if "lines_per_s" in r else "rows_per_s"
+        metrics[f"{key}.{speed}"] = r[speed]
+    for r in results["export"]:
+        unit = "rows_per_s" if "rows_per_s" in r else "lines_per_s"
+        metrics[f"export.{r['format']}.{r['mode']}.{unit}"] = r[unit]
+    return metrics
+
+
+def regressions(current: dict, baseline: dict, tolerance: float, same_corpus: bool = True):
+    """Messages for metrics that got worse than the baseline allows.
+
+    Accuracy is only comparable on the same corpus (seed and count).
+    """
+    found = []
+    for key, old in sorted(baseline.items()):
+        new = current.get(key)
+        if new is None or old is None:
+            continue
+        if key.endswith("_per_s") and new < old * (1.0 - tolerance):
+            found.append(f"{key}: {old} -> {new} ({new / old - 1.0:+.0%})")
+        elif not same_corpus:
+            continue
+        elif key.endswith("cell_accuracy") and new < old - ACCURACY_SLACK:
+            found.append(f"{key}: {old} -> {new}")
+        elif key.endswith(".cer") and new > old + ACCURACY_SLACK:
+            found.append(f"{key}: {old} -> {new}")
+    return found
+
+
+def environment(args, engines):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=Path(__file__).resolve().parents[1]).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "numpy": np.__version__, "opencv": cv2.__version__, "cpus": os.cpu_count(), "seed": args.seed,
+            "count": args.count, "engines": engines, "timestamp": round(time.time())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=24, help="corpus size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engines", default=None, help="comma-separated OCR engines (default: installed + stub)")
+    parser.add_argument("--presets", default="fast,quality")
+    parser.add_argument("--export-rows", type=int, default=5000)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", default=None, help="earlier --out file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative throughput drop")
+    parser.add_argument("--trace", default=None, help="also write a trace (.jsonl or Chrome .json) of the run")
+    args = parser.parse_args()
+
+    engines = args.engines.split(",") if args.engines else ocr_engines.available_engines() + ["stub"]
+    if args.trace:
+        tracing.enable()
+    started = time.perf_counter()
+    samples = corpus.generate(args.count, args.seed)
+    print(f"corpus: {len(samples)} samples in {time.perf_counter() - started:.1f}s (seed {args.seed})")
+
+    results = {"ocr": bench_ocr(samples, engines, args.presets.split(",")),
+               "tables": bench_tables(samples, args.seed),
+               "export": bench_export(args.export_rows, args.seed)}
+    for r in results["ocr"]:
+        cer = f"  CER {r['cer']:.3f}" if r["cer"] is not None else ""
+        print(f"ocr    {r['engine']:>9}/{r['preset']:<8} {r['images_per_s']:8.2f} img/s  "
+              f"p50 {r['p50_ms']:7.1f} ms  p99 {r['p99_ms']:7.1f} ms{cer}")
+    for r in results["tables"]:
+        speed = f"{r['lines_per_s']:10,.0f} lines/s" if "lines_per_s" in r else f"{r['rows_per_s']:10,.0f} rows/s"
+        print(f"table  {r['parser']:<21} {r['style']:<6} noise {r['noise']:.2f}  "
+              f"accuracy {r['cell_accuracy']:.3f}  {speed}")
+    for r in results["export"]:
+        unit = "rows" if "rows" in r else "lines"
+        print(f"export {r['format']} {r['mode']:<8} {r[unit + '_per_s']:10,.0f} {unit}/s")
+
+    ran = sorted({r["engine"] for r in results["ocr"]})
+    report = {"meta": environment(args, ran), "results": results}
+    report["metrics"] = flat_metrics(results)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"results written to {args.out}")
+    if args.trace:
+        tracing.flush(args.trace)
+        print(f"trace written to {args.trace}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        same_corpus = (baseline["meta"]["seed"], baseline["meta"]["count"]) == (args.seed, args.count)
+        if not same_corpus:
+            print("baseline used a different corpus (seed/count); comparing throughput only")
+        found = regressions(report["metrics"], baseline["metrics"], args.tolerance, same_corpus)
+        for message in found:
+            print(f"REGRESSION {message}")
+        if found:
+            return 1
+        print(f"no regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""Load test: N concurrent clients against the multi-session server.
+
+    python scripts/load_test.py [--clients 16] [--requests 10] [--model-latency 0.2]
+    python scripts/load_test.py --url http://127.0.0.1:8080   (an already running server)
+
+Without --url the server is started in-process with the fake model
+(PHYSICALIZER_MODEL=fake, `--model-latency` seconds per call), the stub OCR
+engine, in-memory sessions and no rate limit. Each client opens a session and uploads
+`--requests` distinct whiteboard images; every third request also sends a
+chat message. Reports p50/p99 latency per request type, throughput and how
+many requests were turned away with 503.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Ensure repo root is on sys.path so we can import the package when running from the package folder
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import cv2
+import numpy as np
+
+
+def make_image(client: int, index: int) -> bytes:
+    img = np.full((480, 640, 3), 245, np.uint8)
+    for row in range(4):
+        cv2.putText(img, f"client {client} item {index} row {row}  {index * 7 + row}", (30, 80 + row * 90),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.0, (20, 20, 20), 2)
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    return buf.tobytes()
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else float("nan")
+
+
+def start_local_server(model_latency: float) -> str:
+    os.environ.setdefault("PHYSICALIZER_MODEL", "fake")
+    os.environ.setdefault("PHYSICALIZER_OCR_ENGINE", "stub")
+    os.environ.setdefault("PHYSICALIZER_OCR_CACHE", "off")
+    os.environ.setdefault("PHYSICALIZER_SESSION_DB", "memory")
+    os.environ.setdefault("PHYSICALIZER_MODEL_RPM", "1000000")
+    os.environ.setdefault("PHYSICALIZER_MODEL_BURST", "1000")
+    import uvicorn
+
+    from data_physicalizer import agent
+    from data_physicalizer.server import create_app
+
+    if hasattr(agent.root_agent.model, "latency"):
+        agent.root_agent.model.latency = model_latency
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(create_app(), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def client(http, n: int, requests: int, results: dict):
+    r = await http.post("/sessions")
+    session_id = r.json()["session_id"]
+    for i in range(requests):
+        started = time.perf_counter()
+        r = await http.post(f"/sessions/{session_id}/physicalize",
+                            files={"image": (f"{n}_{i}.jpg", make_image(n, i), "image/jpeg")})
+        elapsed = (time.perf_counter() - started) * 1000.0
+        results.setdefault("physicalize" if r.status_code == 200 else f"status {r.status_code}", []).append(elapsed)
+        if i % 3 == 2:
+            started = time.perf_counter()
+            r = await http.post(f"/sessions/{session_id}/messages", json={"text": "Make it a table"})
+            elapsed = (time.perf_counter() - started) * 1000.0
+            results.setdefault("message" if r.status_code == 200 else f"status {r.status_code}", []).append(elapsed)
+
+
+async def run(url: str, clients: int, requests: int):
+    import httpx
+
+    results = {}
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=url, timeout=300, limits=limits) as http:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(http, n, requests, results) for n in range(clients)))
+        elapsed = time.perf_counter() - started
+        stats = (await http.get("/stats")).json()
+    return results, elapsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=None, help="server to test (default: start one in-process)")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=10, help="uploads per client")
+    parser.add_argument("--model-latency", type=float, default=0.2, help="fake model seconds per call (in-process only)")
+    args = parser.parse_args()
+
+    url = args.url or start_local_server(args.model_latency)
+    results, elapsed, stats = asyncio.run(run(url, args.clients, args.requests))
+    total = sum(len(v) for v in results.values())
+    print(f"{args.clients} clients x {args.requests} uploads: {total} requests in {elapsed:.2f}s "
+          f"({total / elapsed:.1f} req/s)")
+    for name, samples in sorted(results.items()):
+        print(f"  {name:<12} n={len(samples):<5} p50={percentile(samples, 0.5):8.1f} ms  "
+              f"p99={percentile(samples, 0.99):8.1f} ms")
+    print(f"  server: {stats['sessions']} sessions, {stats['rejected']} rejected")
+    for route, s in sorted(stats["latency"].items()):
+        print(f"    {route:<40} p50={s['p50_ms']:8.1f} ms  p99={s['p99_ms']:8.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
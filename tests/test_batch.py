@@ -0,0 +1,90 @@
+"""run_batch naming, duplicate skipping and per-item errors, with the stub OCR engine.
+
+    python -m unittest discover -s tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ["PHYSICALIZER_OCR_CACHE"] = "off"
+
+import cv2
+import numpy as np
+
+from data_physicalizer.batch import iter_video_frames, run_batch
+
+
+def board(seed: int):
+    image = np.full((120, 160, 3), 255, dtype=np.uint8)
+    image[40 + seed:60 + seed, 20:140] = 0
+    return image
+
+
+def written_board(text: str):
+    image = np.full((480, 640, 3), 235, dtype=np.uint8)
+    cv2.putText(image, text, (80, 240), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (30, 30, 30), 2)
+    return image
+
+
+class VideoFramesTest(unittest.TestCase):
+    def test_an_edited_digit_is_a_new_frame(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "meeting.avi")
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10.0, (640, 480))
+            for text in ("Qty 12",) * 3 + ("Qty 18",) * 3 + ("Qty 18 apples",) * 3:
+                writer.write(written_board(text))
+            writer.release()
+            names = [name for name, _ in iter_video_frames(path, every=0.1)]
+        self.assertEqual(names, ["meeting_t00000.00", "meeting_t00000.30", "meeting_t00000.60"])
+
+
+class RunBatchTest(unittest.TestCase):
+    def setUp(self):
+        # the worker processes create their own engine from the environment
+        os.environ["PHYSICALIZER_OCR_ENGINE"] = "stub"
+        self.root = tempfile.mkdtemp()
+        self.out = os.path.join(self.root, "out")
+        for folder, seed in (("a", 0), ("b", 30)):
+            os.makedirs(os.path.join(self.root, folder))
+            cv2.imwrite(os.path.join(self.root, folder, "board.png"), board(seed))
+
+    def tearDown(self):
+        os.environ.pop("PHYSICALIZER_OCR_ENGINE", None)
+        shutil.rmtree(self.root)
+
+    def run_batch(self, *folders):
+        return run_batch([os.path.join(self.root, f) for f in folders], self.out, workers=1, formats=("csv",))
+
+    def test_same_file_name_in_two_folders(self):
+        manifest = self.run_batch("a", "b")
+        names = [r["name"] for r in manifest["items"]]
+        self.assertEqual(len(set(names)), 2)
+        self.assertIn("board", names)
+        self.assertEqual(len({r["json"] for r in manifest["items"]}), 2)
+        self.assertEqual(manifest["failed"], 0)
+
+    def test_identical_image_is_skipped(self):
+        os.makedirs(os.path.join(self.root, "c"))
+        shutil.copy(os.path.join(self.root, "a", "board.png"), os.path.join(self.root, "c", "copy.png"))
+        manifest = self.run_batch("a", "c")
+        self.assertEqual(manifest["processed"], 1)
+        self.assertEqual(manifest["duplicates"], [
+            {"name": "copy", "source": os.path.join(self.root, "c", "copy.png"), "duplicate_of": "board"}])
+
+    def test_worker_exception_is_an_error_row(self):
+        # a directory where the JSON output should go makes the worker raise
+        os.makedirs(os.path.join(self.out, "board.json"))
+        manifest = self.run_batch("a", "b")
+        self.assertEqual(manifest["processed"], 2)
+        self.assertEqual(manifest["failed"], 1)
+        failed = next(r for r in manifest["items"] if "error" in r)
+        self.assertEqual(failed["name"], "board")
+        self.assertTrue(failed["error"].startswith("IsADirectoryError"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,282 @@
+"""SessionDriver retries and rate limiting against FakeModel, and OCR with the stub engine.
+
+    python -m unittest discover -s tests
+
+Everything runs offline: the model is FakeModel, sessions are in memory and
+the rate limiter runs on a fake clock, so no test actually sleeps.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import unittest
+import warnings
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ["PHYSICALIZER_SESSION_DB"] = "memory"
+os.environ["PHYSICALIZER_OCR_CACHE"] = "off"
+# ADK logs every 429 the fake model raises, with its traceback
+logging.disable(logging.CRITICAL)
+
+import cv2
+import numpy as np
+from google import adk
+from google.adk.models.llm_response import LlmResponse
+from google.genai import errors, types
+
+from data_physicalizer import agent, ocr_engines
+from data_physicalizer.capture import Frame
+from data_physicalizer.driver import SessionDriver, build_runner
+from data_physicalizer.fake_model import FakeModel
+from data_physicalizer.frame_gate import FrameChangeGate
+from data_physicalizer.incremental import BoardUpdate, Delta
+from data_physicalizer.ratelimit import RateLimiter, is_rate_limit_error, retry_after
+
+
+class FakeClock:
+    """monotonic() and asyncio.sleep() stand-ins: sleeping just moves the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def setUpModule():
+    # the unittest runner resets warning filters, so this cannot go at import time
+    warnings.filterwarnings("ignore", message=r"\[EXPERIMENTAL\]")
+
+
+class ToolCallingModel(FakeModel):
+    """Calls capture_vision_frame first, then answers with what the tool returned."""
+
+    async def generate_content_async(self, llm_request, stream: bool = False):
+        self.calls += 1
+        last = llm_request.contents[-1].parts[0]
+        if last.function_response is None:
+            call = types.FunctionCall(name="capture_vision_frame", args={})
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(function_call=call)]))
+            return
+        result = last.function_response.response.get("result")
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=result)]))
+
+
+def make_driver(fail_first: int = 0, max_retries: int = 3, rate: float = 1.0, burst: int = 2, model=None):
+    model = model or FakeModel(fail_first=fail_first, retry_delay=7.0)
+    root = adk.Agent(name="DataPhysicalizer", model=model, instruction="Test agent.",
+                     tools=[agent.capture_vision_frame])
+    clock = FakeClock()
+    limiter = RateLimiter(rate=rate, burst=burst, jitter=0.0, clock=clock, sleep=clock.sleep)
+    lines = []
+    driver = SessionDriver(build_runner(root), limiter, max_retries=max_retries, out=lines.append)
+    driver.board = None
+    return driver, model, clock, lines
+
+
+def user_text(text):
+    return types.Content(role="user", parts=[types.Part(text=text)])
+
+
+def blank_frame(seed: int = 0):
+    image = np.full((240, 320, 3), 255, dtype=np.uint8)
+    image[100 + seed:120 + seed, 40:280] = 0
+    return Frame(image)
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_burst_then_paced(self):
+        clock = FakeClock()
+        limiter = RateLimiter(rate=0.5, burst=2, jitter=0.0, clock=clock, sleep=clock.sleep)
+
+        async def run():
+            return [await limiter.acquire() for _ in range(3)]
+
+        waits = asyncio.run(run())
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertAlmostEqual(waits[2], 2.0)
+
+    def test_429_closes_the_bucket_for_retry_after(self):
+        clock = FakeClock()
+        limiter = RateLimiter(rate=10.0, burst=5, jitter=0.0, clock=clock, sleep=clock.sleep)
+        self.assertEqual(limiter.on_rate_limited(12.0), 12.0)
+        self.assertAlmostEqual(asyncio.run(limiter.acquire()), 12.0)
+
+    def test_backoff_without_retry_after_doubles(self):
+        limiter = RateLimiter(base_backoff=5.0, jitter=0.0, clock=FakeClock())
+        self.assertEqual([limiter.on_rate_limited() for _ in range(3)], [5.0, 10.0, 20.0])
+        limiter.on_success()
+        self.assertEqual(limiter.on_rate_limited(), 5.0)
+
+    def test_retry_delay_from_fake_model_error(self):
+        exc = errors.ClientError(429, {"error": {
+            "code": 429, "status": "RESOURCE_EXHAUSTED", "message": "Please retry in 3.5s.",
+            "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "3.5s"}]}})
+        self.assertTrue(is_rate_limit_error(exc))
+        self.assertEqual(retry_after(exc), 3.5)
+        self.assertFalse(is_rate_limit_error(ValueError("bad request")))
+
+
+class AskModelTest(unittest.TestCase):
+    def test_reply(self):
+        driver, model, _, _ = make_driver()
+        reply = asyncio.run(driver.ask_model(user_text("hello")))
+        self.assertEqual(reply, "[fake] hello")
+        self.assertEqual(driver.last_summary, reply)
+        self.assertEqual(model.calls, 1)
+
+    def test_retries_429_after_the_servers_delay(self):
+        driver, model, clock, lines = make_driver(fail_first=2)
+        reply = asyncio.run(driver.ask_model(user_text("hello")))
+        self.assertEqual(reply, "[fake] hello")
+        self.assertEqual(model.calls, 3)
+        self.assertEqual(driver.stats["rate_limited"], 2)
+        self.assertEqual(driver.stats["model_calls"], 3)
+        # each 429 closes the limiter for the 7s the fake model asked for
+        self.assertAlmostEqual(driver.stats["waited_seconds"], 14.0)
+        self.assertEqual(sum("rate limit hit" in line for line in lines), 2)
+
+    def test_gives_up_after_max_retries(self):
+        driver, model, _, lines = make_driver(fail_first=10, max_retries=2)
+        self.assertIsNone(asyncio.run(driver.ask_model(user_text("hello"))))
+        self.assertEqual(model.calls, 3)
+        self.assertTrue(any("Max retries exceeded" in line for line in lines))
+
+    def test_other_errors_are_not_retried(self):
+        driver, _, _, _ = make_driver()
+
+        async def broken(**kwargs):
+            raise ValueError("boom")
+            yield
+
+        driver.runner.run_async = broken
+        with self.assertRaises(ValueError):
+            asyncio.run(driver.ask_model(user_text("hello")))
+        self.assertEqual(driver.stats["model_calls"], 1)
+
+    def test_queued_requests_are_paced_by_the_limiter(self):
+        driver, model, clock, _ = make_driver(rate=0.25, burst=1)
+
+        async def run():
+            worker = asyncio.create_task(driver.worker())
+            for text in ("one", "two", "three"):
+                driver.submit(text)
+            await driver.queue.join()
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+
+        asyncio.run(run())
+        self.assertEqual(model.calls, 3)
+        # one token to start with, then one every 4s
+        self.assertAlmostEqual(driver.stats["waited_seconds"], 8.0)
+
+
+class StubEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = ocr_engines.StubEngine(text="Item  Qty\napple  3")
+        self.engine.loaded = True
+        ocr_engines.set_engine("stub", self.engine)
+        os.environ["PHYSICALIZER_OCR_ENGINE"] = "stub"
+        agent.get_frame_gate().clear()
+
+    def tearDown(self):
+        os.environ.pop("PHYSICALIZER_OCR_ENGINE", None)
+        agent.get_frame_gate().clear()
+
+    def test_unchanged_board_reuses_the_summary(self):
+        driver, model, _, _ = make_driver()
+        frame = blank_frame()
+
+        async def run():
+            first = await driver.physicalize(frame)
+            second = await driver.physicalize(Frame(frame.image.copy()))
+            return first, second
+
+        first, second = asyncio.run(run())
+        self.assertEqual(first, second)
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(driver.stats["reused_summaries"], 1)
+
+    def test_update_with_changed_text_skips_the_gate(self):
+        driver, model, _, _ = make_driver()
+        frame = blank_frame()
+        agent.get_frame_gate().remember(frame.image, summary="old board")
+        driver.last_summary = "old board"
+        delta = Delta(added=["apple  3"])
+        update = BoardUpdate("Item  Qty\napple  3", None, delta, full=False, changed=[(40, 100, 240, 20)])
+        summary = asyncio.run(driver.physicalize(frame, update=update, diff=False))
+        self.assertEqual(model.calls, 1)
+        self.assertNotEqual(summary, "old board")
+        self.assertEqual(agent.get_frame_gate().lookup(frame.image),
+                         {"ocr_text": "Item  Qty\napple  3", "summary": summary})
+
+    def test_tool_reads_the_uploaded_frame(self):
+        driver, model, _, _ = make_driver(model=ToolCallingModel())
+        driver.payload_policy.text_only_conf = None
+        self.engine.text_fn = lambda image: "uploaded board"
+        original = agent.grab_frame
+        agent.grab_frame = lambda: self.fail("the tool grabbed a new frame")
+        try:
+            summary = asyncio.run(driver.physicalize(blank_frame(seed=30)))
+        finally:
+            agent.grab_frame = original
+        self.assertEqual(summary, "Image captured. OCR output:\nuploaded board")
+        self.assertEqual(model.calls, 2)
+        # the driver's prefetch and the tool share one OCR pass
+        self.assertEqual(self.engine.calls, 1)
+        self.assertIsNone(agent.current_frame.get())
+
+    def test_concurrent_ocr_of_one_frame_runs_once(self):
+        started = threading.Event()
+
+        def slow(image):
+            started.set()
+            time.sleep(0.2)
+            return "slow text"
+
+        self.engine.text_fn = slow
+        frame = blank_frame(seed=5)
+        results = []
+        first = threading.Thread(target=lambda: results.append(agent.ocr_frame(frame)))
+        first.start()
+        started.wait(5)
+        results.append(agent.ocr_frame(frame))
+        first.join()
+        self.assertEqual(results, [("slow text", None), ("slow text", None)])
+        self.assertEqual(self.engine.calls, 1)
+
+
+class FrameGateTest(unittest.TestCase):
+    def test_same_board_matches_and_a_new_one_does_not(self):
+        gate = FrameChangeGate()
+        frame = blank_frame()
+        gate.remember(frame.image, summary="s")
+        self.assertEqual(gate.lookup(frame.image.copy()), {"summary": "s"})
+        self.assertIsNone(gate.lookup(blank_frame(seed=60).image))
+
+    def test_changed_digit_misses(self):
+        for height, width in ((480, 640), (720, 1280), (1080, 1920)):
+            def board(value):
+                image = np.full((height, width, 3), 240, dtype=np.uint8)
+                for row, text in enumerate(("Item   Qty", "apple  " + value, "pear   7")):
+                    cv2.putText(image, text, (60, 80 + 50 * row), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (40, 40, 40), 2)
+                return image
+
+            gate = FrameChangeGate()
+            gate.remember(board("12"), summary="apple 12")
+            noisy = np.clip(board("12") + np.random.default_rng(1).normal(0, 4, (height, width, 3)), 0, 255)
+            self.assertEqual(gate.lookup(noisy.astype(np.uint8)), {"summary": "apple 12"})
+            self.assertIsNone(gate.lookup(board("18")), f"{width}x{height}")
+            self.assertIsNone(gate.lookup(board("128")), f"{width}x{height}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+"""Exporters that key cells by header name.
+
+    python -m unittest discover -s tests
+"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_physicalizer.exporters import get_exporter, unique_keys
+from data_physicalizer.ocr_engines import module_available
+
+
+class JsonlExporterTest(unittest.TestCase):
+    def test_unique_keys(self):
+        self.assertEqual(unique_keys(["Qty", "Qty", "", "Qty"]), ["Qty", "Qty_2", "column_3", "Qty_3"])
+        self.assertEqual(unique_keys(["Item"], 3), ["Item", "column_2", "column_3"])
+
+    def test_no_cell_is_dropped(self):
+        rows = [["Item", "Qty", "Qty"], ["apple", "3", "4"], ["pear", "1", "2", "ripe"]]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "t.jsonl")
+            self.assertEqual(get_exporter("jsonl").write_table(rows, path), {"rows": 2})
+            with open(path, encoding="utf-8") as f:
+                written = [json.loads(line) for line in f]
+        self.assertEqual(written, [
+            {"Item": "apple", "Qty": "3", "Qty_2": "4"},
+            {"Item": "pear", "Qty": "1", "Qty_2": "2", "column_4": "ripe"},
+        ])
+
+
+@unittest.skipUnless(module_available("fpdf") and module_available("pymupdf"), "needs fpdf and pymupdf")
+class PdfExporterTest(unittest.TestCase):
+    def render(self, rows, **kwargs):
+        import pymupdf
+        from data_physicalizer.pdf_export import render_table
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "t.pdf")
+            stats = render_table(rows, path, **kwargs)
+            with pymupdf.open(path) as doc:
+                words = [w[4] for page in doc for w in page.get_text("words")]
+        return stats, words
+
+    def test_sampled_rows_longer_than_the_header_widen_the_table(self):
+        stats, words = self.render([["Item", "Qty"], ["apple", "3", "ripe"], ["pear", "1"]])
+        self.assertEqual(stats["rows"], 2)
+        self.assertIn("ripe", words)
+
+    def test_later_long_rows_wrap(self):
+        rows = [["Item", "Qty"], ["apple", "3"], ["pear", "1", "ripe", "green", "sweet"]]
+        stats, words = self.render(rows, sample_rows=1)
+        self.assertEqual(stats["rows"], 2)
+        for word in ("ripe", "green", "sweet"):
+            self.assertIn(word, words)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""run_live against a scripted capture service: frame counts and failing handlers.
+
+    python -m unittest discover -s tests
+"""
+import asyncio
+import sys
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from data_physicalizer.live import StabilityTrigger, run_live
+
+
+def board(seed: int):
+    image = np.full((120, 160, 3), 255, dtype=np.uint8)
+    image[20 + seed:40 + seed, 20:140] = 0
+    return image
+
+
+class ScriptedService:
+    """Hands out `images` one per sample, like a recording played back, then stops."""
+
+    def __init__(self, images):
+        self.images = list(images)
+        self.index = 0
+        self.running = True
+
+    def latest_with_time(self):
+        if self.index == len(self.images):
+            self.running = False
+            return None, None, self.index
+        self.index += 1
+        return time.time() + self.index, self.images[self.index - 1], self.index
+
+
+class RunLiveTest(unittest.TestCase):
+    def run_live(self, images, handle):
+        lines = []
+        trigger = StabilityTrigger(stable_frames=2)
+        stats = asyncio.run(run_live(ScriptedService(images), handle, fps=1000.0, trigger=trigger,
+                                     out=lines.append))
+        return stats, lines
+
+    def test_processed_counts_handled_boards_not_samples(self):
+        handled = []
+
+        async def handle(timestamp, image):
+            handled.append(timestamp)
+
+        stats, _ = self.run_live([board(0)] * 4 + [board(50)] * 4, handle)
+        self.assertEqual(stats.frames_sampled, 8)
+        self.assertEqual(stats.triggers, 2)
+        self.assertEqual(stats.frames_processed, len(handled))
+        self.assertEqual(stats.frames_processed, 2)
+
+    def test_failing_handler_is_reported_and_the_loop_goes_on(self):
+        calls = []
+
+        async def handle(timestamp, image):
+            calls.append(timestamp)
+            if len(calls) == 1:
+                raise RuntimeError("export failed")
+
+        stats, lines = self.run_live([board(0)] * 4 + [board(50)] * 4, handle)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(stats.handler_errors, 1)
+        self.assertEqual(stats.frames_processed, 1)
+        self.assertIn("[Live] Handler failed: RuntimeError: export failed", lines)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""PhysicalizerService session isolation, with the fake model and the stub OCR engine.
+
+    python -m unittest discover -s tests
+"""
+import asyncio
+import logging
+import os
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ["PHYSICALIZER_SESSION_DB"] = "memory"
+os.environ["PHYSICALIZER_OCR_CACHE"] = "off"
+logging.disable(logging.CRITICAL)
+
+import cv2
+import numpy as np
+
+from data_physicalizer import agent, ocr_engines
+from data_physicalizer.fake_model import FakeModel
+
+
+def board(noise_seed: int = None) -> bytes:
+    image = np.full((240, 320, 3), 235, dtype=np.uint8)
+    cv2.putText(image, "Qty 12", (40, 120), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (30, 30, 30), 2)
+    if noise_seed is not None:
+        noise = np.random.default_rng(noise_seed).normal(0, 3, image.shape)
+        image = np.clip(image + noise, 0, 255).astype(np.uint8)
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+class SessionIsolationTest(unittest.TestCase):
+    def setUp(self):
+        from google import adk
+        from data_physicalizer.driver import build_runner
+        from data_physicalizer.server import PhysicalizerService
+
+        os.environ["PHYSICALIZER_OCR_ENGINE"] = "stub"
+        self.engine = ocr_engines.StubEngine(text_fn=lambda image: f"read #{self.engine.calls}")
+        self.engine.loaded = True
+        ocr_engines.set_engine("stub", self.engine)
+        agent.get_frame_gate().clear()
+        root = adk.Agent(name="DataPhysicalizer", model=FakeModel(), instruction="Test agent.")
+        self.service = PhysicalizerService(runner=build_runner(root), workers=2)
+
+    def tearDown(self):
+        os.environ.pop("PHYSICALIZER_OCR_ENGINE", None)
+        self.service.pool.shutdown()
+
+    def test_sessions_never_share_ocr_text_or_summaries(self):
+        async def run():
+            first = await self.service.physicalize("A", board())
+            # the same board, another camera frame: the gate would match it to A's
+            other = await self.service.physicalize("B", board(noise_seed=1))
+            again = await self.service.physicalize("A", board(noise_seed=2))
+            return first, other, again
+
+        first, other, again = asyncio.run(run())
+        self.assertEqual(first["ocr_text"], "read #1")
+        self.assertEqual(other["ocr_text"], "read #2")
+        self.assertFalse(other["reused_summary"])
+        # within one session the board is recognised and nothing is OCR'd again
+        self.assertTrue(again["reused_summary"])
+        self.assertEqual(again["ocr_text"], "read #1")
+        self.assertEqual(self.engine.calls, 2)
+        self.assertIsNone(agent.get_frame_gate().lookup(cv2.imdecode(np.frombuffer(board(), np.uint8), 1)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+"""Tracer memory bounds.
+
+    python -m unittest discover -s tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_physicalizer import tracing
+
+
+class TracerBoundsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def record(self, path, count):
+        tracer = tracing.Tracer(path, max_events=10)
+        for i in range(count):
+            with tracing.Span(tracer, "step", {"i": i}):
+                pass
+        return tracer
+
+    def test_jsonl_trace_spills_to_its_file(self):
+        path = os.path.join(self.tmp.name, "trace.jsonl")
+        tracer = self.record(path, 25)
+        self.assertLess(len(tracer.events), 10)
+        self.assertEqual(tracer.spilled, 20)
+        tracing.flush(tracer=tracer)
+        events = tracing.load_events(path)
+        self.assertEqual(sorted(e["attrs"]["i"] for e in events), list(range(25)))
+        self.assertEqual(tracing.summarize(tracing.collected_events(tracer))["spans"]["step"]["count"], 25)
+
+    def test_chrome_trace_keeps_the_latest_events(self):
+        tracer = self.record(os.path.join(self.tmp.name, "trace.json"), 25)
+        self.assertEqual(len(tracer.events), 10)
+        self.assertEqual(tracer.dropped, 15)
+        self.assertEqual([e["attrs"]["i"] for e in tracer.events], list(range(15, 25)))
+
+
+if __name__ == "__main__":
+    unittest.main()